@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import subprocess
+import threading
+import numpy as np
+
+# Energy-based voice activity detection, run before Whisper so silent stretches and music
+# beds are not transcribed (Whisper spends a full 30 s window on them and often hallucinates
+# text there). Audio is decoded by FFmpeg to 16 kHz mono PCM and reduced to one energy value
+# per 20 ms frame, so even a long track costs little memory.
+#   - A frame is active when its energy is 10 dB over the track's noise floor.
+#   - Speech rises and falls with every syllable, so a 1 s window only counts as speech if its
+#     energy varies by more than 'modulation_db' (std in dB). A steady music bed, hum or tone
+#     does not. Music with strong beats can still pass; this is a cheap gate, not a classifier.
+# Speech frames are joined into padded regions, which are what gets transcribed.
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+SPEECH_GATE_FILENAME = "speech_gate.json"
+
+DEFAULT_VAD = {
+    "floor_margin_db": 10.0,  # Energy above the noise floor for a frame to count as active
+    "min_level_db": -50.0,    # Frames quieter than this (dBFS) are never active
+    "modulation_db": 5.0,     # Energy std a 1 s window needs to count as speech
+    "min_active": 0.2,        # Share of active frames a 1 s window needs to count as speech
+    "merge_gap": 0.5,         # Speech regions closer than this (s) are joined
+    "min_region": 0.2,        # Shorter speech regions are dropped (clicks, door slams)
+    "padding": 0.25           # Seconds kept before and after each region
+}
+
+
+def frame_energies(audio_path):
+    """
+    Decodes audio with FFmpeg and returns the energy of every 20 ms frame in dBFS.
+
+    :param audio_path: An audio file or a video (its first audio track is used).
+    :return: A float32 NumPy array, or None if decoding failed.
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", audio_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"
+    ]
+
+    frame_samples = int(SAMPLE_RATE * FRAME_SECONDS)
+    chunk_bytes = frame_samples * 2 * 500 # 10 s of audio per read
+    energies = []
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        print("Error: ffmpeg not found. Is FFmpeg installed and in your system's PATH?")
+        return None
+
+    leftover = b""
+    while True:
+        data = process.stdout.read(chunk_bytes)
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % (frame_samples * 2)
+        leftover = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+        power = (samples.reshape(-1, frame_samples) ** 2).mean(axis=1)
+        energies.append(10 * np.log10(power + 1e-10))
+
+    stderr = process.stderr.read().decode(errors="replace").strip()
+    if process.wait() != 0:
+        print(f"Error decoding audio for voice detection: {stderr}")
+        return None
+    return np.concatenate(energies).astype(np.float32) if energies else np.zeros(0, dtype=np.float32)
+
+
+def speech_regions(energies, floor_margin_db=10.0, min_level_db=-50.0, modulation_db=5.0, min_active=0.2, merge_gap=0.5, min_region=0.2, padding=0.25):
+    """
+    Finds the speech regions in a track from its frame energies (see frame_energies).
+
+    :return: A list of (start, end) tuples in seconds, relative to the start of the energies.
+    """
+    if len(energies) == 0:
+        return []
+    noise_floor = float(np.percentile(energies, 10))
+    active = energies > max(noise_floor + floor_margin_db, min_level_db)
+
+    # Score 1 s windows with a 0.5 s hop; a frame is speech if it is active and any
+    # window covering it looks like speech
+    window = int(round(1.0 / FRAME_SECONDS))
+    hop = window // 2
+    speech = np.zeros(len(energies), dtype=bool)
+    for start in range(0, max(len(energies) - hop, 1), hop):
+        span = slice(start, start + window)
+        if active[span].mean() >= min_active and float(energies[span].std()) >= modulation_db:
+            speech[span] |= active[span]
+
+    # Turn runs of speech frames into (start, end) regions
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    regions = []
+    for first, last in zip(edges[::2], edges[1::2]):
+        start, end = first * FRAME_SECONDS, last * FRAME_SECONDS
+        if regions and start - regions[-1][1] <= merge_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    track_end = len(energies) * FRAME_SECONDS
+    return [
+        (round(float(max(start - padding, 0.0)), 3), round(float(min(end + padding, track_end)), 3))
+        for start, end in regions if end - start >= min_region
+    ]
+
+
+def pack_regions(regions, max_seconds=30.0):
+    """
+    Packs consecutive speech regions into clips of at most 'max_seconds' of speech. Whisper
+    pays for a whole 30 s window per clip however short it is, so packing several short
+    regions into one clip (with the gaps between them removed) keeps the window count low.
+    A region longer than 'max_seconds' gets a clip of its own.
+
+    :return: A list of packs, each a list of (start, end) regions.
+    """
+    packs = []
+    for start, end in regions:
+        if packs and sum(e - s for s, e in packs[-1]) + (end - start) <= max_seconds:
+            packs[-1].append((start, end))
+        else:
+            packs.append([(start, end)])
+    return packs
+
+
+def track_time(clip_time, regions):
+    """Maps a time in a packed clip (see write_clip) back onto the original track's clock."""
+    offset = 0.0
+    for start, end in regions:
+        if clip_time <= offset + (end - start) or (start, end) == regions[-1]:
+            return round(start + max(clip_time - offset, 0.0), 3)
+        offset += end - start
+
+
+def write_clip(audio_path, regions, output_path):
+    """
+    Writes the given (start, end) regions of a file, back to back, into a 16 kHz mono WAV.
+
+    :return: True on success.
+    """
+    first, last = regions[0][0], regions[-1][1]
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-ss", str(first), "-i", audio_path, "-t", str(last - first), "-vn"]
+    if len(regions) > 1:
+        # Times inside the filter restart at 0 after -ss; asetpts closes the gaps
+        keep = "+".join(f"between(t,{start - first:.3f},{end - first:.3f})" for start, end in regions)
+        command += ["-af", f"aselect='{keep}',asetpts=N/SR/TB"]
+    command += ["-ac", "1", "-ar", str(SAMPLE_RATE), output_path]
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        print(f"  [Error] Could not cut speech clip from {audio_path}: {e}")
+        return False
+
+
+class SpeechGate:
+    """
+    Wraps the transcription functions so only detected speech reaches Whisper, and keeps
+    the numbers for the report (audio seen, audio transcribed, silent sets, time spent).
+
+    :param params: Overrides for DEFAULT_VAD.
+    """
+
+    def __init__(self, **params):
+        self.params = {**DEFAULT_VAD, **params}
+        self.audio_seconds = 0.0
+        self.speech_seconds = 0.0
+        self.vad_seconds = 0.0
+        self.transcribe_seconds = 0.0
+        self.silent = []
+        self.lock = threading.Lock()
+
+    def detect(self, audio_path):
+        """Returns (speech regions, audio duration) for a file, or (None, None) if it could not be decoded."""
+        start = time.perf_counter()
+        energies = frame_energies(audio_path)
+        with self.lock:
+            self.vad_seconds += time.perf_counter() - start
+        if energies is None:
+            return None, None
+        duration = len(energies) * FRAME_SECONDS
+        with self.lock:
+            self.audio_seconds += duration
+        return speech_regions(energies, **self.params), duration
+
+    def transcribe_set(self, audio_file, transcript_func, model_t):
+        """
+        Transcribes a set's audio clip with its leading and trailing silence trimmed.
+        Sets with no speech are not transcribed and get an empty transcript.
+        """
+        regions, duration = self.detect(audio_file)
+        if regions is None:
+            return self.timed(transcript_func, audio_file, model_t, duration or 0.0)
+        if not regions:
+            with self.lock:
+                self.silent.append(os.path.basename(os.path.dirname(audio_file)))
+            print(f"  No speech detected in {audio_file}; skipping transcription.")
+            return ""
+
+        start, end = regions[0][0], regions[-1][1]
+        if start < 0.5 and duration - end < 0.5:
+            return self.timed(transcript_func, audio_file, model_t, duration)
+        clip_path = os.path.join(os.path.dirname(audio_file), "audio_speech.wav")
+        if not write_clip(audio_file, [(start, end)], clip_path):
+            return self.timed(transcript_func, audio_file, model_t, duration)
+        try:
+            return self.timed(transcript_func, clip_path, model_t, end - start)
+        finally:
+            os.remove(clip_path)
+
+    def transcribe_track(self, audio_path, segments_func, model_t, work_folder):
+        """
+        Transcribes only the speech of a whole track, packed into clips (see pack_regions),
+        and maps the returned pieces back onto the track's clock.
+
+        :param work_folder: Folder for the temporary span clips.
+        :return: A list of {"start", "end", "text"} pieces, in time order.
+        """
+        regions, duration = self.detect(audio_path)
+        if regions is None:
+            return self.timed(segments_func, audio_path, model_t, 0.0)
+        packs = pack_regions(regions)
+        speech = sum(end - start for start, end in regions)
+        print(f"  Speech gate: transcribing {speech:.1f}s of {duration:.1f}s in {len(packs)} clip(s)")
+
+        pieces = []
+        clip_path = os.path.join(work_folder, "track_speech.wav")
+        for pack in packs:
+            if not write_clip(audio_path, pack, clip_path):
+                continue
+            try:
+                clip_pieces = self.timed(segments_func, clip_path, model_t, sum(end - start for start, end in pack))
+            finally:
+                os.remove(clip_path)
+            pieces.extend({**piece, "start": track_time(piece["start"], pack), "end": track_time(piece["end"], pack)} for piece in clip_pieces)
+        return pieces
+
+    def timed(self, func, audio_path, model_t, seconds):
+        start = time.perf_counter()
+        try:
+            return func(audio_path, model_t)
+        finally:
+            with self.lock:
+                self.transcribe_seconds += time.perf_counter() - start
+                self.speech_seconds += seconds
+
+    def mark_silent_sets(self, set_folders, pieces_by_set):
+        """Records the sets that got no speech from a whole-track transcription."""
+        with self.lock:
+            self.silent.extend(os.path.basename(folder) for folder, set_pieces in zip(set_folders, pieces_by_set) if not set_pieces)
+
+    def stats(self):
+        """Returns the gate report as a dictionary."""
+        skipped = max(self.audio_seconds - self.speech_seconds, 0.0)
+        seconds_per_audio_second = self.transcribe_seconds / self.speech_seconds if self.speech_seconds else 0.0
+        return {
+            "params": self.params,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "transcribed_seconds": round(self.speech_seconds, 3),
+            "skipped_fraction": round(skipped / self.audio_seconds, 4) if self.audio_seconds else 0.0,
+            "silent_sets": sorted(self.silent),
+            "vad_seconds": round(self.vad_seconds, 3),
+            "transcribe_seconds": round(self.transcribe_seconds, 3),
+            "estimated_seconds_saved": round(skipped * seconds_per_audio_second - self.vad_seconds, 3)
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("\n--- Speech Gate ---")
+        print(f"  Transcribed {stats['transcribed_seconds']:.1f}s of {stats['audio_seconds']:.1f}s of audio "
+              f"({stats['skipped_fraction']:.0%} skipped); {len(stats['silent_sets'])} set(s) without speech")
+        print(f"  Voice detection took {stats['vad_seconds']:.2f}s; gating saved ~{stats['estimated_seconds_saved']:.2f}s")
+
+    def save_stats(self, sets_base_folder):
+        """Writes the report to 'speech_gate.json' in the video's sets folder."""
+        stats_path = os.path.join(sets_base_folder, SPEECH_GATE_FILENAME)
+        try:
+            with open(stats_path, 'w') as f:
+                json.dump(self.stats(), f, indent=2)
+        except Exception as e:
+            print(f"  [Error] Could not write {stats_path}: {e}")
@@ -2,6 +2,7 @@ import whisper
 import torch
 import os
 import time
+from Result_cache.Cache import ResultCache, get_result_cache, hash_file, model_identity
 
 def load_model_whisper():
     custom_dir = "D:\clipquery_github\CLIPQUERY\OpenAI_cache"
@@ -28,6 +29,49 @@ def load_model_whisper():
 # print(result['text'])
 
 def get_transcript(file_path,model):
+    cache = get_result_cache()
+    if cache is not None:
+        cache_key = ResultCache.make_key("transcript", hash_file(file_path), model_identity(model))
+        text = cache.get("transcript", cache_key)
+        if text is not None:
+            return text
+
     result = model.transcribe(file_path)
+
+    if cache is not None:
+        cache.put(cache_key, result['text'])
     
-    return result['text']
\ No newline at end of file
+    return result['text']
+
+
+def get_transcript_segments(file_path, model, word_timestamps=True):
+    """
+    Transcribes a whole audio or video file once and returns its timed pieces.
+
+    With word_timestamps each piece is a single word, so the transcript can be
+    cut close to any set boundary. Otherwise each piece is a Whisper segment.
+
+    :param file_path: Path to the audio track or the video itself (Whisper decodes it with FFmpeg).
+    :return: A list of {"start", "end", "text"} dictionaries, in time order.
+    """
+    cache = get_result_cache()
+    if cache is not None:
+        cache_key = ResultCache.make_key("transcript_segments", hash_file(file_path), model_identity(model), {"word_timestamps": word_timestamps})
+        pieces = cache.get("transcript_segments", cache_key)
+        if pieces is not None:
+            return pieces
+
+    result = model.transcribe(file_path, word_timestamps=word_timestamps)
+
+    pieces = []
+    for segment in result['segments']:
+        words = segment.get('words')
+        if words:
+            pieces.extend({"start": w['start'], "end": w['end'], "text": w['word']} for w in words)
+        else:
+            pieces.append({"start": segment['start'], "end": segment['end'], "text": segment['text']})
+
+    if cache is not None:
+        cache.put(cache_key, pieces)
+    return pieces
+
@@ -1,128 +1,370 @@
 import os
 import glob
-import sys
 import json
-import chromadb
-import re
-from JSON_embed.JSON_Embed import load_embedder,generate_embedding_from_file,serialize_scene_to_text
+import numpy as np
+from JSON_embed.JSON_Embed import get_embedding,get_embeddings_batch,serialize_scene_to_text
+from Result_cache.Cache import hash_text, model_identity
+from Scene_store.Store import get_scene_store
 
-def populate_chroma_db(embedder, collection, SETS_BASE_FOLDER, VIDEO_FILENAME,CHROMA_COLLECTION_NAME):
+
+def scene_content_hash(serialized_text, embedder, extra_metadata=None):
+    """
+    Hashes a scene's text together with the embedder's identity (so a new model re-embeds
+    everything) and any extra metadata (so e.g. a change of owner is written too).
+    """
+    extra_text = json.dumps(extra_metadata or {}, sort_keys=True)
+    return hash_text(f"{model_identity(embedder)}\0{extra_text}\0{serialized_text}")
+
+
+def scene_filter(video_id=None, owner_id=None):
+    """
+    Builds a Chroma 'where' filter that restricts a search to one video and/or one owner.
+
+    :return: The filter, or None if neither is given.
+    """
+    conditions = []
+    if video_id is not None:
+        conditions.append({"video_id": int(video_id)})
+    if owner_id is not None:
+        conditions.append({"owner_id": int(owner_id)})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def scene_id_for(VIDEO_FILENAME, set_name):
+    """Returns the Chroma ID of a scene, e.g. "Vid1.mp4_set_001"."""
+    return f"{VIDEO_FILENAME}_{set_name}"
+
+def populate_chroma_db(embedder, collection, SETS_BASE_FOLDER, VIDEO_FILENAME,CHROMA_COLLECTION_NAME, only_sets=None, batch_size=32, upsert_chunk_size=256, extra_metadata=None):
     """
     Finds all scene summaries, generates embeddings, and adds them to ChromaDB.
+
+    Summaries are read from the video's scene store in one query, all scenes are embedded
+    together in batches (normalized float32), and the results are upserted in chunks of
+    bounded size. Every entry stores a content hash in its metadata; scenes whose hash is
+    already in the collection are skipped, so re-running this is cheap and idempotent.
+    Vectors are also kept in the scene store, so a scene whose text did not change is
+    not re-embedded even if its Chroma entry is gone (e.g. after a move to another collection).
+
+    :param only_sets: Optional list of set names (e.g. ["set_004"]) to embed.
+    :param batch_size: Number of scenes encoded per forward pass of the embedder.
+    :param upsert_chunk_size: Maximum number of entries sent to Chroma in one upsert.
+    :param extra_metadata: Optional dict stored on every entry, e.g. {"video_id": 3, "owner_id": 1},
+                           so searches can be filtered inside Chroma (see scene_filter).
+    :return: List of the set names that are now indexed (embedded or unchanged).
     """
     
-    # Find all the 'summary_data.json' files
-    json_files = sorted(glob.glob(os.path.join(SETS_BASE_FOLDER,VIDEO_FILENAME, "set_*/summary_data.json")))
+    # Read every summarized scene from the video's scene store
+    store = get_scene_store(os.path.join(SETS_BASE_FOLDER, VIDEO_FILENAME))
+    scenes = store.all_summary_data(only_sets)
     
-    if not json_files:
-        print(f"Error: No 'summary_data.json' files found in {SETS_BASE_FOLDER}")
+    if not scenes:
+        print(f"Error: No scene summaries found for {VIDEO_FILENAME} in {SETS_BASE_FOLDER}")
         print("Please run Pipe1, Pipe2, and Pipe3 first.")
-        return
+        return []
 
-    print(f"Found {len(json_files)} scenes to add to ChromaDB...")
+    print(f"Found {len(scenes)} scenes to add to ChromaDB...")
 
-    # We will collect everything in lists to add in one batch (much faster)
-    all_embeddings = []
+    # We will collect everything in lists and embed them in batches (much faster)
     all_metadatas = []
     all_documents = []
     all_ids = []
-    
-    # Regex to extract 'set_001' from the path
-    set_name_regex = re.compile(r"(set_\d+)")
-
-    for file_path in json_files:
-        try:
-            # Get a unique ID from the file path
-            match = set_name_regex.search(file_path)
-            if not match:
-                print(f"  [Warning] Skipping file, could not get ID: {file_path}")
-                continue
-            scene_id = f"{VIDEO_FILENAME}_{match.group(1)}" # e.g., "Vid1.mp4_set_001"
-
-            # Read the JSON file
-            with open(file_path, 'r') as f:
-                scene_data = json.load(f)
-
-            embedding = generate_embedding_from_file(embedder,file_path)
-
-            serialized_text = serialize_scene_to_text(scene_data)
-                
-            
-            start_time = scene_data.get("start_time", 0.0)
-            end_time = scene_data.get("end_time", 0.0)
-            summary = scene_data.get("scene_summary", "")
-            
-
-            # 3. Create Metadata (This is where you store timestamps!)
-            metadata = {
-                "start_time": start_time,
-                "end_time": end_time,
-                "summary": summary,
-                "source_file": file_path
-            }
-
-            # Add all pieces to our lists
-            all_embeddings.append(embedding.tolist()) # .tolist() to make it JSON-serializable
-            all_metadatas.append(metadata)
-            all_documents.append(serialized_text)
-            all_ids.append(scene_id)
-            
-            print(f"  Prepared: {scene_id}")
-
-        except Exception as e:
-            print(f"  [Error] Failed to process file {file_path}: {e}")
+    all_set_names = []
+    vector_hashes = []
+
+    for set_name, scene_data in scenes.items():
+        scene_id = scene_id_for(VIDEO_FILENAME, set_name) # e.g., "Vid1.mp4_set_001"
+        serialized_text = serialize_scene_to_text(scene_data)
+        
+        start_time = scene_data.get("start_time", 0.0)
+        end_time = scene_data.get("end_time", 0.0)
+        summary = scene_data.get("scene_summary", "")
+        
+
+        # 3. Create Metadata (This is where you store timestamps!)
+        metadata = {
+            "start_time": start_time,
+            "end_time": end_time,
+            "summary": summary,
+            "source_file": store.path,
+            "video": VIDEO_FILENAME,
+            "set_name": set_name,
+            **(extra_metadata or {}),
+            "content_hash": scene_content_hash(serialized_text, embedder, extra_metadata)
+        }
+
+        # Add all pieces to our lists
+        all_metadatas.append(metadata)
+        all_documents.append(serialized_text)
+        all_ids.append(scene_id)
+        all_set_names.append(set_name)
+        # The vector only depends on the text and the model, not on the extra metadata
+        vector_hashes.append(scene_content_hash(serialized_text, embedder))
+
+    if not all_ids:
+        print("No new entries to add.")
+        return []
+
+    # Skip scenes that are already indexed with the same content
+    existing = collection.get(ids=all_ids, include=["metadatas"])
+    indexed_hashes = {
+        scene_id: (metadata or {}).get("content_hash")
+        for scene_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+    changed = [i for i, scene_id in enumerate(all_ids) if indexed_hashes.get(scene_id) != all_metadatas[i]["content_hash"]]
+    print(f"{len(all_ids) - len(changed)} scenes unchanged, {len(changed)} to embed.")
+    if not changed:
+        return all_set_names
+
+    ids = [all_ids[i] for i in changed]
+    metadatas = [all_metadatas[i] for i in changed]
+    documents = [all_documents[i] for i in changed]
+
+    # Reuse the stored vectors of scenes whose text did not change; embed the rest in batches
+    stored = store.get_embeddings([all_set_names[i] for i in changed])
+    to_embed = [pos for pos, i in enumerate(changed) if stored.get(all_set_names[i], (None,))[0] != vector_hashes[i]]
+    print(f"Embedding {len(to_embed)} scenes in batches of {batch_size} ({len(changed) - len(to_embed)} vectors reused)...")
+    embeddings = [stored[all_set_names[i]][1] if all_set_names[i] in stored else None for i in changed]
+    if to_embed:
+        new_embeddings = get_embeddings_batch([documents[pos] for pos in to_embed], embedder, batch_size=batch_size)
+        if new_embeddings is None:
+            return []
+        for pos, embedding in zip(to_embed, new_embeddings):
+            embeddings[pos] = embedding
+        store.put_embeddings([all_set_names[changed[pos]] for pos in to_embed], [vector_hashes[changed[pos]] for pos in to_embed], new_embeddings)
+    embeddings = np.stack(embeddings).astype("float32", copy=False)
 
     # 4. Add to ChromaDB
-    # This adds everything in a single, efficient operation
-    if all_ids:
-        print(f"\nAdding {len(all_ids)} entries to ChromaDB collection '{CHROMA_COLLECTION_NAME}'...")
-        collection.add(
-            embeddings=all_embeddings,
-            metadatas=all_metadatas,
-            documents=all_documents,
-            ids=all_ids
+    # Upsert in bounded chunks, so re-embedded sets are replaced and huge videos don't build one giant request
+    print(f"\nAdding {len(ids)} entries to ChromaDB collection '{CHROMA_COLLECTION_NAME}'...")
+    for i in range(0, len(ids), upsert_chunk_size):
+        chunk = slice(i, i + upsert_chunk_size)
+        collection.upsert(
+            embeddings=embeddings[chunk],
+            metadatas=metadatas[chunk],
+            documents=documents[chunk],
+            ids=ids[chunk]
         )
-        print("Successfully added entries to database.")
+    print("Successfully added entries to database.")
+    return all_set_names
+
+
+def indexed_scene_ids(collection, VIDEO_FILENAME, SETS_BASE_FOLDER=None):
+    """
+    Returns the IDs of every indexed scene of a video.
+
+    Scenes are found by their 'video' metadata. Entries indexed before that field
+    existed are found by ID, using the set folders on disk if SETS_BASE_FOLDER is given.
+    """
+    scene_ids = set(collection.get(where={"video": VIDEO_FILENAME}, include=[])["ids"])
+    if SETS_BASE_FOLDER is not None:
+        set_folders = glob.glob(os.path.join(SETS_BASE_FOLDER, VIDEO_FILENAME, "set_*"))
+        candidates = [scene_id_for(VIDEO_FILENAME, os.path.basename(folder)) for folder in set_folders]
+        if candidates:
+            scene_ids.update(collection.get(ids=candidates, include=[])["ids"])
+    return sorted(scene_ids)
+
+
+def delete_video_from_chroma(collection, VIDEO_FILENAME, SETS_BASE_FOLDER=None):
+    """
+    Removes every indexed scene of a video from the collection.
+
+    :return: The number of entries deleted.
+    """
+    scene_ids = indexed_scene_ids(collection, VIDEO_FILENAME, SETS_BASE_FOLDER)
+    if scene_ids:
+        collection.delete(ids=scene_ids)
+    print(f"Deleted {len(scene_ids)} entries of '{VIDEO_FILENAME}' from ChromaDB.")
+    return len(scene_ids)
+
+
+def reindex_video(embedder, collection, SETS_BASE_FOLDER, VIDEO_FILENAME, CHROMA_COLLECTION_NAME, force=False, extra_metadata=None):
+    """
+    Brings a video's entries in line with its current scene summaries.
+
+    Changed scenes are re-embedded, unchanged ones are skipped and entries whose
+    set no longer exists are deleted.
+
+    :param force: If True, all of the video's entries are deleted and re-embedded.
+    :param extra_metadata: Optional dict stored on every entry (see populate_chroma_db).
+    :return: List of the set names that are now indexed.
+    """
+    if force:
+        delete_video_from_chroma(collection, VIDEO_FILENAME, SETS_BASE_FOLDER)
+    indexed = populate_chroma_db(embedder, collection, SETS_BASE_FOLDER, VIDEO_FILENAME, CHROMA_COLLECTION_NAME, extra_metadata=extra_metadata)
+
+    current_ids = {scene_id_for(VIDEO_FILENAME, set_name) for set_name in indexed}
+    orphans = [scene_id for scene_id in indexed_scene_ids(collection, VIDEO_FILENAME) if scene_id not in current_ids]
+    if orphans:
+        collection.delete(ids=orphans)
+        print(f"Deleted {len(orphans)} entries of sets that no longer exist.")
+    return indexed
+
+# --- Moment index ---
+# A second collection ('<collection>_moments') holds one entry per distinct frame caption
+# and per spoken phrase, with its exact timestamp. Searches use it only inside the top
+# scenes, to pick the moment to seek to (see Search/Scene_search.refine_scene_timestamps).
+
+MAX_MOMENTS_PER_SET = 24
+
+
+def scene_moments(set_folder_path, scene_data, max_moments=MAX_MOMENTS_PER_SET):
+    """
+    Lists the timed moments of one scene: frame captions and, if available, its timed spoken
+    phrases from the scene store. Runs of identical captions keep only their first frame.
+
+    :return: A list of {"timestamp", "end_time", "kind", "text"}, at most 'max_moments' long.
+    """
+    moments = []
+    previous_caption = None
+    for visual in scene_data.get("visuals") or []:
+        caption = (visual.get("description") or "").strip()
+        if caption and caption != previous_caption:
+            moments.append({"timestamp": visual.get("timestamp", 0.0), "end_time": visual.get("timestamp", 0.0), "kind": "caption", "text": caption})
+        previous_caption = caption
+
+    store = get_scene_store(os.path.dirname(os.path.normpath(set_folder_path)))
+    for segment in store.get_segments(os.path.basename(os.path.normpath(set_folder_path))):
+        if segment.get("text", "").strip():
+            moments.append({"timestamp": segment["start"], "end_time": segment["end"], "kind": "speech", "text": segment["text"].strip()})
+
+    moments.sort(key=lambda moment: moment["timestamp"])
+    if len(moments) > max_moments:
+        # Keep an even spread over the scene rather than only its beginning
+        step = len(moments) / max_moments
+        moments = [moments[int(i * step)] for i in range(max_moments)]
+    return moments
+
+
+def populate_moments(embedder, moments_collection, SETS_BASE_FOLDER, VIDEO_FILENAME, set_names, extra_metadata=None, batch_size=32, upsert_chunk_size=256):
+    """
+    Indexes the timed moments of the given sets into the moment collection.
+
+    Moments whose content hash is unchanged are skipped, and moments a set no longer has are deleted.
+
+    :param set_names: The sets to index (e.g. the ones populate_chroma_db just indexed).
+    :param extra_metadata: Optional dict stored on every entry (e.g. video_id, owner_id).
+    :return: The number of moments embedded.
+    """
+    ids, metadatas, documents = [], [], []
+    scenes = get_scene_store(os.path.join(SETS_BASE_FOLDER, VIDEO_FILENAME)).all_summary_data(set_names)
+    for set_name in set_names:
+        set_folder_path = os.path.join(SETS_BASE_FOLDER, VIDEO_FILENAME, set_name)
+        scene_data = scenes.get(set_name)
+        if scene_data is None:
+            print(f"  [Warning] Skipping moments of {set_name}: no summary in the scene store")
+            continue
+        scene_id = scene_id_for(VIDEO_FILENAME, set_name)
+        for i, moment in enumerate(scene_moments(set_folder_path, scene_data)):
+            ids.append(f"{scene_id}_m{i:03d}")
+            documents.append(moment["text"])
+            metadatas.append({
+                "scene_id": scene_id,
+                "video": VIDEO_FILENAME,
+                "set_name": set_name,
+                "timestamp": moment["timestamp"],
+                "end_time": moment["end_time"],
+                "kind": moment["kind"],
+                **(extra_metadata or {}),
+                "content_hash": scene_content_hash(f"{moment['kind']}|{moment['timestamp']}|{moment['text']}", embedder, extra_metadata)
+            })
+
+    # Drop moments the sets no longer have, then skip the unchanged ones
+    if set_names:
+        scene_ids = [scene_id_for(VIDEO_FILENAME, set_name) for set_name in set_names]
+        existing = moments_collection.get(where={"scene_id": {"$in": scene_ids}}, include=["metadatas"])
+        current_ids = set(ids)
+        stale = [moment_id for moment_id in existing["ids"] if moment_id not in current_ids]
+        if stale:
+            moments_collection.delete(ids=stale)
+        indexed_hashes = {moment_id: (metadata or {}).get("content_hash") for moment_id, metadata in zip(existing["ids"], existing["metadatas"])}
+        changed = [i for i, moment_id in enumerate(ids) if indexed_hashes.get(moment_id) != metadatas[i]["content_hash"]]
     else:
-        print("No new entries to add.")
+        changed = []
+    if not changed:
+        return 0
+
+    print(f"Embedding {len(changed)} moments for timestamp refinement...")
+    embeddings = get_embeddings_batch([documents[i] for i in changed], embedder, batch_size=batch_size)
+    if embeddings is None:
+        return 0
+    for start in range(0, len(changed), upsert_chunk_size):
+        chunk = changed[start:start + upsert_chunk_size]
+        moments_collection.upsert(
+            embeddings=embeddings[start:start + upsert_chunk_size],
+            metadatas=[metadatas[i] for i in chunk],
+            documents=[documents[i] for i in chunk],
+            ids=[ids[i] for i in chunk]
+        )
+    return len(changed)
+
 
 # --- 5. Function to Query DB ---
-def query_video_for_timestamps(embedder, collection, query_text: str, n_results=1):
+def search_scenes(embedder, collection, query_text: str, n_results=5, where=None, query_embedding=None):
     """
-    Takes a text query, finds the most similar scene, and returns its timestamps.
+    Finds the scenes most similar to a text query.
+
+    :param where: Optional Chroma metadata filter (e.g. scene_filter(video_id=3)).
+    :param query_embedding: Optional precomputed (normalized) query embedding.
+    :return: A list of scene dicts, best match first, with 'scene_id', 'video', 'set_name',
+             'video_id', 'owner_id', 'start_time', 'end_time', 'summary', 'distance' and
+             'score' (cosine similarity). IDs are None for entries indexed without them.
     """
-    print(f"\n--- Querying for: '{query_text}' ---")
-    
-    # 1. Generate an embedding for the query text
-    query_embedding = embedder.get_embedding(query_text)
-    
+    if query_embedding is None:
+        query_embedding = get_embedding(query_text, embedder, normalize=True)
     if query_embedding is None:
         print("Error: Could not generate embedding for query.")
-        return
-        
-    # 2. Query the collection
+        return []
+
     results = collection.query(
-        query_embeddings=[query_embedding.tolist()],
-        n_results=n_results
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        where=where,
+        include=["metadatas", "distances"]
     )
-    
-    # 3. Process and print the results
     if not results.get('ids') or not results['ids'][0]:
+        return []
+
+    scenes = []
+    for scene_id, distance, metadata in zip(results['ids'][0], results['distances'][0], results['metadatas'][0]):
+        metadata = metadata or {}
+        # Entries indexed before 'video'/'set_name' were stored only have them in their ID
+        video, _, set_number = scene_id.rpartition("_set_")
+        scenes.append({
+            "scene_id": scene_id,
+            "video": metadata.get("video", video),
+            "set_name": metadata.get("set_name", f"set_{set_number}"),
+            "video_id": metadata.get("video_id"),
+            "owner_id": metadata.get("owner_id"),
+            "start_time": metadata.get("start_time"),
+            "end_time": metadata.get("end_time"),
+            "summary": metadata.get("summary", ""),
+            "distance": distance,
+            # Embeddings are unit length, so squared L2 distance = 2 - 2 * cosine
+            "score": 1 - distance / 2
+        })
+    return scenes
+
+
+def query_video_for_timestamps(embedder, collection, query_text: str, n_results=1):
+    """
+    Takes a text query, finds the most similar scene, and returns its timestamps.
+    """
+    print(f"\n--- Querying for: '{query_text}' ---")
+    
+    scenes = search_scenes(embedder, collection, query_text, n_results)
+    if not scenes:
         print("No matching results found.")
-        return
+        return []
 
     print("Found matching scene(s):")
     
-    for i in range(len(results['ids'][0])):
-        scene_id = results['ids'][0][i]
-        distance = results['distances'][0][i]
-        metadata = results['metadatas'][0][i]
-        
+    for i, scene in enumerate(scenes):
         print(f"  Result {i+1}:")
-        print(f"    Scene ID: {scene_id}")
-        print(f"    Similarity: {1 - distance:.2f} (lower distance is better)")
-        print(f"    Start Time: {metadata.get('start_time')}s")
-        print(f"    End Time: {metadata.get('end_time')}s")
-        print(f"    Summary: \"{metadata.get('summary')}\"")
-
-
+        print(f"    Scene ID: {scene['scene_id']}")
+        print(f"    Similarity: {scene['score']:.2f} (higher is better)")
+        print(f"    Start Time: {scene['start_time']}s")
+        print(f"    End Time: {scene['end_time']}s")
+        print(f"    Summary: \"{scene['summary']}\"")
+    return scenes
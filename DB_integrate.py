@@ -1,27 +1,127 @@
 import os
-import json
-import chromadb
-import glob
-from JSON_embed.JSON_Embed import load_embedder,generate_embedding_from_file,serialize_scene_to_text
-from ChromaDB import populate_chroma_db
+import threading
+from Model_registry.Registry import get_model
+from ChromaDB import populate_chroma_db, populate_moments, delete_video_from_chroma, reindex_video
+from video_processing.Stage_manifest import forget_stage
+from Search.Scene_search import bump_index_version
+from Search.Lexical_index import BM25Index, lexical_index_path, scene_documents
 
 SETS_BASE_FOLDER = "video_processing/Sets/"
 CHROMA_DB_PATH = 'chroma_db'
 CHROMA_COLLECTION_NAME = 'video_scenes'
 
+# With CLIPQUERY_COLLECTION_PER_OWNER=1 every owner gets their own collection
+# ('video_scenes_owner_<id>'), so each tenant's index stays small. It must be set the
+# same way for the worker (indexing) and the web process (searching).
+COLLECTION_PER_OWNER = os.environ.get("CLIPQUERY_COLLECTION_PER_OWNER") == "1"
 
-#Serealize and Embed
-embedding_model = load_embedder()
+# Nothing is loaded at import time: the embedder comes from the model registry and the
+# Chroma client is opened on first use, then kept for the life of the process.
+_clients = {}
+_collections = {}
+_lexical_indexes = {}
+_collections_lock = threading.Lock()
 
 
-client = chromadb.PersistentClient(path=CHROMA_DB_PATH) 
-collection = client.get_or_create_collection(name=CHROMA_COLLECTION_NAME)
+def get_collection(CHROMA_DB_PATH='chroma_db', CHROMA_COLLECTION_NAME='video_scenes'):
+    """
+    Returns a Chroma collection, opening the persistent client the first time it is needed.
 
-# populate_chroma_db(embedding_model, collection, SETS_BASE_FOLDER, filename,CHROMA_COLLECTION_NAME)
+    :param CHROMA_DB_PATH: Folder of the persistent Chroma database.
+    :param CHROMA_COLLECTION_NAME: Name of the collection to get or create.
+    """
+    key = (os.path.abspath(CHROMA_DB_PATH), CHROMA_COLLECTION_NAME)
+    with _collections_lock:
+        if key not in _collections:
+            if key[0] not in _clients:
+                import chromadb
+                _clients[key[0]] = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+            _collections[key] = _clients[key[0]].get_or_create_collection(name=CHROMA_COLLECTION_NAME)
+        return _collections[key]
 
-def get_db_integrated(filename,SETS_BASE_FOLDER="video_processing/Sets/",CHROMA_DB_PATH='chroma_db',CHROMA_COLLECTION_NAME='video_scenes'):
-    embedding_model = load_embedder()
-    client = chromadb.PersistentClient(path=CHROMA_DB_PATH) 
-    collection = client.get_or_create_collection(name=CHROMA_COLLECTION_NAME)
 
-    populate_chroma_db(embedding_model, collection, SETS_BASE_FOLDER, filename,CHROMA_COLLECTION_NAME)
\ No newline at end of file
+def get_lexical_index(CHROMA_DB_PATH='chroma_db', CHROMA_COLLECTION_NAME='video_scenes'):
+    """Returns the BM25 index kept next to a Chroma collection (see Search/Lexical_index.py)."""
+    path = os.path.abspath(lexical_index_path(CHROMA_DB_PATH, CHROMA_COLLECTION_NAME))
+    with _collections_lock:
+        if path not in _lexical_indexes:
+            _lexical_indexes[path] = BM25Index(path)
+        return _lexical_indexes[path]
+
+
+def get_moments_collection(CHROMA_DB_PATH='chroma_db', CHROMA_COLLECTION_NAME='video_scenes'):
+    """Returns the collection of timed moments kept next to a scene collection (see ChromaDB.populate_moments)."""
+    return get_collection(CHROMA_DB_PATH, f"{CHROMA_COLLECTION_NAME}_moments")
+
+
+def collection_name_for(owner_id=None, CHROMA_COLLECTION_NAME='video_scenes'):
+    """Returns the collection holding an owner's scenes (the shared one unless COLLECTION_PER_OWNER is on)."""
+    if COLLECTION_PER_OWNER and owner_id is not None:
+        return f"{CHROMA_COLLECTION_NAME}_owner_{owner_id}"
+    return CHROMA_COLLECTION_NAME
+
+# populate_chroma_db(get_model("embedder"), get_collection(), SETS_BASE_FOLDER, filename,CHROMA_COLLECTION_NAME)
+
+def get_db_integrated(filename,SETS_BASE_FOLDER="video_processing/Sets/",CHROMA_DB_PATH='chroma_db',CHROMA_COLLECTION_NAME='video_scenes',only_sets=None,index_metadata=None):
+    """
+    Embeds a video's scenes into ChromaDB.
+
+    :param index_metadata: Optional {"video_id": ..., "owner_id": ...} stored on every scene,
+                           so searches can be scoped to a video or an owner.
+    :return: List of the set names that are now indexed.
+    """
+    embedding_model = get_model("embedder")
+    collection_name = collection_name_for((index_metadata or {}).get("owner_id"), CHROMA_COLLECTION_NAME)
+    collection = get_collection(CHROMA_DB_PATH, collection_name)
+
+    indexed = populate_chroma_db(embedding_model, collection, SETS_BASE_FOLDER, filename,collection_name,only_sets,extra_metadata=index_metadata)
+    # Keep the lexical (BM25) index in step; unchanged scenes are skipped there too
+    get_lexical_index(CHROMA_DB_PATH, collection_name).upsert(scene_documents(SETS_BASE_FOLDER, filename, indexed, index_metadata))
+    # ...and the moment index used to refine timestamps within a scene
+    populate_moments(embedding_model, get_moments_collection(CHROMA_DB_PATH, collection_name), SETS_BASE_FOLDER, filename, indexed, index_metadata)
+    # Tell search processes to drop their cached results
+    bump_index_version(CHROMA_DB_PATH)
+    return indexed
+
+
+def delete_video_index(filename,SETS_BASE_FOLDER="video_processing/Sets/",CHROMA_DB_PATH='chroma_db',CHROMA_COLLECTION_NAME='video_scenes',owner_id=None):
+    """
+    Removes a video's scenes from ChromaDB and forgets that they were embedded,
+    so a later pipeline run indexes them again.
+
+    :param owner_id: The video's owner (selects the collection when COLLECTION_PER_OWNER is on).
+    :return: The number of entries deleted.
+    """
+    collection_name = collection_name_for(owner_id, CHROMA_COLLECTION_NAME)
+    collection = get_collection(CHROMA_DB_PATH, collection_name)
+    deleted = delete_video_from_chroma(collection, filename, SETS_BASE_FOLDER)
+    get_lexical_index(CHROMA_DB_PATH, collection_name).delete({"video": filename})
+    get_moments_collection(CHROMA_DB_PATH, collection_name).delete(where={"video": filename})
+    forget_stage(os.path.join(SETS_BASE_FOLDER, filename), "embedding")
+    bump_index_version(CHROMA_DB_PATH)
+    return deleted
+
+
+def reindex_video_index(filename,SETS_BASE_FOLDER="video_processing/Sets/",CHROMA_DB_PATH='chroma_db',CHROMA_COLLECTION_NAME='video_scenes',force=False,index_metadata=None):
+    """
+    Re-indexes one video: changed scenes are re-embedded and removed sets are deleted.
+
+    :param force: If True, the video's entries are wiped and embedded from scratch.
+    :param index_metadata: Optional {"video_id": ..., "owner_id": ...} stored on every scene.
+    :return: List of the set names that are now indexed.
+    """
+    embedding_model = get_model("embedder")
+    collection_name = collection_name_for((index_metadata or {}).get("owner_id"), CHROMA_COLLECTION_NAME)
+    collection = get_collection(CHROMA_DB_PATH, collection_name)
+    indexed = reindex_video(embedding_model, collection, SETS_BASE_FOLDER, filename, collection_name, force, index_metadata)
+
+    # Entries of this video outside the current sets (or all of them, when forced) are removed
+    stale = {"video": filename} if force or not indexed else {"$and": [{"video": filename}, {"set_name": {"$nin": indexed}}]}
+    lexical_index = get_lexical_index(CHROMA_DB_PATH, collection_name)
+    lexical_index.delete(stale)
+    lexical_index.upsert(scene_documents(SETS_BASE_FOLDER, filename, indexed, index_metadata))
+    moments_collection = get_moments_collection(CHROMA_DB_PATH, collection_name)
+    moments_collection.delete(where=stale)
+    populate_moments(embedding_model, moments_collection, SETS_BASE_FOLDER, filename, indexed, index_metadata)
+    bump_index_version(CHROMA_DB_PATH)
+    return indexed
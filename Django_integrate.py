@@ -1,5 +1,4 @@
 import os
-from Pipe1 import run_full_video_pipeline
 target_folder="video_processing/Video"
 
 def store_django_video(uploaded_file):
@@ -18,7 +17,8 @@ def store_django_video(uploaded_file):
         return None  # Return None to indicate failure
 
     # 2. Get the original filename from the uploaded file object
-    video_filename = uploaded_file.name
+    # (a stored FileField name includes its upload folder, e.g. 'videos/clip.mp4')
+    video_filename = os.path.basename(uploaded_file.name)
     
     # 3. Create the full destination path
     destination_path = os.path.join(target_folder, video_filename)
@@ -40,6 +40,19 @@ def store_django_video(uploaded_file):
         return None  # Return None to indicate failure
     return video_filename
     
-def initialise(uploaded_file):
-    filename = store_django_video(uploaded_file)
-    run_full_video_pipeline(filename)
\ No newline at end of file
+def initialise(uploaded_file, progress_callback=None, index_metadata=None):
+    """
+    Copies an uploaded video into the pipeline's folder and runs the full pipeline on it.
+
+    :param uploaded_file: An UploadedFile or a stored FileField (anything with .name and .chunks()).
+    :param progress_callback: Optional function called as progress_callback(percent, message).
+    :param index_metadata: Optional {"video_id": ..., "owner_id": ...} stored with the indexed scenes.
+    :return: 1 on success, None on failure.
+    """
+    # Imported here so importing this module does not load the ML stack
+    from Pipe1 import run_full_video_pipeline
+
+    destination_path = store_django_video(uploaded_file)
+    if destination_path is None:
+        return None
+    return run_full_video_pipeline(os.path.basename(destination_path), progress_callback, index_metadata)
\ No newline at end of file
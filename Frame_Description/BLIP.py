@@ -2,6 +2,7 @@ import torch
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
 import os
+from Result_cache.Cache import ResultCache, get_result_cache, hash_bytes, model_identity
 # import time
 
 
@@ -41,12 +42,70 @@ def load_model_blip():
 # end = time.time()
 # print(f"\nTotal execution time: {end - start:.4f} seconds")
 
+def load_image(image):
+    """Returns an RGB PIL image from a file path, a NumPy array (H x W x 3, RGB) or a PIL image."""
+    if isinstance(image, Image.Image):
+        return image.convert('RGB')
+    if isinstance(image, (str, os.PathLike)):
+        return Image.open(image).convert('RGB')
+    return Image.fromarray(image).convert('RGB')
+
+
+def caption_cache_key(raw_image, model):
+    """Builds the result-cache key for a caption from the image's decoded pixels."""
+    pixels_hash = hash_bytes(f"{raw_image.size}{raw_image.mode}".encode() + raw_image.tobytes())
+    return ResultCache.make_key("caption", pixels_hash, model_identity(model), {"max_new_tokens": 50})
+
+
 def get_description(image_path, model, processor, device):
-    raw_image = Image.open(image_path).convert('RGB')
+    raw_image = load_image(image_path)
+
+    cache = get_result_cache()
+    if cache is not None:
+        cache_key = caption_cache_key(raw_image, model)
+        description = cache.get("caption", cache_key)
+        if description is not None:
+            return description
+
     inputs = processor(raw_image, return_tensors="pt").to(device)
     out = model.generate(**inputs, max_new_tokens=50) 
     description = processor.decode(out[0], skip_special_tokens=True)
+
+    if cache is not None:
+        cache.put(cache_key, description)
     
     return description
 
 
+def get_descriptions_batch(images, model, processor, device, batch_size=8):
+    """
+    Captions many frames, running model.generate over micro-batches instead of one image at a time.
+    Frames found in the result cache are not sent to the model.
+
+    :param images: List of frame paths, NumPy arrays (H x W x 3, RGB) or PIL images.
+    :param batch_size: Number of images passed to model.generate at once.
+    :return: List of captions, in the same order as 'images'.
+    """
+    cache = get_result_cache()
+    descriptions = []
+    for start in range(0, len(images), batch_size):
+        raw_images = [load_image(image) for image in images[start:start + batch_size]]
+        batch_descriptions = [None] * len(raw_images)
+
+        if cache is not None:
+            cache_keys = [caption_cache_key(raw_image, model) for raw_image in raw_images]
+            batch_descriptions = [cache.get("caption", cache_key) for cache_key in cache_keys]
+
+        misses = [i for i, description in enumerate(batch_descriptions) if description is None]
+        if misses:
+            inputs = processor([raw_images[i] for i in misses], return_tensors="pt").to(device)
+            out = model.generate(**inputs, max_new_tokens=50)
+            for i, description in zip(misses, processor.batch_decode(out, skip_special_tokens=True)):
+                batch_descriptions[i] = description
+                if cache is not None:
+                    cache.put(cache_keys[i], description)
+
+        descriptions.extend(batch_descriptions)
+
+    return descriptions
+
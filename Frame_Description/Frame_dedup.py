@@ -0,0 +1,114 @@
+import os
+import time
+import json
+import threading
+import numpy as np
+from PIL import Image
+
+# Near-duplicate frame detection ahead of captioning. Dialogue scenes often hold the same
+# shot for many seconds, and BLIP then spends a full forward pass to repeat the caption.
+# Each frame is reduced to a small gray thumbnail; if it differs from the last captioned
+# frame of the same set by less than 'max_difference' (mean absolute difference, 0-1), that
+# frame's caption is reused and the frame keeps its own timestamp.
+# Comparing against the last *captioned* frame (not the previous one) means a slow drift
+# still triggers a new caption once it adds up.
+
+DEFAULT_MAX_DIFFERENCE = 0.03
+SIGNATURE_SIZE = (32, 32)
+DEDUP_STATS_FILENAME = "caption_dedup.json"
+
+
+def frame_signature(image, size=SIGNATURE_SIZE):
+    """
+    Returns a small gray thumbnail (float32, values 0-1) of a frame.
+
+    :param image: A frame path, a NumPy array (H x W x 3, RGB) or a PIL image.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        image = Image.open(image)
+        # Lets JPEG decode at a reduced scale; a no-op for other formats
+        image.draft("L", (size[0] * 4, size[1] * 4))
+    elif not isinstance(image, Image.Image):
+        image = Image.fromarray(image)
+    thumbnail = image.convert("L").resize(size, Image.BILINEAR)
+    return np.asarray(thumbnail, dtype=np.float32) / 255.0
+
+
+class FrameDeduplicator:
+    """
+    Tracks the last captioned frame of each set and spots frames nearly identical to it.
+    It also keeps the numbers for the report: frames seen, captions reused, and the time
+    spent on signatures and captioning.
+
+    :param max_difference: Mean absolute difference (0-1) under which two frames count as
+                           the same. 0 reuses only pixel-identical thumbnails.
+    """
+
+    def __init__(self, max_difference=DEFAULT_MAX_DIFFERENCE):
+        self.max_difference = max_difference
+        self.references = {}
+        self.frames = 0
+        self.reused = 0
+        self.captioned = 0
+        self.signature_seconds = 0.0
+        self.caption_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def find_duplicate(self, group, frame_id, image):
+        """
+        Compares a frame with the last captioned frame of its group (set).
+
+        :param group: Frames are only compared within the same group (e.g. the set folder).
+        :param frame_id: Any id the caller uses to look the caption up later.
+        :return: The frame_id of the earlier frame whose caption can be reused, or None if this
+                 frame must be captioned (it then becomes the group's reference frame).
+        """
+        start = time.perf_counter()
+        signature = frame_signature(image)
+        with self.lock:
+            self.signature_seconds += time.perf_counter() - start
+            self.frames += 1
+            reference = self.references.get(group)
+            if reference is not None and float(np.abs(signature - reference[1]).mean()) <= self.max_difference:
+                self.reused += 1
+                return reference[0]
+            self.references[group] = (frame_id, signature)
+            return None
+
+    def add_caption_time(self, seconds, count=1):
+        """Records time spent captioning 'count' frames, used to estimate the time saved."""
+        with self.lock:
+            self.caption_seconds += seconds
+            self.captioned += count
+
+    def stats(self):
+        """Returns the dedup report as a dictionary."""
+        seconds_per_caption = self.caption_seconds / self.captioned if self.captioned else 0.0
+        seconds_saved = self.reused * seconds_per_caption - self.signature_seconds
+        return {
+            "max_difference": self.max_difference,
+            "frames": self.frames,
+            "captioned": self.captioned,
+            "reused": self.reused,
+            "skipped_fraction": round(self.reused / self.frames, 4) if self.frames else 0.0,
+            "caption_seconds": round(self.caption_seconds, 3),
+            "signature_seconds": round(self.signature_seconds, 3),
+            "estimated_seconds_saved": round(seconds_saved, 3)
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("\n--- Caption Dedup ---")
+        print(f"  Frames: {stats['frames']}, captioned: {stats['captioned']}, "
+              f"reused: {stats['reused']} ({stats['skipped_fraction']:.0%} skipped)")
+        print(f"  Captioning took {stats['caption_seconds']:.2f}s; dedup saved ~{stats['estimated_seconds_saved']:.2f}s "
+              f"(after {stats['signature_seconds']:.2f}s of signatures)")
+
+    def save_stats(self, sets_base_folder):
+        """Writes the report to 'caption_dedup.json' in the video's sets folder."""
+        stats_path = os.path.join(sets_base_folder, DEDUP_STATS_FILENAME)
+        try:
+            with open(stats_path, 'w') as f:
+                json.dump(self.stats(), f, indent=2)
+        except Exception as e:
+            print(f"  [Error] Could not write {stats_path}: {e}")
@@ -1,6 +1,10 @@
 import os
+import time
+import random
+import asyncio
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
+from Result_cache.Cache import ResultCache, get_result_cache, hash_text, model_identity
 
 env_path = 'D:\clipquery_github\CLIPQUERY\Gemini_Description\.env'
 def load_llm(env_path):
@@ -30,6 +34,66 @@ Visuals:
 - Be concise. Output *only* the single summary sentence for the current scene.
 """
 
+RAW_CONTEXT_PROMPT_TEMPLATE = """
+You are an expert video summarizer creating a continuous, scene-by-scene description.
+
+Your task is to synthesize the transcript and frame descriptions for the CURRENT scene into a single, cohesive summary sentence.
+
+You MUST also consider the raw data of the PREVIOUS scene to ensure continuity and avoid repetition.
+
+## PREVIOUS SCENE DATA ##
+Transcript: {previous_transcript}
+Visuals:
+{previous_visuals}
+
+## CURRENT SCENE DATA ##
+Transcript: {transcript_text}
+Visuals:
+{formatted_visuals}
+
+**Instructions:**
+- Combine the transcript and visuals into one fluid sentence describing the main action and dialogue of the CURRENT scene.
+- Use the previous scene data for context ONLY. Do not describe the previous scene.
+- Be concise. Output *only* the single summary sentence for the current scene.
+"""
+
+
+def format_visuals(visuals):
+    """Formats a list of visual description objects as prompt lines."""
+    return "\n".join([f"- At {v['timestamp']}s: {v['description']}" for v in visuals])
+
+
+def build_scene_prompt(transcript, visuals, previous_summary=None, previous_data=None):
+    """
+    Builds the LLM prompt for a single scene.
+
+    :param previous_summary: The summary of the previous set (default context mode).
+    :param previous_data: The previous set's raw data.json contents. If given, it is used as
+                          context instead of the previous summary, so scenes do not depend
+                          on each other's output and can be summarized concurrently.
+    """
+    if previous_data is not None:
+        return RAW_CONTEXT_PROMPT_TEMPLATE.format(
+            previous_transcript=previous_data.get("transcript", ""),
+            previous_visuals=format_visuals(previous_data.get("visuals", [])),
+            transcript_text=transcript,
+            formatted_visuals=format_visuals(visuals)
+        )
+
+    # Handle the very first scene, which has no previous summary
+    if previous_summary is None:
+        previous_summary = "This is the first scene."
+
+    return PROMPT_TEMPLATE.format(
+        previous_description=previous_summary,
+        transcript_text=transcript,
+        formatted_visuals=format_visuals(visuals)
+    )
+
+
+def summary_cache_key(full_prompt, model):
+    """Builds the result-cache key for a summary from the exact prompt text."""
+    return ResultCache.make_key("summary", hash_text(full_prompt), model_identity(model))
 
 
 def generate_scene_summary(transcript, visuals, model, previous_summary=None):
@@ -45,25 +109,113 @@ def generate_scene_summary(transcript, visuals, model, previous_summary=None):
         print("LLM model is not loaded. Skipping summary generation.")
         return None
     
-    
-    # Handle the very first scene, which has no previous summary
-    if previous_summary is None:
-        previous_summary = "This is the first scene."
+    # 1. Create the final prompt
+    full_prompt = build_scene_prompt(transcript, visuals, previous_summary)
 
-    # 1. Format the data for the prompt
-    formatted_visuals = "\n".join([f"- At {v['timestamp']}s: {v['description']}" for v in visuals])
-    
-    # 2. Create the final prompt
-    full_prompt = PROMPT_TEMPLATE.format(
-        previous_description=previous_summary,
-        transcript_text=transcript,
-        formatted_visuals=formatted_visuals
-    )
+    # 2. Reuse a cached summary for the exact same prompt
+    cache = get_result_cache()
+    if cache is not None:
+        cache_key = summary_cache_key(full_prompt, model)
+        summary = cache.get("summary", cache_key)
+        if summary is not None:
+            return summary
     
     # 3. Call the LLM
     try:
         result = model.invoke(full_prompt)
-        return result.content.strip()
+        summary = result.content.strip()
+        if cache is not None:
+            cache.put(cache_key, summary)
+        return summary
     except Exception as e:
         print(f"  [Error] LLM invocation failed: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def is_rate_limit_error(error):
+    """Returns True if an LLM error looks like a rate-limit / quota error (HTTP 429)."""
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resourceexhausted" in text or "rate limit" in text or "quota" in text
+
+
+class RateLimiter:
+    """
+    Spaces out LLM calls so no more than 'requests_per_minute' start per minute.
+
+    When the API reports a rate-limit error, slow_down() pushes the next free slot
+    back, so every pending call waits, not just the one that failed.
+    """
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def slow_down(self, seconds):
+        self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+async def agenerate_scene_summary(transcript, visuals, model, previous_summary=None, previous_data=None,
+                                  semaphore=None, rate_limiter=None, max_retries=4, base_delay=2.0):
+    """
+    Async version of generate_scene_summary, using model.ainvoke with retries.
+
+    Failed calls are retried with exponential backoff and jitter. Rate-limit errors
+    back off twice as long and pause every caller sharing the same rate limiter.
+
+    :param previous_data: The previous set's raw data.json contents (see build_scene_prompt).
+    :param semaphore: Optional asyncio.Semaphore that caps concurrent LLM calls.
+    :param rate_limiter: Optional RateLimiter shared by all concurrent calls.
+    :param max_retries: How many times a failed call is retried.
+    :param base_delay: Backoff delay (in sec) before the first retry.
+    :return: A new summary string, or None on failure.
+    """
+    if not model:
+        print("LLM model is not loaded. Skipping summary generation.")
+        return None
+
+    full_prompt = build_scene_prompt(transcript, visuals, previous_summary, previous_data)
+
+    cache = get_result_cache()
+    if cache is not None:
+        cache_key = summary_cache_key(full_prompt, model)
+        summary = cache.get("summary", cache_key)
+        if summary is not None:
+            return summary
+
+    semaphore = semaphore or asyncio.Semaphore(1)
+    rate_limiter = rate_limiter or RateLimiter()
+
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            await rate_limiter.wait()
+            try:
+                result = await model.ainvoke(full_prompt)
+                summary = result.content.strip()
+                if cache is not None:
+                    cache.put(cache_key, summary)
+                return summary
+            except Exception as e:
+                error = e
+
+        if attempt == max_retries:
+            break
+        # Sleep outside the semaphore so other scenes can use the slot meanwhile
+        delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+        if is_rate_limit_error(error):
+            delay *= 2
+            rate_limiter.slow_down(delay)
+        print(f"  [Retry {attempt + 1}/{max_retries}] LLM call failed ({error}). Retrying in {delay:.1f}s...")
+        await asyncio.sleep(delay)
+
+    print(f"  [Error] LLM invocation failed: {error}")
+    return None
+
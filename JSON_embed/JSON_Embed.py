@@ -1,9 +1,10 @@
 import json
-from sentence_transformers import SentenceTransformer
 
 # --- 1. Load the Embedding Model ---
 # (Using a standard, available model)
 def load_embedder():
+    # Imported here so serializing scenes does not load torch
+    from sentence_transformers import SentenceTransformer
     try:
         print("Loading embedding model...")
         embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -45,18 +46,44 @@ def serialize_scene_to_text(scene_data: dict) -> str:
 
 # --- 3. Embedding Function (Unchanged) ---
 
-def get_embedding(text: str,embedding_model):
+def get_embedding(text: str,embedding_model,normalize=False):
     """
     Converts a single string of text into a numerical embedding.
+
+    :param normalize: If True, the embedding is scaled to unit length (use this for
+                      queries against collections built with get_embeddings_batch).
     """
     if embedding_model is None:
         print("Embedding model is not loaded. Cannot generate embedding.")
         return None
         
-    embedding = embedding_model.encode(text)
+    embedding = embedding_model.encode(text, normalize_embeddings=normalize)
     return embedding
 
 
+def get_embeddings_batch(texts, embedding_model, batch_size=32, normalize=True):
+    """
+    Converts many strings into embeddings in batches.
+
+    :param texts: List of strings to embed.
+    :param batch_size: Number of strings encoded per forward pass.
+    :param normalize: If True, embeddings are scaled to unit length, so L2 distance ranks like cosine.
+    :return: A float32 NumPy array of shape (len(texts), dimensions), or None if the model is not loaded.
+    """
+    if embedding_model is None:
+        print("Embedding model is not loaded. Cannot generate embeddings.")
+        return None
+
+    embeddings = embedding_model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=normalize,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return embeddings.astype("float32", copy=False)
+
+
 def generate_embedding_from_file(embedding_model,json_file_path: str):
     """
     Loads a scene JSON file, serializes it, and returns its embedding.
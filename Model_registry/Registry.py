@@ -0,0 +1,196 @@
+import gc
+import time
+import importlib
+import threading
+
+# A process-wide registry of the pipeline's ML models (BLIP, Whisper, the embedder and the LLM).
+# Each model is loaded the first time it is asked for and then shared by every pipeline module,
+# so a worker that processes many videos loads the weights once instead of once per video.
+#
+# Loaders are given as "module:function" strings and imported on first use, so importing
+# this module never pulls in torch, whisper or transformers.
+
+GEMINI_ENV_PATH = 'D:\\clipquery_github\\CLIPQUERY\\Gemini_Description\\.env'
+
+
+def module_bytes(module):
+    """Returns the memory held by a torch module's parameters and buffers, in bytes."""
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def estimate_model_bytes(model):
+    """
+    Estimates the memory used by a loaded model.
+
+    Handles torch modules and tuples that contain one (e.g. BLIP's (model, processor, device)).
+    Anything else (such as a remote LLM client) counts as 0.
+    """
+    items = model if isinstance(model, (tuple, list)) else [model]
+    return sum(module_bytes(item) for item in items if hasattr(item, "parameters") and hasattr(item, "buffers"))
+
+
+def import_function(path):
+    """Imports a function from a "package.module:function" string."""
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# --- Warm-up functions ---
+# Each runs one tiny inference so the first real request does not pay for lazy initialisation.
+
+def warm_up_blip(loaded):
+    from PIL import Image
+    model, processor, device = loaded
+    # Bypass the result cache so the model really runs
+    inputs = processor(Image.new('RGB', (64, 64)), return_tensors="pt").to(device)
+    model.generate(**inputs, max_new_tokens=5)
+
+
+def warm_up_whisper(loaded):
+    import numpy as np
+    loaded.transcribe(np.zeros(16000, dtype=np.float32))
+
+
+def warm_up_embedder(loaded):
+    loaded.encode(["warm up"])
+
+
+class ModelRegistry:
+    """
+    Lazily loads named models once per process and keeps track of their memory.
+
+    :param max_bytes: Optional memory budget. When loading a model would go over it,
+                      the least recently used other models are evicted first.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.specs = {}
+        self.models = {}
+        self.info = {}
+        self.lock = threading.RLock()
+
+    def register(self, name, loader, warmup=None):
+        """
+        Registers how to load a model.
+
+        :param loader: A function returning the model, or a "module:function" string.
+        :param warmup: Optional function (or "module:function" string) called with the loaded model.
+        """
+        with self.lock:
+            self.specs[name] = {"loader": loader, "warmup": warmup}
+
+    def get(self, name):
+        """Returns the named model, loading it on first use."""
+        with self.lock:
+            if name in self.models:
+                self.info[name]["last_used"] = time.time()
+                self.info[name]["uses"] += 1
+                return self.models[name]
+
+            if name not in self.specs:
+                raise KeyError(f"No model registered under '{name}'")
+            loader = self.specs[name]["loader"]
+            if isinstance(loader, str):
+                loader = import_function(loader)
+
+            print(f"[Model registry] Loading '{name}'...")
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            if model is None:
+                # Failed loads (e.g. a missing API key) are not cached so they can be retried
+                print(f"[Model registry] Loader for '{name}' returned nothing")
+                return None
+            size = estimate_model_bytes(model)
+
+            if self.max_bytes is not None:
+                self.make_room(size, keep=name)
+
+            self.models[name] = model
+            self.info[name] = {
+                "bytes": size,
+                "load_seconds": round(load_seconds, 2),
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "uses": 1,
+                "warmed_up": False
+            }
+            print(f"[Model registry] Loaded '{name}' in {load_seconds:.1f}s ({size / 1e6:.0f} MB)")
+            return model
+
+    def warm_up(self, names=None):
+        """Loads the given models (default: all registered) and runs their warm-up inference."""
+        for name in names or list(self.specs):
+            model = self.get(name)
+            warmup = self.specs[name]["warmup"]
+            if warmup is None or self.info[name]["warmed_up"]:
+                continue
+            if isinstance(warmup, str):
+                warmup = import_function(warmup)
+            try:
+                warmup(model)
+                self.info[name]["warmed_up"] = True
+            except Exception as e:
+                print(f"[Model registry] Warm-up of '{name}' failed: {e}")
+
+    def evict(self, name):
+        """Drops a loaded model so its memory can be reclaimed. It is reloaded on next use."""
+        with self.lock:
+            if self.models.pop(name, None) is None:
+                return False
+            self.info.pop(name, None)
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        print(f"[Model registry] Evicted '{name}'")
+        return True
+
+    def make_room(self, needed_bytes, keep=None):
+        """Evicts least recently used models until 'needed_bytes' more fit in the budget."""
+        by_age = sorted(self.info.items(), key=lambda item: item[1]["last_used"])
+        for name, _ in by_age:
+            if self.total_bytes() + needed_bytes <= self.max_bytes:
+                break
+            if name != keep:
+                self.evict(name)
+
+    def total_bytes(self):
+        return sum(info["bytes"] for info in self.info.values())
+
+    def memory_report(self):
+        """Returns {name: info} for every loaded model plus the total, for logging or metrics."""
+        with self.lock:
+            return {"total_bytes": self.total_bytes(), "models": {name: dict(info) for name, info in self.info.items()}}
+
+    def print_memory_report(self):
+        report = self.memory_report()
+        print(f"[Model registry] {len(report['models'])} model(s) loaded, {report['total_bytes'] / 1e6:.0f} MB")
+        for name, info in report["models"].items():
+            print(f"  {name}: {info['bytes'] / 1e6:.0f} MB, loaded in {info['load_seconds']}s, used {info['uses']} time(s)")
+
+
+def load_gemini():
+    from Gemini_Description.Gemini import load_llm
+    return load_llm(GEMINI_ENV_PATH)
+
+
+# --- Process-wide registry ---
+
+registry = ModelRegistry()
+registry.register("blip", "Frame_Description.BLIP:load_model_blip", warm_up_blip)
+registry.register("whisper", "Audio_transcription.Whisper:load_model_whisper", warm_up_whisper)
+registry.register("embedder", "JSON_embed.JSON_Embed:load_embedder", warm_up_embedder)
+registry.register("llm", load_gemini)
+
+
+def get_model(name):
+    """Returns a shared model from the process-wide registry ("blip", "whisper", "embedder" or "llm")."""
+    return registry.get(name)
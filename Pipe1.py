@@ -1,45 +1,59 @@
 import os
-from video_processing.Full_extraction import process_video
+import math
+from video_processing.Full_extraction import process_video, get_video_duration
+from video_processing.Stage_manifest import StageManifest, source_fingerprint
+from video_processing.Scene_detection import load_or_segment_video, print_segmentation_report, DEFAULT_SEGMENTATION
 from video_processing.Description_JSON_Generator import process_all_sets
-from Frame_Description.BLIP import get_description, load_model_blip
-from Audio_transcription.Whisper import load_model_whisper,get_transcript
+from Frame_Description.BLIP import get_description, get_descriptions_batch
+from Audio_transcription.Whisper import get_transcript,get_transcript_segments
 from Pipe_summarization import run_summarization_pipeline
+from Pipe_streaming import run_streaming_pipeline
 from DB_integrate import get_db_integrated
+from Result_cache.Cache import get_result_cache
+from Model_registry.Registry import get_model, registry
+from Pipeline_metrics.Metrics import PipelineMetrics, set_pipeline_metrics
+from Scene_store.Store import get_scene_store
 
 
-# Declare Path of Video
-filename = "Breaking Bad - _I am the Danger_ Scene S4 E6 1080p.mp4"
-VIDEO_PATH = os.path.join("video_processing/Video/",filename)
-OUTPUT_PATH = os.path.join("video_processing/Sets/",filename)
-SET_DURATION = 15.0  
-FRAME_GRAB_RATE = 2.0
-
-
-# # Get Sets Extracted
-# process_video(VIDEO_PATH, OUTPUT_PATH, chunk_duration=15.0, frame_interval=2.0)
-
-# # OUTPUT_PATH has the sets of out structure
-
-# # Next let's Process each set
-# process_all_sets(OUTPUT_PATH, FRAME_GRAB_RATE, get_transcript, get_description, load_model_blip, load_model_whisper)
-
-# # Get the Descriptions
-# run_summarization_pipeline(filename)
-
-#Serealize and Embed
-
-def run_full_video_pipeline(video_filename: str):
+def run_full_video_pipeline(video_filename: str, progress_callback=None, index_metadata=None, pipeline_mode=None):
     """
     Runs the complete video processing pipeline (Pipes 1, 2, and 3)
     for a given video filename.
+
+    Every stage reads and writes the video's scene store ('scenes.sqlite3', see
+    Scene_store/Store.py). Finished work is recorded in the video's 'stage_manifest.json',
+    so running it again only redoes the sets and stages that are missing or stale.
+
+    By default the stages overlap (see Pipe_streaming.py): each set is embedded as soon
+    as it is summarized, while later sets are still being extracted and captioned.
     
     :param video_filename: The name of the video file (e.g., "my_video.mp4")
                             located in 'video_processing/Video/'.
+    :param progress_callback: Optional function called as progress_callback(percent, message)
+                              when each stage starts, or as scenes get indexed in streaming
+                              mode (used by the Django worker).
+    :param index_metadata: Optional {"video_id": ..., "owner_id": ...} stored with every
+                           indexed scene, so searches can be scoped to a video or an owner.
+    :param pipeline_mode: Optional override of PIPELINE_MODE ("streaming" or "barrier").
     """
     
     # --- 1. Define Constants & Paths ---
     SET_DURATION = 15.0
     FRAME_GRAB_RATE = 2.0
+    CAPTION_BATCH_SIZE = 8
+    STREAM_FRAMES = True # Decode frames in memory instead of writing frame images
+    FRAME_ENCODING = {"format": "jpg", "size": 384, "quality": 90} # Written frames: BLIP's input size as JPEG (None = full-size PNG)
+    SUMMARY_CONTEXT_MODE = "summary" # "raw" summarizes sets concurrently
+    SUMMARY_CONCURRENCY = 8 # LLM calls in flight in "raw" mode
+    SUMMARY_REQUESTS_PER_MINUTE = None # Optional cap on LLM calls started per minute in "raw" mode
+    CAPTION_DEDUP = 0.03 # Frames this close to the last captioned one reuse its caption (None = off)
+    SPEECH_GATE = True # Skip Whisper on silent or music-only audio and trim silence around speech
+    SEGMENTATION = "adaptive" # "fixed" cuts a set every SET_DURATION seconds and a frame every FRAME_GRAB_RATE
+    PIPELINE_MODE = pipeline_mode or "streaming" # "barrier" finishes each stage for every set before starting the next
+    STAGE_WORKERS = {"extraction": 2, "transcription": 1, "captioning": 1, "summarization": 4, "embedding": 1}
+    STAGE_QUEUE_SIZE = 4 # Sets a streaming stage may finish ahead of the next one before it waits
+    PROFILE_STAGES = os.environ.get("CLIPQUERY_PROFILE") # "cprofile" or "pyinstrument" profiles every stage into 'profiles/'
+    LEGACY_JSON = os.environ.get("CLIPQUERY_LEGACY_JSON") == "1" # Also write the old per-set JSON files after each run
     
     VIDEO_PATH = os.path.join("video_processing/Video/", video_filename)
     OUTPUT_PATH = os.path.join("video_processing/Sets/", video_filename)
@@ -49,33 +63,173 @@ def run_full_video_pipeline(video_filename: str):
         print(f"[Error] Video file not found: {VIDEO_PATH}")
         print("Please make sure the video is in the 'video_processing/Video' folder.")
         return # Exit function
+
+    total_duration = get_video_duration(VIDEO_PATH)
+    if total_duration is None:
+        return
+    # The stage manifest records which sets finished which stage, so a re-run resumes
+    source_fp = source_fingerprint(VIDEO_PATH, {
+        "set_duration": SET_DURATION,
+        "frame_grab_rate": FRAME_GRAB_RATE,
+        # Streaming mode captions set by set from the extracted frame images
+        "stream_frames": STREAM_FRAMES and PIPELINE_MODE == "barrier",
+        "frame_encoding": FRAME_ENCODING if PIPELINE_MODE == "streaming" or not STREAM_FRAMES else None,
+        "summary_context_mode": SUMMARY_CONTEXT_MODE,
+        "caption_dedup": CAPTION_DEDUP,
+        "speech_gate": SPEECH_GATE,
+        "segmentation": DEFAULT_SEGMENTATION if SEGMENTATION == "adaptive" else SEGMENTATION
+    }, OUTPUT_PATH) # The video's digest is cached in the manifest, so an unchanged video is not rehashed
+    stage_manifest = StageManifest(OUTPUT_PATH, source_fp)
+
+    # Time, CPU, memory and counts per stage and set go to 'pipeline_metrics.json' (see Pipeline_metrics/Metrics.py)
+    metrics = PipelineMetrics(video_filename, PIPELINE_MODE, PROFILE_STAGES)
+    metrics.set_extra(video_seconds=round(total_duration, 3))
+    set_pipeline_metrics(metrics)
+
+    def save_metrics():
+        set_pipeline_metrics(None)
+        metrics.print_report()
+        metrics.save(OUTPUT_PATH)
+
+    def export_legacy_json():
+        if LEGACY_JSON:
+            get_scene_store(OUTPUT_PATH).export_legacy_json(set_names)
+
+    # Adaptive sets start at shot cuts and sample frames per shot (see Scene_detection.py)
+    set_plans = None
+    if SEGMENTATION == "adaptive":
+        with metrics.stage("segmentation"):
+            segmentation = load_or_segment_video(VIDEO_PATH, OUTPUT_PATH, source_fp, total_duration, SET_DURATION, FRAME_GRAB_RATE)
+        if segmentation is None:
+            print(f"[Error] Scene detection failed for {video_filename}")
+            save_metrics()
+            return
+        set_plans = segmentation["sets"]
+        print_segmentation_report(segmentation["report"])
+    num_sets = len(set_plans) if set_plans is not None else math.ceil(total_duration / SET_DURATION)
+    set_names = [f"set_{i + 1:03d}" for i in range(num_sets)]
         
+    def report(percent, message):
+        if progress_callback is not None:
+            progress_callback(percent, message)
+
+    if PIPELINE_MODE == "streaming":
+        # Sets go through all stages one after another, so early scenes are searchable early
+        run_streaming_pipeline(
+            video_filename,
+            VIDEO_PATH,
+            OUTPUT_PATH,
+            set_names,
+            stage_manifest,
+            total_duration,
+            chunk_duration=SET_DURATION,
+            frame_interval=FRAME_GRAB_RATE,
+            set_plans=set_plans,
+            transcript_segments_func=get_transcript_segments,
+            batch_caption_func=get_descriptions_batch,
+            caption_batch_size=CAPTION_BATCH_SIZE,
+            context_mode=SUMMARY_CONTEXT_MODE,
+            summary_concurrency=SUMMARY_CONCURRENCY,
+            requests_per_minute=SUMMARY_REQUESTS_PER_MINUTE,
+            dedup_max_difference=CAPTION_DEDUP,
+            speech_gate=SPEECH_GATE,
+            stage_workers=STAGE_WORKERS,
+            queue_size=STAGE_QUEUE_SIZE,
+            progress_callback=progress_callback,
+            index_metadata=index_metadata,
+            metrics=metrics,
+            frame_encoding=FRAME_ENCODING
+        )
+        print(f"\n--- 🚀 PIPELINE COMPLETE FOR {video_filename} ---")
+        cache = get_result_cache()
+        if cache is not None:
+            cache.print_stats()
+        registry.print_memory_report()
+        export_legacy_json()
+        save_metrics()
+        return 1
+
     # --- 3. Run Pipe 1: Video to Sets ---
     print(f"--- 1/3: Extracting sets from {video_filename} ---")
-    process_video(VIDEO_PATH, OUTPUT_PATH, chunk_duration=SET_DURATION, frame_interval=FRAME_GRAB_RATE)
-    print(f"--- Set extraction complete. ---")
+    report(5, "Extracting sets")
+    pending = stage_manifest.pending_sets("extraction", set_names)
+    if pending:
+        with metrics.stage("extraction"):
+            manifest = process_video(VIDEO_PATH, OUTPUT_PATH, chunk_duration=SET_DURATION, frame_interval=FRAME_GRAB_RATE, single_pass=True, write_frames=not STREAM_FRAMES, only_sets=pending, set_plans=set_plans, frame_encoding=FRAME_ENCODING)
+        if manifest is None:
+            print(f"[Error] Set extraction failed for {video_filename}")
+            save_metrics()
+            return
+        extracted = [entry["set_name"] for entry in manifest["sets"] if entry["ok"] and entry["set_name"] in pending]
+        stage_manifest.mark_done(extracted, "extraction", set_names)
+        metrics.count("extraction", sets=len(extracted), frames=sum(entry["frames"] for entry in manifest["sets"] if entry["set_name"] in extracted))
+    print(f"--- Set extraction complete ({len(set_names) - len(pending)} sets already done). ---")
     
-    # --- 4. Run Pipe 2: Sets to data.json ---
-    print(f"--- 2/3: Generating descriptions (data.json) ---")
-    # This call matches the structure from your snippet
-    process_all_sets(
-        OUTPUT_PATH, 
-        FRAME_GRAB_RATE, 
-        get_transcript, 
-        get_description, 
-        load_model_blip, 
-        load_model_whisper
-    )
-    print(f"--- Description generation complete. ---")
+    # --- 4. Run Pipe 2: Sets to descriptions ---
+    print("--- 2/3: Generating descriptions ---")
+    report(20, "Captioning frames and transcribing audio")
+    pending = stage_manifest.pending_sets("description", set_names)
+    if pending:
+        # This call matches the structure from your snippet
+        with metrics.stage("description"):
+            process_all_sets(
+                OUTPUT_PATH, 
+                FRAME_GRAB_RATE, 
+                get_transcript, 
+                get_description, 
+                lambda: get_model("blip"), 
+                lambda: get_model("whisper"),
+                batch_caption_func=get_descriptions_batch,
+                caption_batch_size=CAPTION_BATCH_SIZE,
+                video_path=VIDEO_PATH if STREAM_FRAMES else None,
+                segments_func=get_transcript_segments,
+                full_audio_path=VIDEO_PATH,
+                only_sets=pending,
+                dedup_max_difference=CAPTION_DEDUP,
+                speech_gate=SPEECH_GATE
+            )
+        stage_manifest.mark_done(pending, "description", set_names)
+        metrics.count("description", sets=len(pending))
+    print(f"--- Description generation complete ({len(set_names) - len(pending)} sets already done). ---")
     
-    # --- 5. Run Pipe 3: data.json to summary.json ---
-    print(f"--- 3/3: Generating final summaries (summary_data.json) ---")
-    # This function (from your Pipe 3 script) handles its own looping
-    run_summarization_pipeline(video_filename)
-    print(f"--- Final summary generation complete. ---")
+    # --- 5. Run Pipe 3: descriptions to summaries ---
+    print("--- 3/3: Generating final summaries ---")
+    report(60, "Summarizing scenes")
+    # In "summary" mode each summary is the next one's context, so a redone set redoes all later sets
+    pending = stage_manifest.pending_sets("summarization", set_names, cascade=SUMMARY_CONTEXT_MODE == "summary")
+    if pending:
+        # This function (from your Pipe 3 script) handles its own looping
+        with metrics.stage("summarization"):
+            run_summarization_pipeline(video_filename, context_mode=SUMMARY_CONTEXT_MODE, concurrency=SUMMARY_CONCURRENCY, requests_per_minute=SUMMARY_REQUESTS_PER_MINUTE, only_sets=pending)
+        # The set after a redone one may have had its 'previous_description' rewritten
+        touched = [name for i, name in enumerate(set_names) if name in pending or (i > 0 and set_names[i - 1] in pending)]
+        stage_manifest.mark_done(touched, "summarization", set_names)
+        metrics.count("summarization", sets=len(pending))
+    print(f"--- Final summary generation complete ({len(set_names) - len(pending)} sets already done). ---")
     
     print(f"\n--- 🚀 PIPELINE COMPLETE FOR {video_filename} ---")
     
-    get_db_integrated(video_filename)
+    report(90, "Indexing scenes for search")
+    pending = stage_manifest.pending_sets("embedding", set_names)
+    if pending:
+        with metrics.stage("embedding"):
+            embedded = get_db_integrated(video_filename, only_sets=pending, index_metadata=index_metadata)
+        stage_manifest.mark_done(embedded, "embedding", set_names)
+        metrics.count("embedding", sets=len(embedded))
+
+    cache = get_result_cache()
+    if cache is not None:
+        cache.print_stats()
+    registry.print_memory_report()
+    export_legacy_json()
+    save_metrics()
     
-    return 1
\ No newline at end of file
+    return 1
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python Pipe1.py <video filename> [--barrier]")
+        sys.exit(1)
+    run_full_video_pipeline(sys.argv[1], pipeline_mode="barrier" if "--barrier" in sys.argv else None)
@@ -0,0 +1,504 @@
+import os
+import time
+import queue
+import threading
+from contextlib import nullcontext
+from video_processing.Full_extraction import (
+    extract_set, iter_sets_single_pass, plan_set_bounds, set_manifest_entry, write_extraction_manifest, remove_extra_sets
+)
+from video_processing.Description_JSON_Generator import (
+    process_sets_batched, phrase_segments, save_transcript_segments, read_set_times
+)
+from Frame_Description.Frame_dedup import FrameDeduplicator, DEFAULT_MAX_DIFFERENCE
+from Audio_transcription.Voice_activity import SpeechGate
+from Pipe_summarization import summarize_set, write_summary_data, load_set_data, load_summary_data, SummaryLoop
+from Model_registry.Registry import get_model
+
+# Stage-overlapped version of the pipeline: instead of extracting every set, then captioning
+# every set, then summarizing every set, each set flows through the stages on its own:
+#
+#   extraction -> transcription -> captioning -> summarization -> embedding
+#
+# Each stage has its own worker threads and a bounded inbox. When a stage falls behind, its
+# inbox fills up and the stage before it blocks on put() (backpressure), so the number of sets
+# in flight never grows past the queue sizes. Set 1 can be searchable while set 20 is still
+# being extracted.
+#
+# Sets keep moving even when a stage fails on them (they are marked 'failed' and skipped by the
+# later stages), so ordered stages never wait for a set that will not come.
+
+DEFAULT_STAGE_WORKERS = {
+    "extraction": 2,    # Per-set FFmpeg processes on partial re-runs (a fresh run uses one single-pass process)
+    "transcription": 1, # Whisper and BLIP usually share one device, so one worker each
+    "captioning": 1,
+    "summarization": 4, # LLM calls in flight ("summary" mode always uses 1: each set needs the previous summary)
+    "embedding": 1      # One writer per Chroma collection
+}
+
+STOP = object()
+
+
+class Stage:
+    """
+    One step of a streaming pipeline: 'workers' threads take items from a bounded inbox,
+    run 'func' on them and pass them on to the next stage.
+
+    :param name: Used in reports and error messages.
+    :param func: Called with a list of items (dictionaries with an 'index' and a 'set_name').
+                 It updates them in place; raising marks the whole batch as failed.
+    :param workers: Number of threads running 'func'.
+    :param queue_size: Size of the inbox. A full inbox blocks the previous stage.
+    :param batch_size: Up to this many items already waiting in the inbox are handed to 'func'
+                       together. A batch never waits for more items to arrive.
+    :param ordered: If True, items reach 'func' in 'index' order, whatever order they arrived in.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=4, batch_size=1, ordered=False):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.ordered = ordered
+        self.inbox = queue.Queue(maxsize=max(1, queue_size))
+        # Ordered stages put a reorder buffer between the inbox and the workers
+        self.ready = queue.Queue(maxsize=max(1, queue_size)) if ordered else self.inbox
+        self.next_stage = None
+        self.metrics = None
+        self.lock = threading.Lock()
+        self.running = self.workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+
+    def put(self, item):
+        """Adds an item to the inbox, blocking while it is full. Returns the seconds spent blocked."""
+        start = time.perf_counter()
+        self.inbox.put(item)
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.inbox.qsize())
+        return time.perf_counter() - start
+
+    def close(self):
+        """Tells the stage no more items are coming (one stop marker per inbox reader)."""
+        for _ in range(1 if self.ordered else self.workers):
+            self.inbox.put(STOP)
+
+    def take_batch(self):
+        """Waits for one item, then adds whatever else is already waiting. Returns (batch, stopped)."""
+        item = self.ready.get()
+        if item is STOP:
+            return [], True
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def work(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self.take_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                with self.measured(batch):
+                    self.func(batch)
+            except Exception as e:
+                print(f"  [Error] Stage '{self.name}' failed on {', '.join(item['set_name'] for item in batch)}: {e}")
+                for item in batch:
+                    item["failed"] = True
+            with self.lock:
+                self.busy_seconds += time.perf_counter() - start
+                self.items += len(batch)
+            for item in batch:
+                if self.next_stage is not None:
+                    blocked = self.next_stage.put(item)
+                    with self.lock:
+                        self.blocked_seconds += blocked
+
+        # The last worker out closes the next stage
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+        if last and self.next_stage is not None:
+            self.next_stage.close()
+
+    def measured(self, batch):
+        """Times a call on the pipeline's metrics recorder, if there is one."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.measure(self.name, [item["set_name"] for item in batch])
+
+    def dispatch(self):
+        """Releases items from the inbox to the workers in 'index' order (ordered stages only)."""
+        buffer, next_index = {}, 0
+        while True:
+            item = self.inbox.get()
+            if item is STOP:
+                break
+            buffer[item["index"]] = item
+            while next_index in buffer:
+                self.ready.put(buffer.pop(next_index))
+                next_index += 1
+        for index in sorted(buffer):
+            self.ready.put(buffer[index])
+        for _ in range(self.workers):
+            self.ready.put(STOP)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "max_queue_depth": self.max_depth
+        }
+
+
+def run_stages(stages, items, metrics=None):
+    """
+    Runs items through the stages, each stage in its own threads, and waits until all are done.
+
+    :param stages: List of Stage objects, in order.
+    :param items: The items to feed into the first stage, in order.
+    :param metrics: Optional PipelineMetrics; every stage call is measured on it.
+    :return: {stage name: stage stats}.
+    """
+    for stage, next_stage in zip(stages, stages[1:]):
+        stage.next_stage = next_stage
+    for stage in stages:
+        stage.metrics = metrics
+
+    threads = []
+    for stage in stages:
+        if stage.ordered:
+            threads.append(threading.Thread(target=stage.dispatch, name=f"{stage.name}-dispatch", daemon=True))
+        threads.extend(threading.Thread(target=stage.work, name=f"{stage.name}-{i}", daemon=True) for i in range(stage.workers))
+    for thread in threads:
+        thread.start()
+
+    for item in items:
+        stages[0].put(item)
+    stages[0].close()
+    for thread in threads:
+        thread.join()
+    return {stage.name: stage.stats() for stage in stages}
+
+
+def print_stage_stats(stage_stats):
+    print("\n--- Streaming Stages ---")
+    for name, stats in stage_stats.items():
+        print(f"  {name:14s} {stats['items']:4d} sets  {stats['workers']} worker(s)  busy {stats['busy_seconds']:8.2f}s  "
+              f"blocked {stats['blocked_seconds']:7.2f}s  max queue {stats['max_queue_depth']}")
+
+
+def run_streaming_pipeline(video_filename, video_path, sets_base_folder, set_names, stage_manifest, total_duration,
+                           chunk_duration=15.0, frame_interval=2.0, set_plans=None, transcript_segments_func=None,
+                           batch_caption_func=None, caption_batch_size=8, context_mode="summary",
+                           dedup_max_difference=DEFAULT_MAX_DIFFERENCE, speech_gate=True, stage_workers=None,
+                           queue_size=4, embed_batch_size=4, embed_func=None, progress_callback=None, index_metadata=None,
+                           metrics=None, frame_encoding=None, summary_concurrency=8, requests_per_minute=None):
+    """
+    Runs extraction, transcription, captioning, summarization and embedding as overlapping stages.
+
+    Sets are embedded as soon as they are summarized, so the first scenes become searchable
+    while the rest of the video is still being processed. Finished work is read from and
+    recorded in the stage manifest, like the barrier pipeline in Pipe1.py: sets that are done
+    pass through a stage untouched, and a set redone by one stage is redone by all later ones.
+
+    When every set needs extracting, one single-pass FFmpeg run (see
+    Full_extraction.iter_sets_single_pass) cuts the whole video, and each set enters the
+    pipeline as soon as FFmpeg is done with it. A partial re-run extracts only the missing
+    sets, one FFmpeg run each. Unlike the barrier pipeline, each set's audio.mp3 is
+    transcribed on its own (there is no whole track to transcribe before the first set is
+    ready), and frames are always written to disk, since captioning runs set by set.
+
+    :param set_names: All set names of the video, in order.
+    :param stage_manifest: The video's StageManifest.
+    :param set_plans: Optional adaptive set plans (see Scene_detection.segment_video).
+    :param transcript_segments_func: Transcribes a file into timed pieces (takes path, model).
+    :param batch_caption_func: Captions a list of frames (takes paths, model, processor, device, batch_size).
+    :param context_mode: "summary" (each set waits for the previous summary) or "raw" (sets are
+                         summarized concurrently from the previous set's data).
+    :param summary_concurrency: Maximum LLM calls in flight in "raw" mode (also capped by the
+                                summarization stage's worker count).
+    :param requests_per_minute: Optional cap on LLM calls started per minute in "raw" mode.
+    :param stage_workers: Optional {stage name: worker count} overrides for DEFAULT_STAGE_WORKERS.
+    :param queue_size: Bound of every stage's inbox, i.e. how far a stage may run ahead of the next.
+    :param embed_batch_size: Most sets embedded together; a batch only takes sets already waiting.
+    :param embed_func: Indexes sets (takes video filename, set names, index metadata; returns the
+                       indexed set names). Defaults to DB_integrate.get_db_integrated.
+    :param progress_callback: Optional function called as progress_callback(percent, message).
+    :param metrics: Optional PipelineMetrics recording each stage's time, memory and counts.
+    :param frame_encoding: Optional format, size and quality of the frame images (see
+                           Full_extraction.frame_output_options). None writes full-resolution PNGs.
+    :return: A report dictionary (set counts, time to the first searchable scene, stage stats).
+    """
+    if embed_func is None:
+        from DB_integrate import get_db_integrated
+        embed_func = lambda filename, only_sets, metadata: get_db_integrated(filename, only_sets=only_sets, index_metadata=metadata)
+
+    workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+    if context_mode != "raw":
+        workers["summarization"] = 1
+    os.makedirs(sets_base_folder, exist_ok=True)
+    remove_extra_sets(sets_base_folder, len(set_names))
+
+    # Work that is already done (and still valid) is skipped; redone sets cascade through 'redo'
+    pending = {
+        "extraction": set(stage_manifest.pending_sets("extraction", set_names)),
+        "description": set(stage_manifest.pending_sets("description", set_names)),
+        "summarization": set(stage_manifest.pending_sets("summarization", set_names, cascade=context_mode == "summary")),
+        "embedding": set(stage_manifest.pending_sets("embedding", set_names))
+    }
+    for stage, stage_pending in pending.items():
+        print(f"  {stage}: {len(stage_pending)} of {len(set_names)} sets to do")
+
+    manifest_lock = threading.Lock()
+    def mark_done(names, stage):
+        with manifest_lock:
+            stage_manifest.mark_done(names, stage, set_names)
+
+    # Raw-mode summaries from every summarization worker share one event loop and its limits
+    summary_loop = SummaryLoop(summary_concurrency, requests_per_minute) if context_mode == "raw" else None
+    dedup = FrameDeduplicator(dedup_max_difference) if dedup_max_difference is not None else None
+    gate = SpeechGate() if speech_gate else None
+    extraction_entries = []
+    described_now, summarized_now = set(), set()
+    summary_done = [threading.Event() for _ in set_names]
+    indexed = []
+    start_time = time.perf_counter()
+    first_scene_seconds = None
+
+    def report(percent, message):
+        if progress_callback is not None:
+            progress_callback(percent, message)
+
+    def needs(item, stage):
+        return not item["failed"] and (item["redo"] or item["set_name"] in pending[stage])
+
+    def count(stage, **counts):
+        if metrics is not None:
+            metrics.count(stage, **counts)
+
+    # --- Stage 1: cut the set's audio clip and frames ---
+    # A fresh run decodes the video once: a background thread runs the single-pass extractor
+    # and hands each set over as FFmpeg finishes it
+    single_pass = bool(set_names) and len(pending["extraction"]) == len(set_names)
+    single_pass_entries = {}
+    single_pass_ready = [threading.Event() for _ in set_names]
+
+    def run_single_pass():
+        try:
+            sets = iter_sets_single_pass(video_path, sets_base_folder, total_duration, chunk_duration, frame_interval,
+                                         set_plans=set_plans, frame_encoding=frame_encoding)
+            for index, entry in enumerate(sets):
+                single_pass_entries[index] = entry
+                single_pass_ready[index].set()
+        except Exception as e:
+            print(f"  [Error] Single-pass extraction failed: {e}")
+        finally:
+            for ready in single_pass_ready:
+                ready.set()
+
+    def single_pass_entry(item):
+        single_pass_ready[item["index"]].wait()
+        entry = single_pass_entries.get(item["index"])
+        if entry is None:
+            start, end = plan_set_bounds(total_duration, chunk_duration, set_plans)[item["index"]]
+            entry = set_manifest_entry(item["folder"], item["index"] + 1, start, end, errors=["single-pass extraction stopped"])
+        return entry
+
+    def extract(batch):
+        for item in batch:
+            if item["set_name"] not in pending["extraction"]:
+                start, end = read_set_times(item["folder"])
+                extraction_entries.append(set_manifest_entry(item["folder"], item["index"] + 1, start or 0.0, end or 0.0))
+                continue
+            if single_pass:
+                entry = single_pass_entry(item)
+            else:
+                plan = set_plans[item["index"]] if set_plans else None
+                entry = extract_set(video_path, sets_base_folder, item["index"], total_duration, chunk_duration, frame_interval, set_plan=plan, frame_encoding=frame_encoding)
+            extraction_entries.append(entry)
+            if not entry["ok"]:
+                print(f"  [Error] Extraction failed for {item['set_name']}: {'; '.join(entry['errors'])}")
+                item["failed"] = True
+                continue
+            mark_done([item["set_name"]], "extraction")
+            count("extraction", sets=1, frames=entry["frames"])
+            item["redo"] = True
+
+    # --- Stage 2: transcribe the set's audio (only its speech, with the gate) ---
+    def transcribe(batch):
+        model_t = get_model("whisper")
+        for item in batch:
+            if not needs(item, "description"):
+                continue
+            audio_file = os.path.join(item["folder"], "audio.mp3")
+            set_start, _ = read_set_times(item["folder"])
+            if gate is not None:
+                pieces = gate.transcribe_track(audio_file, transcript_segments_func, model_t, item["folder"])
+                gate.mark_silent_sets([item["folder"]], [pieces])
+            else:
+                pieces = transcript_segments_func(audio_file, model_t)
+            # Clip times start at 0; the moment index wants video times
+            pieces = [{**piece, "start": piece["start"] + set_start, "end": piece["end"] + set_start} for piece in pieces]
+            item["transcript"] = "".join(piece["text"] for piece in pieces).strip()
+            save_transcript_segments(item["folder"], phrase_segments(pieces))
+            count("transcription", sets=1, pieces=len(pieces))
+
+    # --- Stage 3: caption the frames and save the set's description ---
+    def caption(batch):
+        todo = [item for item in batch if needs(item, "description")]
+        if not todo:
+            return
+        model_c, processor, device = get_model("blip")
+        transcripts = {item["folder"]: item.get("transcript", "") for item in todo}
+        all_data = process_sets_batched(
+            [item["folder"] for item in todo],
+            frame_interval,
+            lambda audio_file, model_t: transcripts.get(os.path.dirname(audio_file), ""),
+            batch_caption_func,
+            model_c,
+            processor,
+            device,
+            None,
+            caption_batch_size,
+            dedup
+        )
+        for item in todo:
+            if load_set_data(item["folder"]) is None:
+                item["failed"] = True
+                continue
+            described_now.add(item["set_name"])
+            item["redo"] = True
+        mark_done([item["set_name"] for item in todo if not item["failed"]], "description")
+        count("captioning", sets=len(all_data), frames=sum(len(data["visuals"]) for data in all_data))
+
+    # --- Stage 4: summarize, with the previous set as context ---
+    def summarize(batch):
+        for item in batch:
+            try:
+                summarize_item(item)
+            finally:
+                summary_done[item["index"]].set()
+
+    def summarize_item(item):
+        index, previous_name = item["index"], set_names[item["index"] - 1] if item["index"] > 0 else None
+        # A redone previous set changes this set's context
+        previous_changed = previous_name in (summarized_now if context_mode == "summary" else described_now)
+        if item["failed"] or not (needs(item, "summarization") or previous_changed):
+            return
+        current_set_data = load_set_data(item["folder"])
+        if current_set_data is None:
+            item["failed"] = True
+            return
+        model_object = get_model("llm")
+        if not model_object:
+            print("[Error] Model object is None. Cannot summarize.")
+            item["failed"] = True
+            return
+
+        previous_folder = os.path.join(sets_base_folder, previous_name) if previous_name else None
+        previous_data = load_set_data(previous_folder) if previous_folder else None
+        if context_mode == "raw":
+            new_summary = summarize_set(item["folder"], current_set_data, model_object, previous_data=previous_data, context_mode="raw", summary_loop=summary_loop)
+            # The summary links to the previous summary, which may still be in flight
+            if index > 0:
+                summary_done[index - 1].wait()
+        previous_summary = load_summary_data(previous_folder) if previous_folder else None
+        previous_summary_text = previous_summary["scene_summary"] if previous_summary else None
+        if context_mode != "raw":
+            new_summary = summarize_set(item["folder"], current_set_data, model_object, previous_summary_text=previous_summary_text)
+
+        if not new_summary:
+            print(f"  Failed to generate summary for {item['set_name']}. Skipping.")
+            item["failed"] = True
+            return
+        print(f"  Generated Summary: {new_summary}")
+        if write_summary_data(item["folder"], previous_summary_text, new_summary) is None:
+            item["failed"] = True
+            return
+        mark_done([item["set_name"]], "summarization")
+        count("summarization", sets=1)
+        summarized_now.add(item["set_name"])
+        item["redo"] = True
+
+    # --- Stage 5: embed whatever sets are ready ---
+    def embed(batch):
+        nonlocal first_scene_seconds
+        names = [item["set_name"] for item in batch if needs(item, "embedding")]
+        if names:
+            embedded = embed_func(video_filename, names, index_metadata) or []
+            mark_done(embedded, "embedding")
+            count("embedding", sets=len(embedded))
+            for item in batch:
+                if item["set_name"] in names and item["set_name"] not in embedded:
+                    item["failed"] = True
+        indexed.extend(item["set_name"] for item in batch if not item["failed"])
+        if indexed and first_scene_seconds is None:
+            first_scene_seconds = time.perf_counter() - start_time
+            print(f"  First scenes searchable after {first_scene_seconds:.1f}s")
+            if metrics is not None:
+                metrics.set_extra(first_scene_seconds=round(first_scene_seconds, 3))
+        report(5 + int(90 * len(indexed) / len(set_names)), f"Indexed {len(indexed)} of {len(set_names)} scenes")
+
+    stages = [
+        Stage("extraction", extract, workers["extraction"], queue_size),
+        Stage("transcription", transcribe, workers["transcription"], queue_size),
+        # Two sets per call lets a caption batch span a set boundary, as in the barrier pipeline
+        Stage("captioning", caption, workers["captioning"], queue_size, batch_size=2),
+        Stage("summarization", summarize, workers["summarization"], queue_size, ordered=True),
+        Stage("embedding", embed, workers["embedding"], queue_size, batch_size=embed_batch_size)
+    ]
+    items = [
+        {"index": i, "set_name": set_name, "folder": os.path.join(sets_base_folder, set_name), "redo": False, "failed": False}
+        for i, set_name in enumerate(set_names)
+    ]
+    report(5, "Processing scenes")
+    print(f"--- Streaming {len(set_names)} sets through {len(stages)} stages ---")
+    extractor = threading.Thread(target=run_single_pass, name="single-pass-extraction", daemon=True) if single_pass else None
+    if extractor is not None:
+        extractor.start()
+    try:
+        stage_stats = run_stages(stages, items, metrics)
+    finally:
+        if extractor is not None:
+            extractor.join()
+        if summary_loop is not None:
+            summary_loop.close()
+    if metrics is not None:
+        metrics.set_extra(stage_queues=stage_stats)
+
+    # Written once every set has gone through
+    manifest = write_extraction_manifest(sets_base_folder, video_path, extraction_entries)
+    if dedup is not None:
+        dedup.print_stats()
+        dedup.save_stats(sets_base_folder)
+    if gate is not None:
+        gate.print_stats()
+        gate.save_stats(sets_base_folder)
+    print_stage_stats(stage_stats)
+
+    failed = sorted(item["set_name"] for item in items if item["failed"])
+    if failed:
+        print(f"\n[Warning] {len(failed)} set(s) failed: {', '.join(failed)}")
+    total_seconds = time.perf_counter() - start_time
+    print(f"  {len(indexed)} of {len(set_names)} scenes indexed in {total_seconds:.1f}s")
+    return {
+        "sets": len(set_names),
+        "indexed": len(indexed),
+        "failed": failed,
+        "extraction_failed": manifest["failed"],
+        "first_scene_seconds": round(first_scene_seconds, 3) if first_scene_seconds is not None else None,
+        "total_seconds": round(total_seconds, 3),
+        "stages": stage_stats
+    }
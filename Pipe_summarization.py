@@ -1,86 +1,70 @@
 import os
-import json
-import glob
-from Gemini_Description.Gemini import generate_scene_summary, load_llm
+import asyncio
+import threading
+from Gemini_Description.Gemini import generate_scene_summary, agenerate_scene_summary, RateLimiter
+from Model_registry.Registry import get_model
+from Pipeline_metrics.Metrics import set_timer
+from Scene_store.Store import get_scene_store, set_store
 
 
-def run_summarization_pipeline(VIDEO_FILENAME):
-    """
-    Runs the main summarization pipeline.
+def write_context_data(set_folder, previous_context):
+    """Records the context a set is summarized with (the previous summary or the previous set's data)."""
+    store, set_name = set_store(set_folder)
+    try:
+        store.put_context(set_name, previous_context)
+        print(f"  Successfully saved the context of {set_name}")
+    except Exception as e:
+        print(f"  [Error] Could not save the context of {set_name}: {e}")
+
+
+def write_summary_data(set_folder, previous_summary_text, new_summary):
     """
-    
-    env_path = 'D:\clipquery_github\CLIPQUERY\Gemini_Description\.env'
-    model_object = load_llm(env_path)
-    
-    if not model_object:
-        print("[Error] Model object is None. Cannot start pipeline.")
-        print("Please check your .env file, API key, and model name in 'Gemini.py'.")
-        return
+    Saves the summary of one set in the scene store.
 
-    print(" Starting Context-Aware Summary Task ")
-    
+    :return: The summary data dictionary (times, previous_description, scene_summary,
+             transcript, visuals), or None if it could not be saved.
+    """
+    store, set_name = set_store(set_folder)
+    try:
+        output_data = store.put_summary(set_name, previous_summary_text, new_summary)
+        print(f"  Successfully saved the summary of {set_name}")
+        return output_data
+    except Exception as e:
+        print(f"  [Error] Could not save the summary of {set_name}: {e}")
+        return None
 
-    sets_base_folder = os.path.join("video_processing/Sets/", VIDEO_FILENAME)
-    
-    if not os.path.isdir(sets_base_folder):
-        print(f"[Fatal Error] Sets folder not found at: {sets_base_folder}")
-        print("This folder is created by Pipe1.py. Please run it first.")
-        return
 
-    # 2. Find all 'set_...' folders in order
-    set_folders = sorted(glob.glob(os.path.join(sets_base_folder, "set_*")))
-    
-    if not set_folders:
-        print(f"[Error] No 'set_...' folders found in {sets_base_folder}.")
-        print("Please run Pipe2.py to generate 'data.json' files.")
-        return
-        
-    print(f"Found {len(set_folders)} sets to process.")
+def summarize_chained(loaded_sets, model_object, existing_summaries=None):
+    """
+    Summarizes sets one after another, each using the previous set's summary as context.
 
-    # 3. This variable will hold the summary of the previous scene
+    :param loaded_sets: List of (set_folder, set data) tuples, in order.
+    :param existing_summaries: Optional {set_folder: summary data} of sets that are already done.
+    :return: List of summary data dictionaries that were saved.
+    """
+    existing_summaries = existing_summaries or {}
+    # This variable will hold the summary of the previous scene
     previous_summary_text = None
     all_summaries = []
 
-    # 4. Loop through each set folder
-    for set_folder in set_folders:
-        data_json_path = os.path.join(set_folder, "data.json")
-        
-        if not os.path.exists(data_json_path):
-            print(f" {set_folders} [Skipping] No 'data.json' found in {os.path.basename(set_folder)} (Run Pipe_summarization)")
+    for set_folder, current_set_data in loaded_sets:
+        if set_folder in existing_summaries:
+            all_summaries.append(existing_summaries[set_folder])
+            previous_summary_text = existing_summaries[set_folder]["scene_summary"]
             continue
-        
+
         print(f"\nProcessing {os.path.basename(set_folder)}...")
-        
-        # Read the data from Pipe 2
-        with open(data_json_path, 'r') as f:
-            current_set_data = json.load(f)
-        
-        
-        # 1. Copy the "previous format" data
-        context_json_data = current_set_data.copy() 
-        
-        # 2. Add the new key with the context from the last loop
-        context_json_data["previous_context"] = previous_summary_text
-        
-        # 3. Define the new file path
-        context_json_path = os.path.join(set_folder, "context_data.json")
-        
-        # 4. Save the new file
-        try:
-            with open(context_json_path, 'w') as f:
-                json.dump(context_json_data, f, indent=2)
-            print(f"  Successfully saved 'context_data.json'")
-        except Exception as e:
-            print(f"  [Error] Could not write 'context_data.json': {e}")
+        write_context_data(set_folder, previous_summary_text)
 
         # Call the LLM to generate the new summary for *this* set
         print("  Calling Gemini to generate summary...")
-        new_summary = generate_scene_summary(
-            transcript=current_set_data["transcript"],
-            visuals=current_set_data["visuals"],
-            model=model_object,
-            previous_summary=previous_summary_text 
-        )
+        with set_timer("summarization", os.path.basename(set_folder)):
+            new_summary = generate_scene_summary(
+                transcript=current_set_data["transcript"],
+                visuals=current_set_data["visuals"],
+                model=model_object,
+                previous_summary=previous_summary_text 
+            )
         
         if not new_summary:
             print("  Failed to generate summary for this set. Skipping.")
@@ -88,37 +72,223 @@ def run_summarization_pipeline(VIDEO_FILENAME):
         
         print(f"  Generated Summary: {new_summary}")
 
-        # Create the 'summary_data.json' structure (as before)
-        output_data = {
-            "start_time": current_set_data["start_time"],
-            "end_time": current_set_data["end_time"],
-            "previous_description": previous_summary_text, 
-            "scene_summary": new_summary,                 
-            "transcript": current_set_data["transcript"], 
-            "visuals": current_set_data["visuals"]        
-        }
-        
-        # Save the 'summary_data.json' file (as before)
-        output_json_path = os.path.join(set_folder, "summary_data.json")
-        try:
-            with open(output_json_path, 'w') as f:
-                json.dump(output_data, f, indent=2)
-            print(f"  Successfully saved 'summary_data.json'")
+        output_data = write_summary_data(set_folder, previous_summary_text, new_summary)
+        if output_data:
             all_summaries.append(output_data)
-        except Exception as e:
-            print(f"  [Error] Could not write 'summary_data.json' file: {e}")
 
         # CRITICAL STEP: Update the 'previous_summary' for the *next* loop
         previous_summary_text = new_summary
 
-    # Save one big file with all the new data (as before)
-    all_data_file = os.path.join(sets_base_folder, "all_summary_data.json")
-    try:
-        with open(all_data_file, 'w') as f:
-            json.dump(all_summaries, f, indent=2)
-        print(f"\n--- ✨ Task Complete ---")
-        print(f"All summary data combined and saved to: {all_data_file}")
-    except Exception as e:
-        print(f"\n[Error] Could not write combined summary JSON: {e}")
+    return all_summaries
+
+
+async def summarize_concurrently(loaded_sets, model_object, concurrency=8, requests_per_minute=None, existing_summaries=None):
+    """
+    Summarizes all sets concurrently, each using the previous set's raw data as context.
+
+    Since no scene waits for another scene's summary, up to 'concurrency' LLM calls
+    are in flight at once. Once every summary is back, 'previous_description' is filled
+    in from the previous set's summary, so summaries keep their usual layout.
+
+    :param loaded_sets: List of (set_folder, set data) tuples, in order.
+    :param concurrency: Maximum number of LLM calls in flight.
+    :param requests_per_minute: Optional cap on how many LLM calls start per minute.
+    :param existing_summaries: Optional {set_folder: summary data} of sets that are already done.
+    :return: List of summary data dictionaries that were saved.
+    """
+    existing_summaries = existing_summaries or {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    rate_limiter = RateLimiter(requests_per_minute)
+
+    tasks = {}
+    previous_data = None
+    for set_folder, current_set_data in loaded_sets:
+        if set_folder in existing_summaries:
+            previous_data = current_set_data
+            continue
+        write_context_data(set_folder, previous_data)
+        tasks[set_folder] = asyncio.ensure_future(agenerate_scene_summary(
+            transcript=current_set_data["transcript"],
+            visuals=current_set_data["visuals"],
+            model=model_object,
+            previous_data=previous_data or {"transcript": "This is the first scene.", "visuals": []},
+            semaphore=semaphore,
+            rate_limiter=rate_limiter
+        ))
+        previous_data = current_set_data
+
+    print(f"  Calling Gemini for {len(tasks)} sets ({concurrency} at a time)...")
+    await asyncio.gather(*tasks.values())
+
+    all_summaries = []
+    previous_summary_text = None
+    for set_folder, current_set_data in loaded_sets:
+        if set_folder in existing_summaries:
+            output_data = existing_summaries[set_folder]
+            # Keep the link to the previous summary up to date if that one was regenerated
+            if output_data["previous_description"] != previous_summary_text:
+                output_data = write_summary_data(set_folder, previous_summary_text, output_data["scene_summary"]) or output_data
+            all_summaries.append(output_data)
+            previous_summary_text = output_data["scene_summary"]
+            continue
+
+        new_summary = tasks[set_folder].result()
+        print(f"\nSaving {os.path.basename(set_folder)}...")
+        if not new_summary:
+            print("  Failed to generate summary for this set. Skipping.")
+            continue
+        print(f"  Generated Summary: {new_summary}")
+        output_data = write_summary_data(set_folder, previous_summary_text, new_summary)
+        if output_data:
+            all_summaries.append(output_data)
+        previous_summary_text = new_summary
+
+    return all_summaries
+
+
+class SummaryLoop:
+    """
+    A background event loop that runs every concurrent summary call of a pipeline run.
+
+    Stage threads (see Pipe_streaming.py) submit calls with summarize() and wait for the
+    result, so all calls share one semaphore and one RateLimiter: 'requests_per_minute'
+    holds across threads, and a rate-limit error slows every caller down. The LLM client's
+    async session also stays on a single event loop.
+
+    :param concurrency: Maximum number of LLM calls in flight.
+    :param requests_per_minute: Optional cap on how many LLM calls start per minute.
+    """
+
+    def __init__(self, concurrency=8, requests_per_minute=None):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="summary-loop", daemon=True)
+        self.thread.start()
+
+        async def create_limits():
+            return asyncio.Semaphore(max(1, concurrency)), RateLimiter(requests_per_minute)
+        self.semaphore, self.rate_limiter = self.run(create_limits())
+
+    def run(self, coroutine):
+        """Runs a coroutine on the loop and waits for its result (call from any other thread)."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def summarize(self, transcript, visuals, model, previous_data=None):
+        """Summarizes one set from the previous set's raw data. Returns the summary, or None on failure."""
+        return self.run(agenerate_scene_summary(
+            transcript=transcript,
+            visuals=visuals,
+            model=model,
+            previous_data=previous_data or {"transcript": "This is the first scene.", "visuals": []},
+            semaphore=self.semaphore,
+            rate_limiter=self.rate_limiter
+        ))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def load_set_data(set_folder):
+    """Reads a set's description (times, transcript, visuals) from the scene store. Returns None if it has none."""
+    store, set_name = set_store(set_folder)
+    return store.get_set_data(set_name)
+
+
+def load_summary_data(set_folder):
+    """Reads a set's summary data from the scene store. Returns None if it has none."""
+    store, set_name = set_store(set_folder)
+    return store.get_summary_data(set_name)
+
+
+def summarize_set(set_folder, current_set_data, model_object, previous_summary_text=None, previous_data=None, context_mode="summary", summary_loop=None):
+    """
+    Summarizes a single set, for callers that summarize sets as they arrive (see Pipe_streaming.py).
+
+    Saves the set's context but not its summary: in "raw" mode the previous set's
+    summary may still be on its way, so the caller saves it with write_summary_data.
+
+    :param previous_summary_text: The previous set's summary ("summary" mode context).
+    :param previous_data: The previous set's data ("raw" mode context).
+    :param summary_loop: The run's SummaryLoop; "raw" mode calls go through it, so concurrent
+                         callers share its concurrency and rate limits.
+    :return: The new summary string, or None on failure.
+    """
+    print(f"\nProcessing {os.path.basename(set_folder)}...")
+    if context_mode == "raw":
+        write_context_data(set_folder, previous_data)
+        if summary_loop is not None:
+            return summary_loop.summarize(current_set_data["transcript"], current_set_data["visuals"], model_object, previous_data)
+        return asyncio.run(agenerate_scene_summary(
+            transcript=current_set_data["transcript"],
+            visuals=current_set_data["visuals"],
+            model=model_object,
+            previous_data=previous_data or {"transcript": "This is the first scene.", "visuals": []}
+        ))
+
+    write_context_data(set_folder, previous_summary_text)
+    return generate_scene_summary(
+        transcript=current_set_data["transcript"],
+        visuals=current_set_data["visuals"],
+        model=model_object,
+        previous_summary=previous_summary_text
+    )
+
+
+def run_summarization_pipeline(VIDEO_FILENAME, model_object=None, context_mode="summary", concurrency=8, requests_per_minute=None, only_sets=None):
+    """
+    Runs the main summarization pipeline.
+
+    :param VIDEO_FILENAME: Name of the video whose sets are summarized.
+    :param model_object: Optional LLM to use instead of loading Gemini (anything with invoke/ainvoke).
+    :param context_mode: "summary" chains each set to the previous set's summary (sequential).
+                         "raw" uses the previous set's data instead, so sets are summarized concurrently.
+    :param concurrency: Maximum number of LLM calls in flight in "raw" mode.
+    :param requests_per_minute: Optional cap on LLM calls started per minute in "raw" mode.
+    :param only_sets: Optional list of set names (e.g. ["set_004"]) to summarize. Other sets keep
+                      their existing summary and still provide context.
+    """
+    
+    if model_object is None:
+        model_object = get_model("llm")
+    
+    if not model_object:
+        print("[Error] Model object is None. Cannot start pipeline.")
+        print("Please check your .env file, API key, and model name in 'Gemini.py'.")
+        return
+
+    print(" Starting Context-Aware Summary Task ")
+    
+
+    sets_base_folder = os.path.join("video_processing/Sets/", VIDEO_FILENAME)
+    
+    if not os.path.isdir(sets_base_folder):
+        print(f"[Fatal Error] Sets folder not found at: {sets_base_folder}")
+        print("This folder is created by Pipe1.py. Please run it first.")
+        return
+
+    # 2. Read every described set from the scene store, in order
+    store = get_scene_store(sets_base_folder)
+    all_set_data = store.all_set_data()
+    if not all_set_data:
+        print(f"[Error] No described sets found in {sets_base_folder}.")
+        print("Please run Pipe2.py to generate the set descriptions.")
+        return
+    print(f"Found {len(all_set_data)} sets to process.")
+    loaded_sets = [(os.path.join(sets_base_folder, set_name), data) for set_name, data in all_set_data.items()]
+
+    # Sets outside 'only_sets' that already have a summary are reused as-is
+    existing_summaries = {}
+    if only_sets is not None:
+        summaries = store.all_summary_data([set_name for set_name in all_set_data if set_name not in only_sets])
+        existing_summaries = {os.path.join(sets_base_folder, set_name): summary for set_name, summary in summaries.items()}
+        print(f"Reusing {len(existing_summaries)} existing summaries.")
 
+    # 3. Summarize every set
+    if context_mode == "raw":
+        all_summaries = asyncio.run(summarize_concurrently(loaded_sets, model_object, concurrency, requests_per_minute, existing_summaries))
+    else:
+        all_summaries = summarize_chained(loaded_sets, model_object, existing_summaries)
 
+    print(f"\n--- ✨ Task Complete ---")
+    print(f"{len(all_summaries)} summaries saved to the scene store.")
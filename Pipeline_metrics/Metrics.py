@@ -0,0 +1,450 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+# Per-video instrumentation of the pipeline: wall time, CPU time, peak memory (RSS) and item
+# counts for every stage, plus wall and CPU time per set where a stage works set by set.
+# The numbers are saved as 'pipeline_metrics.json' in the video's sets folder and can be
+# rendered in the Prometheus text format (see prometheus_text), which the Django app serves.
+#
+#   - Stages run in the pipeline's own thread (barrier mode) count the whole process's CPU,
+#     plus the CPU of finished child processes (FFmpeg). Stages run by worker threads
+#     (streaming mode) count only their threads' CPU, since stages overlap there.
+#   - Peak RSS is sampled every 0.1 s while a stage runs; with overlapping stages it is the
+#     peak of the whole process during that stage, not the stage's own share.
+#
+# With profiling on, each stage also runs under cProfile or pyinstrument (if installed) and the
+# profiles go to 'profiles/' in the sets folder (cProfile: '<stage>.prof', open with pstats or
+# snakeviz; pyinstrument: '<stage>.html').
+
+METRICS_FILENAME = "pipeline_metrics.json"
+PROFILE_FOLDER = "profiles"
+PROFILERS = ("cprofile", "pyinstrument")
+RSS_SAMPLE_SECONDS = 0.1
+
+
+def current_rss_bytes():
+    """Returns the process's resident memory in bytes, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def peak_rss_bytes():
+    """Returns the process's peak resident memory so far in bytes, or None where it cannot be read."""
+    if resource is None:
+        return current_rss_bytes()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def child_cpu_seconds():
+    """CPU seconds used by finished child processes (FFmpeg). Always 0 on Windows."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class RssSampler:
+    """
+    Samples the process's RSS in a background thread and keeps the peak of every open window.
+    Windows may overlap (one per running stage).
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.windows = {}
+        self.next_token = 0
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.enabled = current_rss_bytes() is not None
+        self.thread = threading.Thread(target=self.run, name="rss-sampler", daemon=True)
+        if self.enabled:
+            self.thread.start()
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss_bytes() or 0
+        with self.lock:
+            for token, peak in self.windows.items():
+                self.windows[token] = max(peak, rss)
+
+    def open(self):
+        """Starts a window. Returns its token."""
+        with self.lock:
+            token = self.next_token
+            self.next_token += 1
+            self.windows[token] = current_rss_bytes() or 0
+        return token
+
+    def close(self, token):
+        """Ends a window. Returns its peak RSS in bytes, or None if RSS cannot be read here."""
+        self.sample()
+        with self.lock:
+            peak = self.windows.pop(token, 0)
+        return peak if self.enabled else None
+
+    def shutdown(self):
+        self.stop.set()
+
+
+class PipelineMetrics:
+    """
+    Collects the metrics of one pipeline run over one video.
+
+    :param video_filename: The video being processed (stored in the report).
+    :param mode: The pipeline mode ("barrier" or "streaming"), stored in the report.
+    :param profile: None, "cprofile" or "pyinstrument" to profile every stage.
+    """
+
+    def __init__(self, video_filename, mode=None, profile=None):
+        if profile is not None and profile not in PROFILERS:
+            print(f"[Warning] Unknown profiler '{profile}' (use one of {', '.join(PROFILERS)}). Profiling is off.")
+            profile = None
+        if profile == "pyinstrument":
+            try:
+                import pyinstrument # noqa: F401
+            except ImportError:
+                print("[Warning] pyinstrument is not installed. Falling back to cProfile.")
+                profile = "cprofile"
+        self.video_filename = video_filename
+        self.mode = mode
+        self.profile = profile
+        self.stages = {}
+        self.sets = {}
+        self.extra = {}
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.sampler = RssSampler()
+        self.started_at = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_child_cpu = child_cpu_seconds()
+        self.pipeline_window = self.sampler.open()
+        self.result = None
+
+    def stage_record(self, stage):
+        return self.stages.setdefault(stage, {
+            "wall_seconds": 0.0, "cpu_seconds": 0.0, "child_cpu_seconds": 0.0,
+            "peak_rss_bytes": None, "calls": 0, "counts": {}
+        })
+
+    def record(self, stage, wall_seconds, cpu_seconds, set_names=(), peak_rss=None, child_cpu=0.0):
+        """
+        Adds one timed call to a stage. The call's time is also split evenly over 'set_names',
+        the sets it worked on.
+        """
+        with self.lock:
+            record = self.stage_record(stage)
+            record["wall_seconds"] += wall_seconds
+            record["cpu_seconds"] += cpu_seconds
+            record["child_cpu_seconds"] += child_cpu
+            record["calls"] += 1
+            if peak_rss is not None:
+                record["peak_rss_bytes"] = max(record["peak_rss_bytes"] or 0, peak_rss)
+            for set_name in set_names:
+                self.add_set_time(stage, set_name, wall_seconds / len(set_names), cpu_seconds / len(set_names))
+
+    def add_set_time(self, stage, set_name, wall_seconds, cpu_seconds):
+        set_record = self.sets.setdefault(set_name, {}).setdefault(stage, {"wall_seconds": 0.0, "cpu_seconds": 0.0})
+        set_record["wall_seconds"] += wall_seconds
+        set_record["cpu_seconds"] += cpu_seconds
+
+    def count(self, stage, **counts):
+        """Adds item counts to a stage (e.g. count("description", sets=4, frames=120))."""
+        with self.lock:
+            stage_counts = self.stage_record(stage)["counts"]
+            for name, value in counts.items():
+                stage_counts[name] = stage_counts.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, stage, set_names=()):
+        """
+        Measures a stage run in the calling thread, counting the whole process's CPU
+        (use 'measure' for stages run by worker threads).
+        """
+        token = self.sampler.open()
+        start_wall, start_cpu, start_child_cpu = time.perf_counter(), time.process_time(), child_cpu_seconds()
+        try:
+            with self.profiled(stage):
+                yield
+        finally:
+            self.record(
+                stage, time.perf_counter() - start_wall, time.process_time() - start_cpu, set_names,
+                self.sampler.close(token), child_cpu_seconds() - start_child_cpu
+            )
+
+    @contextmanager
+    def measure(self, stage, set_names=()):
+        """Measures one call of a stage run by a worker thread, counting only that thread's CPU."""
+        token = self.sampler.open()
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        self.local.measuring = True
+        try:
+            with self.profiled(stage):
+                yield
+        finally:
+            self.local.measuring = False
+            self.record(stage, time.perf_counter() - start_wall, time.thread_time() - start_cpu, set_names, self.sampler.close(token))
+
+    @contextmanager
+    def set_timer(self, stage, set_name):
+        """
+        Times one set's share of a stage that is already measured as a whole (per-set time only).
+        Inside 'measure' it does nothing, since 'measure' already times the sets it is given.
+        """
+        if getattr(self.local, "measuring", False):
+            yield
+            return
+        start_wall, start_cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.add_set_time(stage, set_name, time.perf_counter() - start_wall, time.thread_time() - start_cpu)
+
+    @contextmanager
+    def profiled(self, stage):
+        """Runs the block under the chosen profiler and adds the result to the stage's profile."""
+        if self.profile is None:
+            yield
+            return
+        if self.profile == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                session = profiler.stop()
+                with self.lock:
+                    previous = self.profiles.get(stage)
+                    self.profiles[stage] = session if previous is None else type(session).combine(previous, session)
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (Python 3.12+ allows only one at a time)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self.lock:
+                if stage in self.profiles:
+                    self.profiles[stage].add(profiler)
+                else:
+                    self.profiles[stage] = pstats.Stats(profiler, stream=io.StringIO())
+
+    def set_extra(self, **values):
+        """Stores extra top-level values in the report (e.g. first_scene_seconds)."""
+        with self.lock:
+            self.extra.update(values)
+
+    def finish(self):
+        """Stops measuring and returns the report dictionary."""
+        if self.result is not None:
+            return self.result
+        pipeline_peak = self.sampler.close(self.pipeline_window)
+        self.sampler.shutdown()
+        with self.lock:
+            stages = {
+                name: {**record, **{key: round(record[key], 3) for key in ("wall_seconds", "cpu_seconds", "child_cpu_seconds")}}
+                for name, record in self.stages.items()
+            }
+            sets = {
+                set_name: {stage: {key: round(value, 3) for key, value in times.items()} for stage, times in set_stages.items()}
+                for set_name, set_stages in sorted(self.sets.items())
+            }
+            self.result = {
+                "video": self.video_filename,
+                "mode": self.mode,
+                "started_at": round(self.started_at, 3),
+                "wall_seconds": round(time.perf_counter() - self.start_wall, 3),
+                "cpu_seconds": round(time.process_time() - self.start_cpu, 3),
+                "child_cpu_seconds": round(child_cpu_seconds() - self.start_child_cpu, 3),
+                "peak_rss_bytes": max(pipeline_peak or 0, peak_rss_bytes() or 0) or None,
+                **self.extra,
+                "stages": stages,
+                "sets": sets
+            }
+        return self.result
+
+    def save(self, sets_base_folder):
+        """Writes 'pipeline_metrics.json' (and any profiles) into the video's sets folder."""
+        report = self.finish()
+        metrics_path = os.path.join(sets_base_folder, METRICS_FILENAME)
+        try:
+            os.makedirs(sets_base_folder, exist_ok=True)
+            with open(metrics_path, 'w') as f:
+                json.dump(report, f, indent=2)
+        except Exception as e:
+            print(f"  [Error] Could not write {metrics_path}: {e}")
+        if self.profiles:
+            self.save_profiles(os.path.join(sets_base_folder, PROFILE_FOLDER))
+
+    def save_profiles(self, profile_folder):
+        os.makedirs(profile_folder, exist_ok=True)
+        for stage, profile in self.profiles.items():
+            try:
+                if self.profile == "pyinstrument":
+                    from pyinstrument.renderers import HTMLRenderer
+                    with open(os.path.join(profile_folder, f"{stage}.html"), 'w') as f:
+                        f.write(HTMLRenderer().render(profile))
+                else:
+                    profile.dump_stats(os.path.join(profile_folder, f"{stage}.prof"))
+            except Exception as e:
+                print(f"  [Error] Could not save the {stage} profile: {e}")
+        print(f"  Stage profiles saved to {profile_folder}")
+
+    def print_report(self, top=8):
+        report = self.finish()
+        peak = f"{report['peak_rss_bytes'] / 2**20:.0f} MB" if report["peak_rss_bytes"] else "n/a"
+        print("\n--- Pipeline Metrics ---")
+        print(f"  Total: {report['wall_seconds']:.2f}s wall, {report['cpu_seconds']:.2f}s CPU "
+              f"(+{report['child_cpu_seconds']:.2f}s FFmpeg), peak RSS {peak}")
+        for name, record in report["stages"].items():
+            counts = ", ".join(f"{key} {value:g}" for key, value in record["counts"].items())
+            rss = f"{record['peak_rss_bytes'] / 2**20:6.0f} MB" if record["peak_rss_bytes"] else "     n/a"
+            print(f"  {name:14s} wall {record['wall_seconds']:8.2f}s  cpu {record['cpu_seconds']:8.2f}s  rss {rss}  {counts}")
+        if self.profile == "cprofile":
+            for stage, stats in self.profiles.items():
+                stream = io.StringIO()
+                stats.stream = stream
+                stats.sort_stats("cumulative").print_stats(top)
+                print(f"\n  Hot spots in {stage}:")
+                print("\n".join("    " + line for line in stream.getvalue().strip().splitlines()[-top - 1:]))
+
+
+def load_metrics(sets_base_folder):
+    """Reads a video's 'pipeline_metrics.json'. Returns None if it is missing or unreadable."""
+    metrics_path = os.path.join(sets_base_folder, METRICS_FILENAME)
+    if not os.path.exists(metrics_path):
+        return None
+    try:
+        with open(metrics_path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  [Error] Could not read {metrics_path}: {e}")
+        return None
+
+
+# --- Process-wide recorder ---
+# Deep pipeline functions (extract_set, summarize_chained, ...) time their sets through
+# set_timer below, so the recorder does not have to be passed down to them.
+
+_active_metrics = None
+
+
+def get_pipeline_metrics():
+    """Returns the recorder of the running pipeline, or None."""
+    return _active_metrics
+
+
+def set_pipeline_metrics(metrics):
+    """Makes 'metrics' the recorder of the running pipeline (None when it is done)."""
+    global _active_metrics
+    _active_metrics = metrics
+
+
+@contextmanager
+def set_timer(stage, set_name):
+    """Times one set's share of a stage on the running pipeline's recorder (a no-op without one)."""
+    metrics = _active_metrics
+    if metrics is None:
+        yield
+        return
+    with metrics.set_timer(stage, set_name):
+        yield
+
+
+# --- Prometheus text format ---
+
+METRIC_HELP = {
+    "clipquery_pipeline_wall_seconds": ("gauge", "Wall time of the video's last pipeline run."),
+    "clipquery_pipeline_cpu_seconds": ("gauge", "CPU time of the video's last pipeline run (pipeline process)."),
+    "clipquery_pipeline_child_cpu_seconds": ("gauge", "CPU time of FFmpeg processes in the video's last pipeline run."),
+    "clipquery_pipeline_peak_rss_bytes": ("gauge", "Peak resident memory of the video's last pipeline run."),
+    "clipquery_pipeline_first_scene_seconds": ("gauge", "Seconds until the first scene was searchable (streaming mode)."),
+    "clipquery_stage_wall_seconds": ("gauge", "Wall time spent in a pipeline stage (summed over its threads)."),
+    "clipquery_stage_cpu_seconds": ("gauge", "CPU time spent in a pipeline stage."),
+    "clipquery_stage_peak_rss_bytes": ("gauge", "Peak resident memory while a pipeline stage ran."),
+    "clipquery_stage_calls": ("gauge", "Number of timed calls of a pipeline stage."),
+    "clipquery_stage_items": ("gauge", "Items handled by a pipeline stage, by kind."),
+    "clipquery_videos": ("gauge", "Videos in the processing queue, by status.")
+}
+
+
+def metric_samples(report, labels):
+    """
+    Turns a metrics report into Prometheus samples.
+
+    :param labels: Labels put on every sample (e.g. {"video_id": "3", "video": "clip.mp4"}).
+    :return: List of (metric name, labels, value) tuples.
+    """
+    samples = [
+        ("clipquery_pipeline_wall_seconds", labels, report.get("wall_seconds")),
+        ("clipquery_pipeline_cpu_seconds", labels, report.get("cpu_seconds")),
+        ("clipquery_pipeline_child_cpu_seconds", labels, report.get("child_cpu_seconds")),
+        ("clipquery_pipeline_peak_rss_bytes", labels, report.get("peak_rss_bytes")),
+        ("clipquery_pipeline_first_scene_seconds", labels, report.get("first_scene_seconds"))
+    ]
+    for stage, record in report.get("stages", {}).items():
+        stage_labels = {**labels, "stage": stage}
+        samples += [
+            ("clipquery_stage_wall_seconds", stage_labels, record.get("wall_seconds")),
+            ("clipquery_stage_cpu_seconds", stage_labels, record.get("cpu_seconds")),
+            ("clipquery_stage_peak_rss_bytes", stage_labels, record.get("peak_rss_bytes")),
+            ("clipquery_stage_calls", stage_labels, record.get("calls"))
+        ]
+        samples += [("clipquery_stage_items", {**stage_labels, "kind": kind}, value) for kind, value in record.get("counts", {}).items()]
+    return [sample for sample in samples if sample[2] is not None]
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(samples):
+    """
+    Renders (metric name, labels, value) samples in the Prometheus text exposition format,
+    with the HELP and TYPE lines from METRIC_HELP.
+    """
+    by_name = {}
+    for name, labels, value in samples:
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, name_samples in by_name.items():
+        metric_type, help_text = METRIC_HELP.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in name_samples:
+            label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {float(value)!r}" if label_text else f"{name} {float(value)!r}")
+    return "\n".join(lines) + "\n"
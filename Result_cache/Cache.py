@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import atexit
+import threading
+from collections import OrderedDict
+
+# A persistent, content-addressed cache for model outputs (captions, transcripts, summaries).
+# Keys combine a hash of the input content with the model's identity and parameters,
+# so re-ingesting the same video (or re-running after a crash) skips the model calls.
+
+DEFAULT_CACHE_PATH = "result_cache/results.sqlite3"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+TOUCH_FLUSH_EVERY = 256 # Hits whose 'last_used' update is buffered before it is written
+
+
+def hash_bytes(data):
+    """Returns the SHA-256 hex digest of some bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file's contents, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text):
+    """Returns the SHA-256 hex digest of a string."""
+    return hash_bytes(text.encode("utf-8"))
+
+
+def model_identity(model):
+    """
+    Returns a string that identifies which model produced a result.
+
+    Works for Hugging Face models (config name), LangChain chat models ('model'),
+    openai-whisper models (their dimensions) and falls back to the class name.
+    """
+    for attr in ("model_name", "model", "name_or_path"):
+        value = getattr(model, attr, None)
+        if isinstance(value, str):
+            return value
+    config = getattr(model, "config", None)
+    if config is not None and getattr(config, "_name_or_path", None):
+        return config._name_or_path
+    dims = getattr(model, "dims", None) # openai-whisper models
+    if dims is not None:
+        return f"whisper-{dims}"
+    return type(model).__name__
+
+
+class ResultCache:
+    """
+    SQLite-backed cache of JSON-serializable results with LRU eviction.
+
+    :param path: Path to the SQLite file (created if missing).
+    :param max_bytes: Once the stored values grow past this size, the least recently
+                      used entries are evicted.
+
+    Hits only record their 'last_used' time in memory; the times are written in one
+    transaction on the next put, every TOUCH_FLUSH_EVERY hits and at exit, so reads
+    never take SQLite's write lock.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        self.counters = {}
+        self.touched = {} # key -> last_used time not written yet
+        atexit.register(self.flush_touches)
+
+    @staticmethod
+    def make_key(namespace, content_hash, model_name, params=None):
+        """Builds a cache key from the kind of result, the input's hash, the model and its parameters."""
+        params_text = json.dumps(params or {}, sort_keys=True)
+        return hash_text(f"{namespace}|{model_name}|{params_text}|{content_hash}")
+
+    def count(self, namespace, outcome):
+        counter = self.counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        counter[outcome] += 1
+
+    def get(self, namespace, key):
+        """Returns the cached value for a key, or None on a miss."""
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.count(namespace, "misses")
+                return None
+            self.touched[key] = time.time()
+            if len(self.touched) >= TOUCH_FLUSH_EVERY:
+                self.write_touches()
+                self.connection.commit()
+            self.count(namespace, "hits")
+        return json.loads(row[0])
+
+    def write_touches(self):
+        """Writes the buffered 'last_used' times (the caller holds the lock and commits)."""
+        if self.touched:
+            self.connection.executemany("UPDATE results SET last_used = ? WHERE key = ?", [(t, key) for key, t in self.touched.items()])
+            self.touched.clear()
+
+    def flush_touches(self):
+        """Writes the buffered 'last_used' times now."""
+        with self.lock:
+            self.write_touches()
+            self.connection.commit()
+
+    def put(self, key, value):
+        """Stores a value, evicting least recently used entries if the cache is over its size limit."""
+        value_text = json.dumps(value)
+        size = len(value_text.encode("utf-8"))
+        with self.lock:
+            self.write_touches() # Eviction below must see which entries were used recently
+            old = self.connection.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value_text, size, time.time())
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache is back under 90% of its limit."""
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute("SELECT key, size FROM results ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.total_bytes -= size
+
+    def stats(self):
+        """Returns hit/miss counts per result type plus the number and size of stored entries."""
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"entries": entries, "bytes": self.total_bytes, "counters": {k: dict(v) for k, v in self.counters.items()}}
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Result cache: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+        for namespace, counter in sorted(stats["counters"].items()):
+            print(f"  {namespace}: {counter['hits']} hits, {counter['misses']} misses")
+
+
+class LRUCache:
+    """
+    Small thread-safe in-memory cache that keeps the 'max_entries' most recently used items.
+
+    Used for hot, short-lived results (e.g. search queries) that are not worth a disk round trip.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached value for a key, or None on a miss."""
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_entries:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.items), "hits": self.hits, "misses": self.misses}
+
+
+# --- Process-wide cache ---
+# Model functions look the cache up here, so callers do not have to pass it around.
+
+_result_cache = None
+_cache_disabled = False
+_result_cache_lock = threading.Lock() # Pipeline stage threads may ask for the cache at the same time
+
+
+def get_result_cache():
+    """Returns the process-wide ResultCache (created on first use), or None if caching is disabled."""
+    global _result_cache
+    if _cache_disabled:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            # Checked again under the lock, so only one thread creates the cache
+            if _result_cache is None and not _cache_disabled:
+                _result_cache = ResultCache()
+    return _result_cache
+
+
+def set_result_cache(cache):
+    """Replaces the process-wide cache. Pass None to disable caching."""
+    global _result_cache, _cache_disabled
+    with _result_cache_lock:
+        _result_cache = cache
+        _cache_disabled = cache is None
@@ -0,0 +1,442 @@
+import os
+import re
+import glob
+import json
+import sqlite3
+import threading
+from Result_cache.Cache import hash_text
+
+# One SQLite file per video ('scenes.sqlite3' in its sets folder) holds everything the
+# pipeline knows about its sets, instead of a handful of small files in every set folder:
+#
+#   sets          time bounds and planned frame times    (was time_info.txt)
+#   descriptions  transcript of each set                 (was data.json ...)
+#   frames        one row per captioned frame            (... and its 'visuals')
+#   speech        timed phrases for the moment index     (was transcript_segments.json)
+#   contexts      context each set was summarized with   (was context_data.json)
+#   summaries     scene summary and its previous one     (was summary_data.json)
+#   embeddings    scene vectors with their content hash  (Chroma held the only copy)
+#
+# Every stage reads and writes its rows directly; a set's rows are replaced in one
+# transaction, so a crash never leaves half an update. Only audio.mp3 and the frame images
+# stay in the set folders. export_legacy_json() writes the old per-set JSON layout for
+# tools that still read it, and a video processed before the store existed is imported
+# from its JSON files the first time its store is opened.
+
+STORE_FILENAME = "scenes.sqlite3"
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sets ("
+    "set_name TEXT PRIMARY KEY, set_number INTEGER NOT NULL, start_time REAL NOT NULL, end_time REAL NOT NULL, frame_times TEXT)",
+    "CREATE TABLE IF NOT EXISTS descriptions (set_name TEXT PRIMARY KEY, transcript TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS frames ("
+    "set_name TEXT NOT NULL, position INTEGER NOT NULL, timestamp REAL NOT NULL, description TEXT NOT NULL, "
+    "PRIMARY KEY (set_name, position))",
+    "CREATE TABLE IF NOT EXISTS speech ("
+    "set_name TEXT NOT NULL, position INTEGER NOT NULL, start_time REAL NOT NULL, end_time REAL NOT NULL, text TEXT NOT NULL, "
+    "PRIMARY KEY (set_name, position))",
+    "CREATE TABLE IF NOT EXISTS contexts (set_name TEXT PRIMARY KEY, previous_context TEXT)",
+    "CREATE TABLE IF NOT EXISTS summaries (set_name TEXT PRIMARY KEY, previous_description TEXT, scene_summary TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS embeddings (set_name TEXT PRIMARY KEY, content_hash TEXT NOT NULL, vector BLOB NOT NULL)"
+)
+
+# Tables holding a set's description (redone together) and everything about a set
+DESCRIPTION_TABLES = ("descriptions", "frames")
+SET_TABLES = ("sets", "descriptions", "frames", "speech", "contexts", "summaries", "embeddings")
+
+
+def name_filter(column, set_names):
+    """Builds a WHERE clause keeping only the given set names (None keeps every set). Returns (sql, params)."""
+    if set_names is None:
+        return "", ()
+    # One JSON parameter instead of one per name, so long videos stay under SQLite's variable limit
+    return f"WHERE {column} IN (SELECT value FROM json_each(?))", (json.dumps(list(set_names)),)
+
+
+def read_legacy_time_info(info_file_path):
+    """
+    Reads a legacy 'time_info.txt' file.
+
+    :return: {"set_number", "start_time", "end_time", "frame_times"}, or None if it is missing or corrupt.
+    """
+    values = {}
+    try:
+        with open(info_file_path, 'r') as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                values[key.strip()] = value.strip()
+        frame_times = values.get("frame_times_seconds")
+        return {
+            "set_number": int(values.get("set_number", 0)),
+            "start_time": float(values["start_time_seconds"]),
+            "end_time": float(values["end_time_seconds"]),
+            "frame_times": [float(t) for t in frame_times.split(",")] if frame_times else ([] if frame_times is not None else None)
+        }
+    except Exception:
+        return None
+
+
+def read_json(file_path):
+    """Reads a JSON file. Returns None if it is missing or unreadable."""
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  [Warning] Could not read {file_path}: {e}")
+        return None
+
+
+def write_json(file_path, data):
+    try:
+        with open(file_path, 'w') as f:
+            json.dump(data, f, indent=2)
+    except Exception as e:
+        print(f"  [Error] Could not write {file_path}: {e}")
+
+
+class SceneStore:
+    """
+    Per-video SQLite store of sets, frames, transcripts, summaries and embeddings.
+
+    Safe to share between threads (one connection behind a lock). Getters return the same
+    dictionaries the legacy JSON files held, so callers did not have to change shape.
+
+    :param sets_base_folder: The video's sets folder (e.g. "video_processing/Sets/Vid1.mp4").
+    """
+
+    def __init__(self, sets_base_folder):
+        os.makedirs(sets_base_folder, exist_ok=True)
+        self.sets_base_folder = sets_base_folder
+        self.path = os.path.join(sets_base_folder, STORE_FILENAME)
+        is_new = not os.path.exists(self.path)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets a search process read while the pipeline writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.commit()
+        if is_new:
+            self.import_legacy_json()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    # --- Sets (extraction) ---
+
+    def put_set(self, set_name, set_number, start_time, end_time, frame_times=None):
+        """
+        Records a set's time bounds.
+
+        :param frame_times: Optional absolute times of the set's frames (adaptive segmentation).
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sets (set_name, set_number, start_time, end_time, frame_times) VALUES (?, ?, ?, ?, ?)",
+                (set_name, set_number, round(start_time, 3), round(end_time, 3),
+                 json.dumps([round(t, 3) for t in frame_times]) if frame_times is not None else None)
+            )
+
+    def get_set(self, set_name):
+        """Returns {"set_number", "start_time", "end_time", "frame_times"} of a set, or None."""
+        rows = self.query("SELECT set_number, start_time, end_time, frame_times FROM sets WHERE set_name = ?", (set_name,))
+        if not rows:
+            return None
+        set_number, start_time, end_time, frame_times = rows[0]
+        return {
+            "set_number": set_number,
+            "start_time": start_time,
+            "end_time": end_time,
+            "frame_times": json.loads(frame_times) if frame_times is not None else None
+        }
+
+    def set_names(self):
+        """Returns the names of all recorded sets, in order."""
+        return [row[0] for row in self.query("SELECT set_name FROM sets ORDER BY set_number")]
+
+    def remove_sets_after(self, num_sets):
+        """Deletes every row of the sets numbered above 'num_sets' (left over from a different segmentation)."""
+        with self.lock, self.connection:
+            names = [row[0] for row in self.connection.execute("SELECT set_name FROM sets WHERE set_number > ?", (num_sets,))]
+            for table in SET_TABLES:
+                self.connection.executemany(f"DELETE FROM {table} WHERE set_name = ?", [(name,) for name in names])
+        return names
+
+    # --- Descriptions (transcript + frame captions) ---
+
+    def put_description(self, set_name, transcript_text, visuals_list):
+        """
+        Replaces a set's transcript and frame captions.
+
+        :param visuals_list: List of {"timestamp", "description"}, in frame order.
+        :return: The set's data dictionary (the old 'data.json' layout), or None if the set is unknown.
+        """
+        with self.lock, self.connection:
+            for table in DESCRIPTION_TABLES:
+                self.connection.execute(f"DELETE FROM {table} WHERE set_name = ?", (set_name,))
+            self.connection.execute("INSERT INTO descriptions (set_name, transcript) VALUES (?, ?)", (set_name, transcript_text or ""))
+            self.connection.executemany(
+                "INSERT INTO frames (set_name, position, timestamp, description) VALUES (?, ?, ?, ?)",
+                [(set_name, position, visual["timestamp"], visual["description"] or "") for position, visual in enumerate(visuals_list)]
+            )
+        return self.get_set_data(set_name)
+
+    def get_set_data(self, set_name):
+        """Returns {"start_time", "end_time", "transcript", "visuals"} of a described set, or None."""
+        return self.all_set_data([set_name]).get(set_name)
+
+    def all_set_data(self, set_names=None):
+        """
+        Returns the data of every described set, with one query per table.
+
+        :param set_names: Optional sets to include (default: all).
+        :return: {set name: data dictionary}, in set order.
+        """
+        where, params = name_filter("s.set_name", set_names)
+        frames_where, _ = name_filter("set_name", set_names)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT s.set_name, s.start_time, s.end_time, d.transcript FROM sets s "
+                f"JOIN descriptions d ON d.set_name = s.set_name {where} ORDER BY s.set_number", params
+            ).fetchall()
+            frames = self.connection.execute(
+                f"SELECT set_name, timestamp, description FROM frames {frames_where} ORDER BY set_name, position", params
+            ).fetchall()
+        all_data = {
+            set_name: {"start_time": start_time, "end_time": end_time, "transcript": transcript, "visuals": []}
+            for set_name, start_time, end_time, transcript in rows
+        }
+        for set_name, timestamp, description in frames:
+            if set_name in all_data:
+                all_data[set_name]["visuals"].append({"timestamp": timestamp, "description": description})
+        return all_data
+
+    # --- Timed speech phrases ---
+
+    def put_segments(self, set_name, segments):
+        """Replaces a set's timed speech phrases ({"start", "end", "text"})."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM speech WHERE set_name = ?", (set_name,))
+            self.connection.executemany(
+                "INSERT INTO speech (set_name, position, start_time, end_time, text) VALUES (?, ?, ?, ?, ?)",
+                [(set_name, position, segment["start"], segment["end"], segment["text"]) for position, segment in enumerate(segments)]
+            )
+
+    def get_segments(self, set_name):
+        """Returns a set's timed speech phrases, in order."""
+        rows = self.query("SELECT start_time, end_time, text FROM speech WHERE set_name = ? ORDER BY position", (set_name,))
+        return [{"start": start, "end": end, "text": text} for start, end, text in rows]
+
+    # --- Summaries ---
+
+    def put_context(self, set_name, previous_context):
+        """Records the context a set is summarized with (previous summary text or previous set data)."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO contexts (set_name, previous_context) VALUES (?, ?)",
+                (set_name, json.dumps(previous_context))
+            )
+
+    def get_context_data(self, set_name):
+        """Returns a set's data plus its 'previous_context' (the old 'context_data.json' layout), or None."""
+        data = self.get_set_data(set_name)
+        rows = self.query("SELECT previous_context FROM contexts WHERE set_name = ?", (set_name,))
+        if data is None or not rows:
+            return None
+        return {**data, "previous_context": json.loads(rows[0][0])}
+
+    def put_summary(self, set_name, previous_description, scene_summary):
+        """
+        Records a set's summary.
+
+        :return: The summary data dictionary (the old 'summary_data.json' layout), or None if the set is not described.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO summaries (set_name, previous_description, scene_summary) VALUES (?, ?, ?)",
+                (set_name, previous_description, scene_summary)
+            )
+        return self.get_summary_data(set_name)
+
+    def get_summary_data(self, set_name):
+        """Returns {"start_time", "end_time", "previous_description", "scene_summary", "transcript", "visuals"}, or None."""
+        return self.all_summary_data([set_name]).get(set_name)
+
+    def all_summary_data(self, set_names=None):
+        """Returns {set name: summary data} of every summarized set, in set order."""
+        where, params = name_filter("set_name", set_names)
+        summaries = {
+            set_name: (previous_description, scene_summary)
+            for set_name, previous_description, scene_summary in self.query(f"SELECT set_name, previous_description, scene_summary FROM summaries {where}", params)
+        }
+        all_data = self.all_set_data(list(summaries))
+        return {
+            set_name: {
+                "start_time": data["start_time"],
+                "end_time": data["end_time"],
+                "previous_description": summaries[set_name][0],
+                "scene_summary": summaries[set_name][1],
+                "transcript": data["transcript"],
+                "visuals": data["visuals"]
+            }
+            for set_name, data in all_data.items()
+        }
+
+    # --- Embeddings ---
+
+    def put_embeddings(self, set_names, content_hashes, vectors):
+        """Stores scene vectors (float32) with the content hash they were computed from."""
+        import numpy as np
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (set_name, content_hash, vector) VALUES (?, ?, ?)",
+                [(name, content_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                 for name, content_hash, vector in zip(set_names, content_hashes, vectors)]
+            )
+
+    def clear_embeddings(self):
+        """Deletes every stored scene vector, so the next indexing run embeds all scenes again."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM embeddings")
+
+    def get_embeddings(self, set_names):
+        """Returns {set name: (content hash, float32 vector)} of the given sets that have one."""
+        import numpy as np
+        where, params = name_filter("set_name", set_names)
+        return {
+            name: (content_hash, np.frombuffer(vector, dtype=np.float32))
+            for name, content_hash, vector in self.query(f"SELECT set_name, content_hash, vector FROM embeddings {where}", params)
+        }
+
+    # --- Stage manifest support ---
+
+    def fingerprint(self, set_name, stage):
+        """
+        Fingerprints what a stage recorded for one set ("extraction", "description" or "summarization").
+
+        :return: The fingerprint, or None if the stage's rows are missing.
+        """
+        if stage == "extraction":
+            data = self.get_set(set_name)
+        elif stage == "description":
+            data = self.get_set_data(set_name)
+        else:
+            data = self.get_summary_data(set_name)
+        if data is None:
+            return None
+        return hash_text(json.dumps(data, sort_keys=True))
+
+    # --- Legacy JSON layout ---
+
+    def export_legacy_json(self, set_names=None):
+        """
+        Writes the per-set files older versions produced (time_info.txt, data.json,
+        transcript_segments.json, context_data.json, summary_data.json) and the combined
+        'all_sets_data.json' and 'all_summary_data.json'.
+
+        :param set_names: Optional sets to export (default: all).
+        :return: The number of sets exported.
+        """
+        from video_processing.Full_extraction import write_time_info
+
+        set_names = [name for name in self.set_names() if set_names is None or name in set_names]
+        all_data = self.all_set_data(set_names)
+        all_summaries = self.all_summary_data(set_names)
+        for set_name in set_names:
+            set_folder_path = os.path.join(self.sets_base_folder, set_name)
+            os.makedirs(set_folder_path, exist_ok=True)
+            set_info = self.get_set(set_name)
+            write_time_info(set_folder_path, set_info["set_number"], set_info["start_time"], set_info["end_time"], set_info["frame_times"])
+            if set_name in all_data:
+                write_json(os.path.join(set_folder_path, "data.json"), all_data[set_name])
+                write_json(os.path.join(set_folder_path, "transcript_segments.json"), self.get_segments(set_name))
+            context_data = self.get_context_data(set_name)
+            if context_data is not None:
+                write_json(os.path.join(set_folder_path, "context_data.json"), context_data)
+            if set_name in all_summaries:
+                write_json(os.path.join(set_folder_path, "summary_data.json"), all_summaries[set_name])
+        write_json(os.path.join(self.sets_base_folder, "all_sets_data.json"), list(all_data.values()))
+        write_json(os.path.join(self.sets_base_folder, "all_summary_data.json"), list(all_summaries.values()))
+        print(f"  Exported {len(set_names)} sets to the legacy JSON layout in {self.sets_base_folder}")
+        return len(set_names)
+
+    def import_legacy_json(self):
+        """
+        Loads the per-set files of a video processed before the store existed.
+
+        :return: The number of sets imported.
+        """
+        imported = 0
+        for set_folder_path in sorted(glob.glob(os.path.join(self.sets_base_folder, "set_*"))):
+            set_name = os.path.basename(set_folder_path)
+            set_info = read_legacy_time_info(os.path.join(set_folder_path, "time_info.txt"))
+            if set_info is None:
+                continue
+            match = re.search(r"set_(\d+)$", set_name)
+            self.put_set(set_name, set_info["set_number"] or int(match.group(1)), set_info["start_time"], set_info["end_time"], set_info["frame_times"])
+            data = read_json(os.path.join(set_folder_path, "data.json"))
+            if data is not None:
+                self.put_description(set_name, data.get("transcript", ""), data.get("visuals") or [])
+            segments = read_json(os.path.join(set_folder_path, "transcript_segments.json"))
+            if segments:
+                self.put_segments(set_name, segments)
+            context_data = read_json(os.path.join(set_folder_path, "context_data.json"))
+            if context_data is not None:
+                self.put_context(set_name, context_data.get("previous_context"))
+            summary = read_json(os.path.join(set_folder_path, "summary_data.json"))
+            if summary is not None and data is not None:
+                self.put_summary(set_name, summary.get("previous_description"), summary.get("scene_summary", ""))
+            imported += 1
+        if imported:
+            print(f"  Imported {imported} sets from their JSON files into {self.path}")
+        return imported
+
+
+# --- Process-wide stores ---
+# One open store per video folder, shared by every stage and thread of the process.
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_scene_store(sets_base_folder):
+    """Returns the SceneStore of a video's sets folder, opening (or creating) it on first use."""
+    key = os.path.abspath(sets_base_folder)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SceneStore(sets_base_folder)
+        return _stores[key]
+
+
+def set_store(set_folder_path):
+    """Returns (the SceneStore of a set's video, the set name) for a 'set_NNN' folder path."""
+    set_folder_path = os.path.normpath(set_folder_path)
+    return get_scene_store(os.path.dirname(set_folder_path)), os.path.basename(set_folder_path)
+
+
+def close_scene_store(sets_base_folder):
+    """Closes a video's store (e.g. before its sets folder is deleted)."""
+    with _stores_lock:
+        store = _stores.pop(os.path.abspath(sets_base_folder), None)
+    if store is not None:
+        store.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python -m Scene_store.Store <sets folder> [set_001 set_002 ...]")
+        print("Writes the legacy per-set JSON files of a video from its scene store.")
+        sys.exit(1)
+    if not os.path.exists(os.path.join(sys.argv[1], STORE_FILENAME)):
+        print(f"[Error] No {STORE_FILENAME} in {sys.argv[1]}")
+        sys.exit(1)
+    get_scene_store(sys.argv[1]).export_legacy_json(sys.argv[2:] or None)
@@ -0,0 +1,490 @@
+import os
+import re
+import math
+import json
+import time
+import uuid
+import shutil
+import threading
+import contextlib
+from collections import Counter
+import numpy as np
+from Result_cache.Cache import hash_text
+from Scene_store.Store import get_scene_store
+
+# A local BM25 index over each scene's summary, transcript and visual captions, kept next
+# to the Chroma collection. It catches exact quotes that dense embeddings miss.
+#
+# Layout: the index is a list of immutable segments plus a small manifest ('index.json').
+# Each segment stores its postings as flat NumPy arrays that are memory-mapped on load:
+#   terms.txt          sorted terms, one per line (term i owns postings[offsets[i]:offsets[i+1]])
+#   term_offsets.npy   int64, len(terms) + 1
+#   postings_docs.npy  uint32 segment-local document numbers
+#   postings_tf.npy    uint16 term frequencies
+#   doc_lengths.npy    uint32 tokens per document
+#   docs.json          document ids and metadata (video, set_name, times, summary, ...)
+# Adding documents writes a new segment; replacing or deleting one only marks the old
+# copy as deleted in the manifest. Segments are merged in tiers of similar size: once
+# MERGE_FACTOR segments share a tier (live documents between MERGE_FACTOR**t and
+# MERGE_FACTOR**(t+1)), only those are merged, so each document is rewritten about
+# log(corpus) times instead of on every merge.
+
+MANIFEST_FILENAME = "index.json"
+LOCK_FILENAME = "index.lock"
+MERGE_FACTOR = 8
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercases a text and splits it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def scene_document_text(scene_data):
+    """Returns the text indexed for one scene: its summary, transcript and visual captions."""
+    visuals = " ".join(
+        visual.get("description", "") if isinstance(visual, dict) else str(visual)
+        for visual in scene_data.get("visuals") or []
+    )
+    return " ".join([scene_data.get("scene_summary") or "", scene_data.get("transcript") or "", visuals])
+
+
+def scene_documents(SETS_BASE_FOLDER, VIDEO_FILENAME, set_names, extra_metadata=None):
+    """
+    Builds index documents from a video's scene summaries (read from its scene store).
+
+    :param set_names: The sets to include (e.g. the ones populate_chroma_db just indexed).
+    :param extra_metadata: Optional dict stored on every document (e.g. video_id, owner_id).
+    :return: A list of (doc_id, text, metadata). IDs match the Chroma scene IDs.
+    """
+    documents = []
+    scenes = get_scene_store(os.path.join(SETS_BASE_FOLDER, VIDEO_FILENAME)).all_summary_data(set_names)
+    for set_name in set_names:
+        scene_data = scenes.get(set_name)
+        if scene_data is None:
+            print(f"  [Warning] Skipping {VIDEO_FILENAME} {set_name} in the lexical index: no summary in the scene store")
+            continue
+        text = scene_document_text(scene_data)
+        metadata = {
+            "video": VIDEO_FILENAME,
+            "set_name": set_name,
+            "start_time": scene_data.get("start_time", 0.0),
+            "end_time": scene_data.get("end_time", 0.0),
+            "summary": scene_data.get("scene_summary", ""),
+            **(extra_metadata or {}),
+        }
+        metadata["content_hash"] = hash_text(json.dumps(metadata, sort_keys=True) + "\0" + text)
+        documents.append((f"{VIDEO_FILENAME}_{set_name}", text, metadata))
+    return documents
+
+
+def load_array(path):
+    """Memory-maps a .npy file (empty arrays cannot be mapped and are read normally)."""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+
+def write_segment(folder, docs, postings_by_term, doc_lengths):
+    """
+    Writes one segment.
+
+    :param docs: List of {"id": ..., **metadata}, in segment-local order.
+    :param postings_by_term: {term: (doc_numbers, term_frequencies)} as arrays or lists.
+    :param doc_lengths: Number of tokens in each document.
+    """
+    os.makedirs(folder, exist_ok=True)
+    terms = sorted(postings_by_term)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, term in enumerate(terms):
+        offsets[i + 1] = offsets[i] + len(postings_by_term[term][0])
+    postings_docs = np.concatenate([np.asarray(postings_by_term[t][0], dtype=np.uint32) for t in terms]) if terms else np.zeros(0, np.uint32)
+    postings_tf = np.concatenate([np.asarray(postings_by_term[t][1], dtype=np.uint16) for t in terms]) if terms else np.zeros(0, np.uint16)
+
+    np.save(os.path.join(folder, "term_offsets.npy"), offsets)
+    np.save(os.path.join(folder, "postings_docs.npy"), postings_docs)
+    np.save(os.path.join(folder, "postings_tf.npy"), postings_tf)
+    np.save(os.path.join(folder, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+    with open(os.path.join(folder, "terms.txt"), 'w', encoding='utf-8') as f:
+        f.write("\n".join(terms))
+    with open(os.path.join(folder, "docs.json"), 'w') as f:
+        json.dump(docs, f)
+
+
+def build_postings(documents):
+    """Tokenizes (doc_id, text, metadata) documents into (docs, postings_by_term, doc_lengths)."""
+    docs, doc_lengths, postings_by_term = [], [], {}
+    for doc_number, (doc_id, text, metadata) in enumerate(documents):
+        counts = Counter(tokenize(text))
+        docs.append({"id": doc_id, **metadata})
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            doc_numbers, tfs = postings_by_term.setdefault(term, ([], []))
+            doc_numbers.append(doc_number)
+            tfs.append(min(tf, 65535))
+    return docs, postings_by_term, doc_lengths
+
+
+class Segment:
+    """Read-only view of one segment; postings stay memory-mapped."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.term_offsets = load_array(os.path.join(folder, "term_offsets.npy"))
+        self.postings_docs = load_array(os.path.join(folder, "postings_docs.npy"))
+        self.postings_tf = load_array(os.path.join(folder, "postings_tf.npy"))
+        self.doc_lengths = np.asarray(load_array(os.path.join(folder, "doc_lengths.npy")), dtype=np.float32)
+        with open(os.path.join(folder, "terms.txt"), 'r', encoding='utf-8') as f:
+            terms = f.read()
+        self.term_ids = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+        with open(os.path.join(folder, "docs.json"), 'r') as f:
+            self.docs = json.load(f)
+        self.columns = {}
+        self.doc_numbers = None
+
+    def doc_number(self, doc_id):
+        """Returns the segment-local number of a document id, or None if the segment does not hold it."""
+        if self.doc_numbers is None:
+            self.doc_numbers = {doc["id"]: i for i, doc in enumerate(self.docs)}
+        return self.doc_numbers.get(doc_id)
+
+    def postings(self, term):
+        """Returns (doc_numbers, term_frequencies) for a term, or None if it does not occur."""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+
+    def column(self, field):
+        """Returns one metadata field of every document as an array (for filtering)."""
+        if field not in self.columns:
+            self.columns[field] = np.array([doc.get(field) for doc in self.docs], dtype=object)
+        return self.columns[field]
+
+
+def segment_tier(live_docs):
+    """Returns the merge tier of a segment with this many live documents (see MERGE_FACTOR)."""
+    return int(math.log(max(live_docs, 1), MERGE_FACTOR))
+
+
+def where_mask(segment, where):
+    """
+    Evaluates a Chroma-style 'where' filter on a segment's documents.
+
+    Supports {field: value}, {field: {"$eq" | "$in" | "$nin": ...}}, "$and" and "$or".
+    """
+    mask = np.ones(len(segment.docs), dtype=bool)
+    if not where:
+        return mask
+    for key, condition in where.items():
+        if key == "$and":
+            for part in condition:
+                mask &= where_mask(segment, part)
+        elif key == "$or":
+            mask &= np.logical_or.reduce([where_mask(segment, part) for part in condition])
+        elif isinstance(condition, dict) and "$in" in condition:
+            mask &= np.isin(segment.column(key), condition["$in"])
+        elif isinstance(condition, dict) and "$nin" in condition:
+            mask &= ~np.isin(segment.column(key), condition["$nin"])
+        else:
+            value = condition["$eq"] if isinstance(condition, dict) else condition
+            mask &= segment.column(key) == value
+    return mask
+
+
+class BM25Index:
+    """
+    Segmented BM25 index stored in a folder.
+
+    Several processes can share the folder: writers take a lock file, and readers reload
+    the manifest whenever it changes.
+
+    :param path: Folder of the index (created on first write).
+    :param k1: BM25 term-frequency saturation.
+    :param b: BM25 document-length normalisation.
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.segments = {}
+        self.live = {}
+        self.manifest_stamp = None
+        self.lock = threading.Lock()
+
+    # --- Reading ---
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILENAME), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "deleted": {}}
+
+    def manifest_stamp_now(self):
+        try:
+            stat = os.stat(os.path.join(self.path, MANIFEST_FILENAME))
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, attempts=5):
+        """
+        Reloads the manifest (and opens new segments) if another process changed it.
+
+        A writer deletes superseded segments right after saving a new manifest, so a segment
+        named in the manifest just read may already be gone. The manifest is then read
+        again, since it no longer lists that segment.
+        """
+        with self.lock:
+            for attempt in range(attempts):
+                stamp = self.manifest_stamp_now()
+                if stamp == self.manifest_stamp:
+                    return
+                manifest = self.read_manifest()
+                try:
+                    segments, live = {}, {}
+                    for name in manifest["segments"]:
+                        segment = self.segments.get(name) or Segment(os.path.join(self.path, name))
+                        mask = np.ones(len(segment.docs), dtype=bool)
+                        mask[manifest["deleted"].get(name, [])] = False
+                        segments[name], live[name] = segment, mask
+                except FileNotFoundError:
+                    if attempt == attempts - 1:
+                        raise
+                    time.sleep(0.01 * (attempt + 1))
+                    continue
+                self.segments, self.live, self.manifest_stamp = segments, live, stamp
+                return
+
+    def document_count(self):
+        self.refresh()
+        return int(sum(mask.sum() for mask in self.live.values()))
+
+    def search(self, query_text, n_results=10, where=None):
+        """
+        Ranks documents against a query with BM25.
+
+        :param where: Optional Chroma-style metadata filter (see where_mask).
+        :return: A list of (score, doc) pairs, best first; 'doc' is the stored metadata plus 'id'.
+        """
+        self.refresh()
+        query_terms = Counter(tokenize(query_text))
+        with self.lock:
+            segments = [(self.segments[name], self.live[name]) for name in self.segments]
+        live_count = sum(int(live.sum()) for _, live in segments)
+        if not query_terms or live_count == 0:
+            return []
+        average_length = sum(float(segment.doc_lengths[live].sum()) for segment, live in segments) / live_count
+
+        # Document frequencies over live documents of every segment
+        postings = {term: [segment.postings(term) for segment, _ in segments] for term in query_terms}
+        idf = {}
+        for term, per_segment in postings.items():
+            df = sum(int(live[p[0]].sum()) for p, (_, live) in zip(per_segment, segments) if p is not None)
+            idf[term] = np.log(1 + (live_count - df + 0.5) / (df + 0.5)) if df else 0.0
+
+        hits = []
+        for index, (segment, live) in enumerate(segments):
+            scores = np.zeros(len(segment.docs), dtype=np.float32)
+            for term, query_tf in query_terms.items():
+                term_postings = postings[term][index]
+                if term_postings is None or not idf[term]:
+                    continue
+                doc_numbers, tf = term_postings
+                tf = tf.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths[doc_numbers] / average_length)
+                # Each document appears at most once per term, so plain fancy indexing adds correctly
+                scores[doc_numbers] += query_tf * idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            candidates = np.flatnonzero((scores > 0) & live & where_mask(segment, where))
+            if len(candidates) > n_results:
+                candidates = candidates[np.argpartition(-scores[candidates], n_results - 1)[:n_results]]
+            hits.extend((float(scores[i]), segment.docs[i]) for i in candidates)
+
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return hits[:n_results]
+
+    # --- Writing ---
+
+    @contextlib.contextmanager
+    def write_lock(self, stale_after=120.0):
+        """Holds the index's lock file (other writers wait; a lock older than 'stale_after' is broken)."""
+        os.makedirs(self.path, exist_ok=True)
+        lock_path = os.path.join(self.path, LOCK_FILENAME)
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_after:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+
+    def save_manifest(self, manifest):
+        temp_path = os.path.join(self.path, f"{MANIFEST_FILENAME}.{os.getpid()}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, os.path.join(self.path, MANIFEST_FILENAME))
+
+    def open_segment(self, name):
+        """Returns a segment, reusing the copy already opened by refresh (segments never change)."""
+        with self.lock:
+            segment = self.segments.get(name)
+        return segment or Segment(os.path.join(self.path, name))
+
+    def find_live(self, doc_ids):
+        """
+        Looks up where documents live, using the segments refresh() keeps open (no docs.json is re-read).
+
+        :return: {doc_id: (segment_name, doc_number, content_hash)} for the ids that have a live copy.
+        """
+        with self.lock:
+            segments = [(name, self.segments[name], self.live[name]) for name in reversed(list(self.segments))]
+        found = {}
+        for doc_id in doc_ids:
+            for name, segment, live in segments:
+                doc_number = segment.doc_number(doc_id)
+                if doc_number is not None and live[doc_number]:
+                    found[doc_id] = (name, doc_number, segment.docs[doc_number].get("content_hash"))
+                    break
+        return found
+
+    def upsert(self, documents):
+        """
+        Adds or replaces documents. Documents whose 'content_hash' is unchanged are skipped.
+
+        :param documents: A list of (doc_id, text, metadata), e.g. from scene_documents.
+        :return: The number of documents written.
+        """
+        with self.write_lock():
+            # Only writers change the manifest, so what refresh loads stays current under the lock
+            self.refresh()
+            manifest = self.read_manifest()
+            existing = self.find_live([document[0] for document in documents])
+            changed = [
+                document for document in documents
+                if document[0] not in existing or existing[document[0]][2] != document[2].get("content_hash")
+            ]
+            if not changed:
+                return 0
+
+            for doc_id, _, _ in changed:
+                if doc_id in existing:
+                    name, doc_number, _ = existing[doc_id]
+                    manifest["deleted"].setdefault(name, []).append(doc_number)
+
+            name = f"seg_{uuid.uuid4().hex[:12]}"
+            write_segment(os.path.join(self.path, name), *build_postings(changed))
+            manifest["segments"].append(name)
+            manifest = self.merge_tiers(manifest)
+            self.save_manifest(manifest)
+            self.remove_unused_segments(manifest)
+        return len(changed)
+
+    def delete(self, where):
+        """
+        Marks every document matching a metadata filter as deleted (e.g. {"video": "Vid1.mp4"}).
+
+        :return: The number of documents deleted.
+        """
+        self.refresh()
+        with self.write_lock():
+            manifest = self.read_manifest()
+            deleted = 0
+            for name in manifest["segments"]:
+                segment = Segment(os.path.join(self.path, name))
+                mask = where_mask(segment, where)
+                mask[manifest["deleted"].get(name, [])] = False
+                doc_numbers = np.flatnonzero(mask).tolist()
+                if doc_numbers:
+                    manifest["deleted"].setdefault(name, []).extend(doc_numbers)
+                    deleted += len(doc_numbers)
+            if deleted:
+                self.save_manifest(manifest)
+        return deleted
+
+    def merge_tiers(self, manifest):
+        """
+        Drops fully deleted segments and merges every tier holding MERGE_FACTOR segments
+        (see the notes at the top). Returns the new manifest.
+        """
+        while True:
+            tiers = {}
+            for name in list(manifest["segments"]):
+                live_docs = len(self.open_segment(name).docs) - len(manifest["deleted"].get(name, []))
+                if live_docs <= 0:
+                    manifest["segments"].remove(name)
+                    manifest["deleted"].pop(name, None)
+                    continue
+                tiers.setdefault(segment_tier(live_docs), []).append(name)
+            full = next((names for _, names in sorted(tiers.items()) if len(names) >= MERGE_FACTOR), None)
+            if full is None:
+                return manifest
+            manifest = self.merge_segments(manifest, full)
+
+    def merge_segments(self, manifest, names=None):
+        """
+        Merges segments into one, dropping deleted documents. Returns the new manifest.
+
+        :param names: The segments to merge (default: all of them). The merged segment takes
+                      the place of the first one.
+        """
+        names = list(manifest["segments"]) if names is None else names
+        docs, doc_lengths, postings_by_term = [], [], {}
+        for name in names:
+            segment = self.open_segment(name)
+            live = np.ones(len(segment.docs), dtype=bool)
+            live[manifest["deleted"].get(name, [])] = False
+            # Segment-local numbers -> numbers in the merged segment (-1 for deleted documents)
+            renumber = np.full(len(segment.docs), -1, dtype=np.int64)
+            renumber[live] = np.arange(len(docs), len(docs) + int(live.sum()))
+            docs.extend(doc for doc, keep in zip(segment.docs, live) if keep)
+            doc_lengths.extend(segment.doc_lengths[live].astype(np.uint32).tolist())
+            for term, term_id in segment.term_ids.items():
+                start, end = segment.term_offsets[term_id], segment.term_offsets[term_id + 1]
+                new_numbers = renumber[segment.postings_docs[start:end]]
+                keep = new_numbers >= 0
+                if keep.any():
+                    postings_by_term.setdefault(term, []).append((new_numbers[keep], segment.postings_tf[start:end][keep]))
+
+        merged = {term: (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])) for term, parts in postings_by_term.items()}
+        merged_name = f"seg_{uuid.uuid4().hex[:12]}"
+        write_segment(os.path.join(self.path, merged_name), docs, merged, doc_lengths)
+        position = manifest["segments"].index(names[0]) if names else len(manifest["segments"])
+        segments = [name for name in manifest["segments"] if name not in names]
+        segments.insert(min(position, len(segments)), merged_name)
+        deleted = {name: numbers for name, numbers in manifest["deleted"].items() if name not in names}
+        return {"segments": segments, "deleted": deleted}
+
+    def compact(self):
+        """Merges all segments into one now."""
+        with self.write_lock():
+            manifest = self.merge_segments(self.read_manifest())
+            self.save_manifest(manifest)
+            self.remove_unused_segments(manifest)
+
+    def remove_unused_segments(self, manifest):
+        """
+        Deletes segment folders no longer in the manifest (best effort). Readers that already
+        opened them keep their memory maps; readers about to open them retry (see refresh).
+        """
+        for name in os.listdir(self.path):
+            if name.startswith("seg_") and name not in manifest["segments"]:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+def lexical_index_path(CHROMA_DB_PATH, CHROMA_COLLECTION_NAME):
+    """Returns the folder of the lexical index kept next to a Chroma collection."""
+    return os.path.join(CHROMA_DB_PATH, "lexical", CHROMA_COLLECTION_NAME)
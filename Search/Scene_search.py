@@ -0,0 +1,248 @@
+import os
+import time
+import threading
+from ChromaDB import search_scenes
+from JSON_embed.JSON_Embed import get_embedding
+from Result_cache.Cache import LRUCache
+
+# Serves search queries from a long-lived process (the Django web workers).
+# The embedder and Chroma collection stay loaded between requests, query embeddings
+# and results are kept in LRU caches, and the result cache is dropped whenever the
+# index changes. Index changes are announced through a small version file next to
+# the Chroma database, so a write in the pipeline worker reaches every web process.
+#
+# Besides dense search, the searcher can rank with the BM25 index (Search/Lexical_index.py)
+# or fuse both rankings with reciprocal-rank fusion ("hybrid"), which keeps the semantic
+# matches of the embedder and adds exact-quote matches from the transcripts.
+
+VERSION_FILENAME = "index_version.txt"
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+RRF_K = 60
+
+
+def index_version_path(CHROMA_DB_PATH='chroma_db'):
+    return os.path.join(CHROMA_DB_PATH, VERSION_FILENAME)
+
+
+def bump_index_version(CHROMA_DB_PATH='chroma_db'):
+    """Marks the index as changed. Call after every write to the collection."""
+    os.makedirs(CHROMA_DB_PATH, exist_ok=True)
+    path = index_version_path(CHROMA_DB_PATH)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(str(time.time_ns()))
+    os.replace(temp_path, path)
+
+
+def read_index_version(CHROMA_DB_PATH='chroma_db'):
+    """Returns the current index version ("" if the index was never written)."""
+    try:
+        with open(index_version_path(CHROMA_DB_PATH), 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def lexical_scene(score, doc):
+    """Converts a BM25 hit into the scene dict returned by ChromaDB.search_scenes."""
+    return {
+        "scene_id": doc["id"],
+        "video": doc.get("video"),
+        "set_name": doc.get("set_name"),
+        "video_id": doc.get("video_id"),
+        "owner_id": doc.get("owner_id"),
+        "start_time": doc.get("start_time"),
+        "end_time": doc.get("end_time"),
+        "summary": doc.get("summary", ""),
+        "distance": None,
+        "score": score
+    }
+
+
+def reciprocal_rank_fusion(rankings, n_results, k=RRF_K):
+    """
+    Fuses several ranked scene lists: each scene scores sum(1 / (k + rank)) over the lists it is in.
+    Ties (e.g. two different scenes that are each first in one list) go to the earlier list.
+
+    :return: The top 'n_results' scenes, with 'score' set to the fused score.
+    """
+    fused, scenes = {}, {}
+    for ranking in rankings:
+        for rank, scene in enumerate(ranking, start=1):
+            fused[scene["scene_id"]] = fused.get(scene["scene_id"], 0.0) + 1 / (k + rank)
+            scenes.setdefault(scene["scene_id"], scene)
+    best = sorted(fused, key=fused.get, reverse=True)[:n_results]
+    return [{**scenes[scene_id], "score": fused[scene_id]} for scene_id in best]
+
+
+def refine_scene_timestamps(moments_collection, query_embedding, scenes, candidates_per_scene=8, k=RRF_K):
+    """
+    Second stage: finds the best matching moment (frame caption or spoken phrase) inside each
+    of the given scenes, adds a precise 'seek_time', and re-ranks the scenes by fusing their
+    original rank with the rank of their best moment.
+
+    Only the candidate scenes' moments are searched, so the cost stays bounded by len(scenes).
+
+    :param moments_collection: The '<collection>_moments' collection (see ChromaDB.populate_moments).
+    :return: The scenes with 'seek_time' and 'moment' added ('moment' is None when a scene has none).
+    """
+    if not scenes:
+        return scenes
+    scene_ids = [scene["scene_id"] for scene in scenes]
+    best = {}
+    try:
+        results = moments_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=len(scene_ids) * candidates_per_scene,
+            where={"scene_id": {"$in": scene_ids}},
+            include=["metadatas", "distances", "documents"]
+        )
+        # Results come best first, so the first moment seen for a scene is its best one
+        for metadata, distance, text in zip(results["metadatas"][0], results["distances"][0], results["documents"][0]):
+            best.setdefault(metadata["scene_id"], {
+                "timestamp": metadata["timestamp"],
+                "end_time": metadata.get("end_time", metadata["timestamp"]),
+                "kind": metadata.get("kind"),
+                "text": text,
+                "score": 1 - distance / 2
+            })
+    except Exception as e:
+        print(f"[Warning] Timestamp refinement failed: {e}")
+
+    moment_rank = {scene_id: rank for rank, scene_id in enumerate(sorted(best, key=lambda i: best[i]["score"], reverse=True), start=1)}
+    refined = []
+    for rank, scene in enumerate(scenes, start=1):
+        moment = best.get(scene["scene_id"])
+        fused = 1 / (k + rank) + (1 / (k + moment_rank[scene["scene_id"]]) if moment else 0.0)
+        seek_time = moment["timestamp"] if moment else scene["start_time"]
+        refined.append((fused, rank, {**scene, "seek_time": seek_time, "moment": moment}))
+    refined.sort(key=lambda item: (-item[0], item[1]))
+    return [scene for _, _, scene in refined]
+
+
+class SceneSearcher:
+    """
+    Cached scene search over one Chroma collection.
+
+    :param get_embedder: Function returning the embedding model (called on each miss, so a
+                         registry lookup keeps the model shared and warm).
+    :param get_collection: Function returning the Chroma collection.
+    :param CHROMA_DB_PATH: Folder of the Chroma database (holds the index version file).
+    :param embedding_cache_size: Number of query embeddings to keep.
+    :param result_cache_size: Number of result lists to keep.
+    :param get_lexical_index: Optional function returning the collection's BM25Index
+                              (needed for the "lexical" and "hybrid" modes).
+    :param get_moments_collection: Optional function returning the moment collection
+                                   (needed to refine timestamps).
+    """
+
+    def __init__(self, get_embedder, get_collection, CHROMA_DB_PATH='chroma_db', embedding_cache_size=1024, result_cache_size=1024, get_lexical_index=None, get_moments_collection=None):
+        self.get_embedder = get_embedder
+        self.get_collection = get_collection
+        self.get_lexical_index = get_lexical_index
+        self.get_moments_collection = get_moments_collection
+        self.chroma_db_path = CHROMA_DB_PATH
+        self.embeddings = LRUCache(embedding_cache_size)
+        self.results = LRUCache(result_cache_size)
+        self.version = None
+        self.lock = threading.Lock()
+
+    def check_version(self):
+        """Drops cached results if the index changed since they were computed."""
+        version = read_index_version(self.chroma_db_path)
+        with self.lock:
+            if version != self.version:
+                self.results.clear()
+                self.version = version
+
+    def query_embedding(self, query_text):
+        embedding = self.embeddings.get(query_text)
+        if embedding is None:
+            embedding = get_embedding(query_text, self.get_embedder(), normalize=True)
+            if embedding is not None:
+                self.embeddings.put(query_text, embedding)
+        return embedding
+
+    def dense_search(self, query_text, n_results, where):
+        embedding = self.query_embedding(query_text)
+        if embedding is None:
+            return []
+        return search_scenes(None, self.get_collection(), query_text, n_results, where, query_embedding=embedding)
+
+    def lexical_search(self, query_text, n_results, where):
+        if self.get_lexical_index is None:
+            return []
+        return [lexical_scene(score, doc) for score, doc in self.get_lexical_index().search(query_text, n_results, where)]
+
+    def search(self, query_text, n_results=5, where=None, mode="dense", refine=False):
+        """
+        Returns (scenes, cached) for a query. See ChromaDB.search_scenes for the scene fields.
+
+        :param where: Optional Chroma metadata filter.
+        :param mode: "dense" (embeddings), "lexical" (BM25) or "hybrid" (both, fused with RRF).
+        :param refine: If True, each scene also gets a 'seek_time' from its best matching
+                       moment and the scenes are re-ranked (see refine_scene_timestamps).
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'")
+        query_text = " ".join(query_text.split())
+        self.check_version()
+        key = (query_text, n_results, repr(sorted(where.items())) if where else None, mode, refine)
+        scenes = self.results.get(key)
+        if scenes is not None:
+            return scenes, True
+
+        if mode == "dense":
+            scenes = self.dense_search(query_text, n_results, where)
+        elif mode == "lexical":
+            scenes = self.lexical_search(query_text, n_results, where)
+        else:
+            # Fuse deeper candidate lists than requested, so a scene ranked well by one side still surfaces
+            # BM25 goes first: its top hits are exact word matches, so it wins ties
+            depth = max(4 * n_results, 20)
+            scenes = reciprocal_rank_fusion(
+                [self.lexical_search(query_text, depth, where), self.dense_search(query_text, depth, where)],
+                n_results
+            )
+        if refine and self.get_moments_collection is not None and scenes:
+            embedding = self.query_embedding(query_text)
+            if embedding is not None:
+                scenes = refine_scene_timestamps(self.get_moments_collection(), embedding, scenes)
+        self.results.put(key, scenes)
+        return scenes, False
+
+    def warm_up(self):
+        """Loads the embedder and opens the collection ahead of the first query."""
+        self.get_collection()
+        self.query_embedding("warm up")
+
+    def stats(self):
+        return {"version": self.version, "embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+
+# --- Process-wide searcher ---
+
+_scene_searchers = {}
+_scene_searcher_lock = threading.Lock()
+
+
+def get_scene_searcher(owner_id=None):
+    """
+    Returns the process-wide SceneSearcher for an owner's collection (created on first use).
+
+    Without per-owner collections (see DB_integrate.COLLECTION_PER_OWNER) every owner
+    shares one searcher; scope a search with a 'where' filter from ChromaDB.scene_filter.
+    """
+    from DB_integrate import get_collection, get_lexical_index, get_moments_collection, collection_name_for, CHROMA_DB_PATH, CHROMA_COLLECTION_NAME
+    collection_name = collection_name_for(owner_id, CHROMA_COLLECTION_NAME)
+    with _scene_searcher_lock:
+        if collection_name not in _scene_searchers:
+            from Model_registry.Registry import get_model
+            _scene_searchers[collection_name] = SceneSearcher(
+                lambda: get_model("embedder"),
+                lambda: get_collection(CHROMA_DB_PATH, collection_name),
+                CHROMA_DB_PATH,
+                get_lexical_index=lambda: get_lexical_index(CHROMA_DB_PATH, collection_name),
+                get_moments_collection=lambda: get_moments_collection(CHROMA_DB_PATH, collection_name)
+            )
+        return _scene_searchers[collection_name]
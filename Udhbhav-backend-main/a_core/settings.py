@@ -104,6 +104,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Video workers and the web process write to the same file; wait for locks instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -161,3 +163,9 @@ ACCOUNT_SIGNUP_REDIRECT_URL = "{% url 'account_signup' %}?next={% url 'profile-o
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 ACCOUNT_LOGIN_METHODS = {'email', 'username'}
 ACCOUNT_EMAIL_REQUIRED = True
+
+# Load the search embedder when the web process starts instead of on the first query
+SEARCH_WARM_UP = os.environ.get('SEARCH_WARM_UP') == '1'
+
+# Bearer token Prometheus sends to scrape /videos/metrics/ (staff users can always open it)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
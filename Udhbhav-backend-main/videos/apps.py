@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class VideosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'videos'
+
+    def ready(self):
+        import videos.signals
+
+        # Load the embedder and open the index in the background, so the first search is fast
+        from django.conf import settings
+        if getattr(settings, 'SEARCH_WARM_UP', False):
+            import threading
+            from Search.Scene_search import get_scene_searcher
+            threading.Thread(target=get_scene_searcher().warm_up, daemon=True).start()
@@ -0,0 +1,113 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Video
+
+# A small durable job queue on top of the Video table.
+# A video is a job: the upload view queues it, and any number of
+# 'process_videos' worker processes claim and run queued videos.
+# Claiming is a conditional UPDATE, so two workers never get the same video.
+
+MAX_ATTEMPTS = 3
+
+
+def enqueue_video(video):
+    """Marks a video as waiting for processing."""
+    video.status = Video.STATUS_QUEUED
+    video.progress = 0
+    video.status_message = 'Waiting for a worker'
+    video.queued_at = timezone.now()
+    video.started_at = None
+    video.finished_at = None
+    video.save(update_fields=['status', 'progress', 'status_message', 'queued_at', 'started_at', 'finished_at'])
+
+
+def claim_next_video(worker_id):
+    """
+    Claims the oldest queued video for this worker.
+
+    :return: The claimed Video, or None if the queue is empty.
+    """
+    while True:
+        candidate = (Video.objects
+                     .filter(status=Video.STATUS_QUEUED)
+                     .order_by('queued_at', 'id')
+                     .values_list('id', flat=True)
+                     .first())
+        if candidate is None:
+            return None
+
+        now = timezone.now()
+        claimed = Video.objects.filter(id=candidate, status=Video.STATUS_QUEUED).update(
+            status=Video.STATUS_PROCESSING,
+            worker=worker_id,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+            status_message='Starting',
+        )
+        if claimed:
+            return Video.objects.get(id=candidate)
+        # Another worker got it first; try the next one
+
+
+def claimed_by(video_id, worker_id):
+    """Returns the video as a queryset, if it is still being processed by this worker."""
+    return Video.objects.filter(id=video_id, worker=worker_id, status=Video.STATUS_PROCESSING)
+
+
+def update_progress(video_id, worker_id, progress, message=''):
+    """
+    Stores the progress (0-100) and a short message for a video being processed.
+
+    :return: 1, or 0 if the video is no longer this worker's (it was requeued and claimed by another).
+    """
+    return claimed_by(video_id, worker_id).update(progress=progress, status_message=message[:255], heartbeat_at=timezone.now())
+
+
+def heartbeat(video_id, worker_id):
+    """
+    Tells other workers this video's worker is still alive.
+
+    :return: 1, or 0 if the video is no longer this worker's.
+    """
+    return claimed_by(video_id, worker_id).update(heartbeat_at=timezone.now())
+
+
+def finish_video(video_id, worker_id, success, message=''):
+    """
+    Marks a claimed video as done or failed.
+
+    :return: 1, or 0 if the video is no longer this worker's; its current owner's state is left alone.
+    """
+    fields = {
+        'status': Video.STATUS_DONE if success else Video.STATUS_FAILED,
+        'status_message': message[:255],
+        'finished_at': timezone.now(),
+    }
+    if success:
+        fields['progress'] = 100
+    return claimed_by(video_id, worker_id).update(**fields)
+
+
+def requeue_stale_videos(stale_after):
+    """
+    Puts back videos whose worker died mid-job.
+
+    A video counts as stale if its worker has not sent a heartbeat for longer than
+    'stale_after' (a timedelta). Videos that already used up MAX_ATTEMPTS are marked
+    failed instead.
+
+    :return: The number of videos requeued.
+    """
+    cutoff = timezone.now() - stale_after
+    stale = Video.objects.filter(status=Video.STATUS_PROCESSING, heartbeat_at__lt=cutoff)
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=Video.STATUS_FAILED,
+        status_message='Gave up after repeated worker failures',
+        finished_at=timezone.now(),
+    )
+    return stale.filter(attempts__lt=MAX_ATTEMPTS).update(
+        status=Video.STATUS_QUEUED,
+        status_message='Requeued after a worker stopped responding',
+    )
@@ -0,0 +1,110 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from videos.jobs import claim_next_video, finish_video, heartbeat, requeue_stale_videos, update_progress
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a video processing worker: claims queued uploads and runs the full "
+        "pipeline on them. Start several of these to process videos in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the queue until it is empty, then exit.')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--heartbeat-interval', type=float, default=30.0, help='Seconds between heartbeats while a video is processed.')
+        parser.add_argument('--stale-after', type=float, default=300.0, help='Requeue videos whose worker sent no heartbeat for this many seconds.')
+        parser.add_argument('--warm-up', action='store_true', help='Load and warm up the ML models before claiming the first video.')
+
+    def handle(self, *args, **options):
+        # The ML pipeline is only imported by the worker, never by the web process
+        from Django_integrate import initialise
+        from Model_registry.Registry import registry
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Video worker {worker_id} started.")
+
+        # Models are loaded once per worker process and reused for every video it claims
+        if options['warm_up']:
+            registry.warm_up(['blip', 'whisper', 'embedder'])
+            registry.print_memory_report()
+
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_videos(timedelta(seconds=options['stale_after']))
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale video(s).")
+
+            video = claim_next_video(worker_id)
+            if video is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Processing video {video.id}: {video.title} (attempt {video.attempts})")
+            self.process(video, worker_id, initialise, options['heartbeat_interval'])
+
+        self.stdout.write("Queue is empty. Worker stopped.")
+
+    def process(self, video, worker_id, initialise, heartbeat_interval):
+        """
+        Runs the pipeline for one claimed video while a background thread sends heartbeats.
+
+        If the video stops being this worker's (it was requeued as stale and claimed by
+        another worker), its progress and final status are left to the new owner.
+        """
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def lose_claim():
+            if not lost.is_set():
+                lost.set()
+                self.stdout.write(self.style.WARNING(f"Video {video.id} was requeued and taken over by another worker."))
+
+        def send_heartbeats():
+            while not stop.wait(heartbeat_interval):
+                if not heartbeat(video.id, worker_id):
+                    lose_claim()
+                    break
+            connection.close()
+
+        def report_progress(percent, message):
+            if not lost.is_set() and not update_progress(video.id, worker_id, percent, message):
+                lose_claim()
+
+        def finish(success, message):
+            if not finish_video(video.id, worker_id, success, message):
+                lose_claim()
+                return False
+            return True
+
+        beater = threading.Thread(target=send_heartbeats, daemon=True)
+        beater.start()
+        try:
+            result = initialise(
+                video.video_file,
+                progress_callback=report_progress,
+                index_metadata={'video_id': video.id, 'owner_id': video.owner_id},
+            )
+            if result:
+                if finish(True, 'Ready to search'):
+                    self.stdout.write(self.style.SUCCESS(f"Video {video.id} done."))
+            else:
+                if finish(False, 'Pipeline did not complete'):
+                    self.stdout.write(self.style.ERROR(f"Video {video.id} failed."))
+        except Exception as e:
+            traceback.print_exc()
+            if finish(False, f'{type(e).__name__}: {e}'):
+                self.stdout.write(self.style.ERROR(f"Video {video.id} failed: {e}"))
+        finally:
+            stop.set()
+            beater.join()
@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-indexes processed videos in ChromaDB with their video and owner ids, so searches "
+        "can be scoped to a video or an owner. Unchanged scenes are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, action='append', help='Only re-index this video id (repeatable).')
+        parser.add_argument('--force', action='store_true', help='Delete and re-embed every scene instead of skipping unchanged ones.')
+
+    def handle(self, *args, **options):
+        # The ML pipeline is only imported when the command runs
+        from DB_integrate import reindex_video_index
+
+        videos = Video.objects.filter(status=Video.STATUS_DONE).exclude(video_file='')
+        if options['video']:
+            videos = videos.filter(id__in=options['video'])
+
+        for video in videos:
+            filename = os.path.basename(video.video_file.name)
+            indexed = reindex_video_index(
+                filename,
+                force=options['force'],
+                index_metadata={'video_id': video.id, 'owner_id': video.owner_id},
+            )
+            self.stdout.write(f"Video {video.id} ({filename}): {len(indexed)} scenes indexed.")
@@ -4,6 +4,19 @@ from django.utils import timezone
 from django.db import models
 
 class Video(models.Model):
+    # Processing states. Uploads are queued and picked up by the
+    # 'process_videos' worker (see videos/jobs.py).
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     owner = models.ForeignKey(User ,default = 1, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     video_file = models.FileField(upload_to='videos/', null=True, blank=True)
@@ -11,6 +24,17 @@ class Video(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     thumbnail = models.ImageField(upload_to='thumbnails/', null=True, blank=True)
 
+    # Videos uploaded before the job queue existed were processed inline, hence 'done'
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DONE, db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    status_message = models.CharField(max_length=255, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    queued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
 
     def __str__(self):
         return self.title
@@ -0,0 +1,19 @@
+import os
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Video
+
+
+@receiver(post_delete, sender=Video)
+def video_postdelete(sender, instance, **kwargs):
+    # remove the video's scenes from the search index
+    if not instance.video_file:
+        return
+    try:
+        # imported here so Django startup doesn't load the pipeline
+        from DB_integrate import delete_video_index
+        delete_video_index(os.path.basename(instance.video_file.name), owner_id=instance.owner_id)
+    except Exception as e:
+        print(f"[Warning] Could not remove video {instance.pk} from the search index: {e}")
@@ -1,3 +1,183 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import jobs
+from .models import Video
+
+
+class JobQueueTests(TestCase):
+    """Concurrency rules of the video job queue (videos/jobs.py)."""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='password')
+
+    def queued_video(self, title='clip'):
+        video = Video.objects.create(owner=self.owner, title=title)
+        jobs.enqueue_video(video)
+        return video
+
+    def make_stale(self, video):
+        Video.objects.filter(id=video.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+    def claim_with_rival(self, worker_id, rival_id):
+        """
+        Runs claim_next_video(worker_id) while a rival worker claims in between: after
+        worker_id has picked its candidate, but before its conditional UPDATE
+        (claim_next_video reads the clock in between).
+
+        :return: (video claimed by worker_id, video claimed by the rival)
+        """
+        real_now = timezone.now
+        rival_claim = []
+
+        def now_with_rival():
+            if not rival_claim:
+                rival_claim.append(None) # Set first, so the rival's own clock reads pass through
+                rival_claim[0] = jobs.claim_next_video(rival_id)
+            return real_now()
+
+        with mock.patch.object(jobs.timezone, 'now', side_effect=now_with_rival):
+            claimed = jobs.claim_next_video(worker_id)
+        return claimed, rival_claim[0]
+
+    def test_racing_claims_only_one_wins(self):
+        video = self.queued_video()
+        claimed, rival_claimed = self.claim_with_rival('worker-a', 'worker-b')
+
+        self.assertIsNone(claimed)
+        self.assertEqual(rival_claimed.id, video.id)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_PROCESSING)
+        self.assertEqual(video.worker, 'worker-b')
+        self.assertEqual(video.attempts, 1)
+
+    def test_losing_claim_moves_on_to_next_video(self):
+        first = self.queued_video('first')
+        second = self.queued_video('second')
+        claimed, rival_claimed = self.claim_with_rival('worker-a', 'worker-b')
+
+        self.assertEqual(rival_claimed.id, first.id)
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual(claimed.worker, 'worker-a')
+
+    def test_claim_on_empty_queue_returns_none(self):
+        Video.objects.create(owner=self.owner, title='already processed')
+        self.assertIsNone(jobs.claim_next_video('worker-a'))
+
+    def test_stale_job_is_requeued(self):
+        video = self.queued_video()
+        jobs.claim_next_video('worker-a')
+        self.make_stale(video)
+
+        self.assertEqual(jobs.requeue_stale_videos(timedelta(minutes=5)), 1)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_QUEUED)
+
+        # The requeued video can be claimed again, and that counts as a new attempt
+        claimed = jobs.claim_next_video('worker-b')
+        self.assertEqual(claimed.id, video.id)
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_job_with_recent_heartbeat_is_not_requeued(self):
+        video = self.queued_video()
+        jobs.claim_next_video('worker-a')
+        jobs.heartbeat(video.id, 'worker-a')
+
+        self.assertEqual(jobs.requeue_stale_videos(timedelta(minutes=5)), 0)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_PROCESSING)
+
+    def test_requeued_worker_cannot_overwrite_new_owner(self):
+        video = self.queued_video()
+        jobs.claim_next_video('worker-a')
+        self.make_stale(video)
+        jobs.requeue_stale_videos(timedelta(minutes=5))
+        jobs.claim_next_video('worker-b')
+
+        # worker-a comes back from a long stall and reports on a video it no longer owns
+        self.assertEqual(jobs.update_progress(video.id, 'worker-a', 90, 'Embedding'), 0)
+        self.assertEqual(jobs.heartbeat(video.id, 'worker-a'), 0)
+        self.assertEqual(jobs.finish_video(video.id, 'worker-a', False, 'Pipeline did not complete'), 0)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_PROCESSING)
+        self.assertEqual(video.worker, 'worker-b')
+        self.assertEqual(video.progress, 0)
+
+        self.assertEqual(jobs.update_progress(video.id, 'worker-b', 50, 'Captioning'), 1)
+        self.assertEqual(jobs.finish_video(video.id, 'worker-b', True, 'Ready to search'), 1)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_DONE)
+        self.assertEqual(video.progress, 100)
+
+        # A finished video cannot be finished again, even by the worker that processed it
+        self.assertEqual(jobs.finish_video(video.id, 'worker-b', False, 'late failure'), 0)
+
+    def test_job_fails_after_max_attempts(self):
+        video = self.queued_video()
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            claimed = jobs.claim_next_video(f'worker-{attempt}')
+            self.assertEqual(claimed.attempts, attempt)
+            self.make_stale(video)
+            jobs.requeue_stale_videos(timedelta(minutes=5))
+
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.STATUS_FAILED)
+        self.assertEqual(video.attempts, jobs.MAX_ATTEMPTS)
+        self.assertIsNotNone(video.finished_at)
+        self.assertIsNone(jobs.claim_next_video('worker-next'))
+
+
+class SearchAccessTests(TestCase):
+    """Who may search which videos (views.search_scenes)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.own_video = Video.objects.create(owner=self.user, title='mine', status=Video.STATUS_QUEUED)
+        self.public_video = Video.objects.create(owner=self.other, title='public')
+        self.private_video = Video.objects.create(owner=self.other, title='in queue', status=Video.STATUS_QUEUED)
+
+        # Stands in for the search stack, which needs the embedder and ChromaDB
+        self.searcher = mock.Mock()
+        self.searcher.search.return_value = ([], False)
+        patcher = mock.patch('Search.Scene_search.get_scene_searcher', return_value=self.searcher)
+        self.get_scene_searcher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, user=None, **params):
+        if user is not None:
+            self.client.force_login(user)
+        return self.client.get(reverse('search_scenes'), {'q': 'a dog', **params})
+
+    def searched_filter(self):
+        return self.searcher.search.call_args.args[2]
+
+    def test_anonymous_search_is_rejected(self):
+        self.assertEqual(self.search().status_code, 401)
+        self.assertEqual(self.search(video=self.public_video.id).status_code, 401)
+        self.searcher.search.assert_not_called()
+
+    def test_unscoped_search_covers_own_videos(self):
+        self.assertEqual(self.search(self.user).status_code, 200)
+        self.assertEqual(self.searched_filter(), {'owner_id': self.user.id})
+
+    def test_owner_filter_must_be_self(self):
+        self.assertEqual(self.search(self.user, owner=self.user.id).status_code, 200)
+        self.assertEqual(self.search(self.user, owner=self.other.id).status_code, 403)
+
+    def test_staff_can_search_any_owner(self):
+        self.assertEqual(self.search(self.staff, owner=self.other.id).status_code, 200)
+        self.assertEqual(self.searched_filter(), {'owner_id': self.other.id})
 
-# Create your tests here.
+    def test_video_filter_needs_own_or_public_video(self):
+        self.assertEqual(self.search(self.user, video=self.own_video.id).status_code, 200)
+        self.assertEqual(self.search(self.user, video=self.public_video.id).status_code, 200)
+        self.assertEqual(self.searched_filter(), {'video_id': self.public_video.id})
+        self.assertEqual(self.search(self.user, video=self.private_video.id).status_code, 403)
+        self.assertEqual(self.search(self.staff, video=self.private_video.id).status_code, 200)
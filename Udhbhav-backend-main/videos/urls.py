@@ -4,4 +4,7 @@ from . import views
 urlpatterns = [
     path('upload/', views.upload_video, name='upload_video'),
     path('videodetail/<int:pk>/', views.video_detail , name = 'viddetail'),
+    path('status/<int:pk>/', views.video_status, name = 'video_status'),
+    path('search/', views.search_scenes, name = 'search_scenes'),
+    path('metrics/', views.pipeline_metrics, name = 'pipeline_metrics'),
 ]
\ No newline at end of file
@@ -1,12 +1,18 @@
 
 
 # Create your views here.
-from django.shortcuts import render, redirect
+import os
+import time
+import hmac
+from django.conf import settings
+from django.db.models import Count
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, HttpResponse
 from .forms import VideoForm
 from .models import Video
+from .jobs import enqueue_video
 from .utils import *
-from Django_integrate import initialise
 
 @login_required
 def upload_video(request):
@@ -17,8 +23,9 @@ def upload_video(request):
             video = form.save(commit=False)
             video.owner = request.user  # 👈 assign the logged-in user
             video.save()
-            initialise(video.video_file)
-            return redirect('home')
+            # Processing happens in the 'process_videos' worker, not in this request
+            enqueue_video(video)
+            return redirect('viddetail', pk=video.id)
     else:
         form = VideoForm()
     return render(request, 'videos/upload.html', {'form': form})
@@ -27,4 +34,135 @@ def upload_video(request):
 def video_detail(request,pk):
     video = Video.objects.get(id=pk)
     videos = Video.objects.all()
-    return render(request , 'videos/videodetail.html' , {'video':video , 'videos':videos})
\ No newline at end of file
+    return render(request , 'videos/videodetail.html' , {'video':video , 'videos':videos})
+
+
+def video_status(request, pk):
+    video = get_object_or_404(Video, id=pk)
+    return JsonResponse({
+        'id': video.id,
+        'status': video.status,
+        'progress': video.progress,
+        'message': video.status_message,
+        'attempts': video.attempts,
+        'queued_at': video.queued_at,
+        'started_at': video.started_at,
+        'finished_at': video.finished_at,
+    })
+
+
+def video_is_public(video):
+    """
+    Whether anyone may search a video's scenes. video_detail shows every processed video,
+    file and title included, to all visitors; videos still in the queue have no scenes yet.
+    """
+    return video.status == Video.STATUS_DONE
+
+
+def search_scenes(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Log in to search videos'}, status=401)
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': "Missing query parameter 'q'"}, status=400)
+    try:
+        k = min(max(int(request.GET.get('k', 5)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': "'k' must be a number"}, status=400)
+
+    try:
+        video_id = int(request.GET['video']) if request.GET.get('video') else None
+        owner_id = int(request.GET['owner']) if request.GET.get('owner') else None
+    except ValueError:
+        return JsonResponse({'error': "'video' and 'owner' must be ids"}, status=400)
+    if request.GET.get('mine'):
+        owner_id = request.user.id
+    # Other users' collections are for staff only; other users' videos only if they are public
+    if not request.user.is_staff:
+        if owner_id is not None and owner_id != request.user.id:
+            return JsonResponse({'error': "You can only search your own videos"}, status=403)
+        if video_id is None:
+            owner_id = request.user.id
+    scoped_video = get_object_or_404(Video, id=video_id) if video_id is not None else None
+    if (scoped_video is not None and not request.user.is_staff
+            and scoped_video.owner_id != request.user.id and not video_is_public(scoped_video)):
+        return JsonResponse({'error': "This video is not public"}, status=403)
+    # The owner whose collection is searched (only matters with one collection per owner)
+    collection_owner = scoped_video.owner_id if scoped_video is not None else owner_id
+
+    # Imported here so Django startup doesn't load the search stack; the searcher
+    # keeps the embedder and collection loaded for every later request
+    from ChromaDB import scene_filter
+    from DB_integrate import COLLECTION_PER_OWNER
+    from Search.Scene_search import get_scene_searcher, SEARCH_MODES
+
+    # 'hybrid' fuses embedding and BM25 rankings, so exact quotes from the dialogue are found too
+    mode = request.GET.get('mode', 'hybrid')
+    if mode not in SEARCH_MODES:
+        return JsonResponse({'error': f"'mode' must be one of {', '.join(SEARCH_MODES)}"}, status=400)
+    # Refining looks inside the matched scenes for the frame or phrase to seek to (refine=0 turns it off)
+    refine = request.GET.get('refine', '1') != '0'
+    if COLLECTION_PER_OWNER and collection_owner is None:
+        return JsonResponse({'error': "Scope the search with 'video', 'owner' or 'mine'"}, status=400)
+
+    start = time.perf_counter()
+    # The video/owner filter runs inside Chroma, so scoped searches still return k results
+    scenes, cached = get_scene_searcher(collection_owner).search(query, k, scene_filter(video_id, owner_id), mode, refine)
+
+    videos = Video.objects.in_bulk({scene['video_id'] for scene in scenes if scene['video_id'] is not None})
+    # Scenes indexed before video ids were stored are matched by filename (uploads are stored as 'videos/<filename>')
+    legacy_filenames = {scene['video'] for scene in scenes if scene['video_id'] is None}
+    videos_by_filename = {
+        os.path.basename(video.video_file.name): video
+        for video in Video.objects.filter(video_file__in=[f'videos/{name}' for name in legacy_filenames])
+    } if legacy_filenames else {}
+
+    results = []
+    for rank, scene in enumerate(scenes, start=1):
+        video = videos.get(scene['video_id']) or videos_by_filename.get(scene['video'])
+        results.append({
+            'rank': rank,
+            'video_id': video.id if video else None,
+            'video_title': video.title if video else scene['video'],
+            'set_name': scene['set_name'],
+            'start_time': scene['start_time'],
+            'end_time': scene['end_time'],
+            'seek_time': scene.get('seek_time', scene['start_time']),
+            'moment': scene['moment']['text'] if scene.get('moment') else None,
+            'summary': scene['summary'],
+            'score': round(scene['score'], 4),
+        })
+
+    return JsonResponse({
+        'query': query,
+        'mode': mode,
+        'results': results,
+        'cached': cached,
+        'took_ms': round((time.perf_counter() - start) * 1000, 2),
+    })
+
+
+def pipeline_metrics(request):
+    """
+    Serves the job queue size and every processed video's pipeline metrics (see
+    Pipeline_metrics/Metrics.py) in the Prometheus text format. Open to staff users and to
+    scrapers sending 'Authorization: Bearer <METRICS_TOKEN>'.
+    """
+    token = settings.METRICS_TOKEN
+    sent = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not (request.user.is_staff or (token and hmac.compare_digest(sent, token))):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+
+    # Imported here so Django startup doesn't load the pipeline modules
+    from Pipeline_metrics.Metrics import load_metrics, metric_samples, prometheus_text
+
+    samples = [
+        ('clipquery_videos', {'status': row['status']}, row['count'])
+        for row in Video.objects.values('status').annotate(count=Count('id')).order_by('status')
+    ]
+    for video in Video.objects.exclude(video_file='').exclude(video_file__isnull=True).only('id', 'video_file'):
+        filename = os.path.basename(video.video_file.name)
+        report = load_metrics(os.path.join('video_processing/Sets/', filename))
+        if report is not None:
+            samples += metric_samples(report, {'video_id': video.id, 'video': filename})
+    return HttpResponse(prometheus_text(samples), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,64 @@
+import os
+import sys
+import glob
+import tempfile
+from contextlib import redirect_stdout
+from video_processing.Full_extraction import process_video
+from video_processing.Description_JSON_Generator import list_set_frames, read_set_times, read_frame_times
+from Frame_Description.Frame_dedup import FrameDeduplicator
+from benchmarks.bench_segmentation import write_synthetic_video
+
+# Measures how many captions near-duplicate detection skips at several thresholds, and what
+# the signatures cost per frame. The time saved is the skipped frames times the caption time
+# per frame ('--caption-ms', default 350 ms, about BLIP-large on a CPU core).
+# Without a sets folder, a synthetic video is extracted into fixed 15 s sets first.
+# Run from the repo root:
+#   python -m benchmarks.bench_dedup [sets_folder] [--caption-ms N]
+
+THRESHOLDS = (0.0, 0.01, 0.03, 0.05, 0.1)
+
+
+def list_frames(sets_folder):
+    """Returns [(set folder, timestamp, frame path)] for every frame PNG in a video's sets folder."""
+    frames = []
+    for set_folder_path in sorted(glob.glob(os.path.join(sets_folder, "set_*"))):
+        start_time, end_time = read_set_times(set_folder_path)
+        if start_time is None:
+            continue
+        for frame_timestamp, frame_path in list_set_frames(set_folder_path, start_time, end_time, 2.0, read_frame_times(set_folder_path)):
+            frames.append((set_folder_path, frame_timestamp, frame_path))
+    return frames
+
+
+def run_dedup(frames, max_difference):
+    """Runs the deduplicator over the frames. Returns its stats."""
+    dedup = FrameDeduplicator(max_difference)
+    for set_folder_path, frame_timestamp, frame_path in frames:
+        dedup.find_duplicate(set_folder_path, frame_timestamp, frame_path)
+    return dedup.stats()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    caption_seconds = float(args[args.index("--caption-ms") + 1]) / 1000 if "--caption-ms" in args else 0.35
+    temp_dir = tempfile.TemporaryDirectory()
+    if args and not args[0].startswith("--"):
+        sets_folder = args[0]
+    else:
+        video_path = os.path.join(temp_dir.name, "synthetic.mp4")
+        write_synthetic_video(video_path)
+        sets_folder = os.path.join(temp_dir.name, "sets")
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            process_video(video_path, sets_folder, single_pass=True)
+
+    frames = list_frames(sets_folder)
+    print("\n--- Caption Dedup Benchmark ---")
+    print(f"Frames: {len(frames)} in {sets_folder if args and not args[0].startswith('--') else 'synthetic sets'}")
+    for max_difference in THRESHOLDS:
+        stats = run_dedup(frames, max_difference)
+        signature_ms = stats["signature_seconds"] / max(stats["frames"], 1) * 1000
+        saved = stats["reused"] * caption_seconds - stats["signature_seconds"]
+        print(f"  max_difference {max_difference:4.2f}: {stats['reused']:4d} reused ({stats['skipped_fraction']:6.1%})  "
+              f"signature {signature_ms:5.2f} ms/frame  ~{saved:7.2f}s saved")
+
+    temp_dir.cleanup()
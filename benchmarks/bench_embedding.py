@@ -0,0 +1,95 @@
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+from ChromaDB import populate_chroma_db
+from JSON_embed.JSON_Embed import generate_embedding_from_file, serialize_scene_to_text
+from benchmarks.stubs import StubEmbedder
+from Scene_store.Store import get_scene_store
+
+# Compares embedding scenes one file at a time (the previous populate_chroma_db loop, reading
+# the legacy summary_data.json files exported from the scene store) with the batched path
+# reading the store, and reports embeddings per second. Vectors kept in the store are cleared
+# first, so every scene is really embedded. Uses an in-memory Chroma collection. Without a
+# video filename, synthetic scenes are generated. Run from the repo root:
+#   python -m benchmarks.bench_embedding [video_filename] [--stub] [--scenes N]
+
+SETS_BASE_FOLDER = "video_processing/Sets/"
+
+
+def write_synthetic_scenes(base_folder, video_filename, count):
+    """Writes 'count' fake summarized scenes into the scene store of base_folder/video_filename."""
+    store = get_scene_store(os.path.join(base_folder, video_filename))
+    for i in range(count):
+        set_name = f"set_{i + 1:03d}"
+        store.put_set(set_name, i + 1, i * 15.0, (i + 1) * 15.0)
+        store.put_description(set_name, " ".join(f"word{(i * 7 + j) % 101}" for j in range(40)), [])
+        store.put_summary(set_name, None if i == 0 else f"Scene {i} happened.", f"Scene {i + 1}: a person walks across a room and talks about topic {i % 17}.")
+
+
+def time_per_file(embedder, collection, json_files, video_filename):
+    """The previous loop: read each file, embed it on its own (reading it again), upsert once."""
+    start = time.perf_counter()
+    ids, embeddings, documents = [], [], []
+    for file_path in json_files:
+        with open(file_path, 'r') as f:
+            scene_data = json.load(f)
+        embeddings.append(generate_embedding_from_file(embedder, file_path).tolist())
+        documents.append(serialize_scene_to_text(scene_data))
+        ids.append(f"{video_filename}_{os.path.basename(os.path.dirname(file_path))}")
+    collection.upsert(ids=ids, embeddings=embeddings, documents=documents)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import chromadb
+    from contextlib import redirect_stdout
+
+    args = sys.argv[1:]
+    use_stub = "--stub" in args
+    scene_count = int(args[args.index("--scenes") + 1]) if "--scenes" in args else 500
+    positional = [a for i, a in enumerate(args) if not a.startswith("--") and (i == 0 or args[i - 1] != "--scenes")]
+
+    temp_dir = None
+    if positional:
+        sets_base_folder, video_filename = SETS_BASE_FOLDER, positional[0]
+    else:
+        temp_dir = tempfile.TemporaryDirectory()
+        sets_base_folder, video_filename = temp_dir.name, "synthetic.mp4"
+        write_synthetic_scenes(sets_base_folder, video_filename, scene_count)
+
+    store = get_scene_store(os.path.join(sets_base_folder, video_filename))
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        store.export_legacy_json()
+    store.clear_embeddings()
+    json_files = sorted(glob.glob(os.path.join(sets_base_folder, video_filename, "set_*/summary_data.json")))
+    if not json_files:
+        print(f"[Error] No summarized scenes found for {video_filename}")
+        sys.exit(1)
+
+    if use_stub:
+        # Fixed per-call overhead dominates small batches, as on a GPU
+        embedder = StubEmbedder(call_latency=0.01, item_latency=0.0005)
+    else:
+        from Model_registry.Registry import get_model
+        embedder = get_model("embedder")
+
+    client = chromadb.EphemeralClient()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        per_file_seconds = time_per_file(embedder, client.get_or_create_collection("bench_per_file"), json_files, video_filename)
+        start = time.perf_counter()
+        populate_chroma_db(embedder, client.get_or_create_collection("bench_batched"), sets_base_folder, video_filename, "bench_batched")
+        batched_seconds = time.perf_counter() - start
+
+    count = len(json_files)
+    print("\n--- Embedding Benchmark ---")
+    print(f"Scenes: {count} ({'stub' if use_stub else 'all-MiniLM-L6-v2'})")
+    print(f"  per file  {per_file_seconds:8.2f}s  {count / per_file_seconds:8.1f} embeddings/s")
+    print(f"  batched   {batched_seconds:8.2f}s  {count / batched_seconds:8.1f} embeddings/s")
+    if batched_seconds > 0:
+        print(f"  Speedup: {per_file_seconds / batched_seconds:.2f}x")
+
+    if temp_dir is not None:
+        temp_dir.cleanup()
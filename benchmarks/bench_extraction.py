@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+from video_processing.Full_extraction import process_video
+
+# Compares the per-set FFmpeg loop (serial and pooled) with the single-pass extractor.
+# Run from the repo root:
+#   python -m benchmarks.bench_extraction "video_processing/Video/Vid1.mp4"
+
+def count_files(folder):
+    """Returns (number of files, total size in bytes) under a folder."""
+    count, size = 0, 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            count += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return count, size
+
+def time_extraction(video_path, chunk_duration=15.0, frame_interval=2.0, **kwargs):
+    """
+    Runs process_video into a temporary folder and measures wall-clock time.
+
+    :param video_path: Path to the video to extract.
+    :param kwargs: Extra arguments passed to process_video (e.g. single_pass=True).
+    :return: A dictionary with the elapsed time and the output file count/size.
+    """
+    output_folder = tempfile.mkdtemp(prefix="clipquery_bench_")
+    try:
+        start = time.perf_counter()
+        process_video(video_path, output_folder, chunk_duration=chunk_duration, frame_interval=frame_interval, **kwargs)
+        elapsed = time.perf_counter() - start
+        files, size = count_files(output_folder)
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    return {"seconds": elapsed, "files": files, "bytes": size}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.bench_extraction <video_path>")
+        sys.exit(1)
+    video_path = sys.argv[1]
+
+    per_set = time_extraction(video_path)
+    workers = os.cpu_count() or 1
+    pooled = time_extraction(video_path, workers=workers)
+    single_pass = time_extraction(video_path, single_pass=True)
+
+    print("\n--- Extraction Benchmark ---")
+    print(f"Video: {video_path}")
+    for name, result in (("per-set loop", per_set), (f"{workers} workers", pooled), ("single pass", single_pass)):
+        print(f"  {name:<13} {result['seconds']:8.2f}s  {result['files']} files  {result['bytes'] / 1e6:.1f} MB")
+    for name, result in ((f"{workers} workers", pooled), ("single pass", single_pass)):
+        if result["seconds"] > 0:
+            print(f"  Speedup ({name}): {per_set['seconds'] / result['seconds']:.2f}x")
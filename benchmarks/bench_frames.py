@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import math
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from PIL import Image
+from video_processing.Full_extraction import process_video, list_frame_files
+from benchmarks.bench_pipeline import write_test_video
+
+# Compares how frame images are stored on disk: full-resolution PNG (the old default) against
+# lossy JPEG/WebP scaled down to the captioner's input size (see frame_output_options in
+# video_processing/Full_extraction.py). For each setting it reports extraction time, frame
+# count and disk usage, and checks on a sample of frames that captioning is unaffected:
+#   - with '--blip', the sample is captioned by the real BLIP model from both the PNG and the
+#     compact frames, and the share of identical captions is reported (needs the BLIP weights);
+#   - always, both frames are turned into what BLIP actually sees (RGB, 384x384 bicubic) and
+#     compared pixel by pixel (PSNR, mean absolute difference). This is only a proxy for
+#     caption equivalence, but it needs no model.
+# Without a video path, a synthetic 1080p test video is used. Run from the repo root:
+#   python -m benchmarks.bench_frames [video_path] [--settings png,jpg:384:90,webp:384:80] [--blip]
+
+MODEL_INPUT_SIZE = 384 # BLIP resizes every image to 384x384
+DEFAULT_SETTINGS = "png,jpg:384:90,jpg:384:75,webp:384:80"
+
+
+def parse_setting(text):
+    """Parses 'format[:size[:quality]]' (e.g. 'jpg:384:90') into a frame encoding, or None for plain 'png'."""
+    parts = text.split(":")
+    if parts == ["png"]:
+        return None
+    encoding = {"format": parts[0]}
+    if len(parts) > 1 and parts[1]:
+        encoding["size"] = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        encoding["quality"] = int(parts[2])
+    return encoding
+
+
+def list_all_frames(folder):
+    """Returns the frame images of every set under a sets folder, in order."""
+    return [path for set_folder in sorted(os.listdir(folder)) for path in list_frame_files(os.path.join(folder, set_folder))]
+
+
+def extract_frames(video_path, output_folder, frame_encoding, chunk_duration, frame_interval, single_pass):
+    """Extracts the video's sets with the given frame encoding. Returns the elapsed seconds."""
+    start = time.perf_counter()
+    process_video(video_path, output_folder, chunk_duration=chunk_duration, frame_interval=frame_interval,
+                  single_pass=single_pass, frame_encoding=frame_encoding)
+    return time.perf_counter() - start
+
+
+def model_input(path):
+    """Returns a frame as the captioner sees it: RGB, resized to 384x384 with bicubic resampling."""
+    image = Image.open(path).convert("RGB").resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BICUBIC)
+    return np.asarray(image, dtype=np.float32)
+
+
+def compare_model_inputs(reference_paths, paths):
+    """Returns (lowest PSNR in dB, mean absolute difference 0-255) between pairs of frames as model inputs."""
+    psnrs, differences = [], []
+    for reference_path, path in zip(reference_paths, paths):
+        difference = model_input(reference_path) - model_input(path)
+        mse = float(np.mean(difference ** 2))
+        psnrs.append(10 * math.log10(255 ** 2 / mse) if mse > 0 else float("inf"))
+        differences.append(float(np.mean(np.abs(difference))))
+    return min(psnrs), sum(differences) / len(differences)
+
+
+def sample_frames(paths, sample_size):
+    """Picks up to 'sample_size' frames spread evenly over the list."""
+    if len(paths) <= sample_size:
+        return paths
+    step = len(paths) / sample_size
+    return [paths[int(i * step)] for i in range(sample_size)]
+
+
+def caption_frames(paths):
+    """Captions frames with the real BLIP model from the model registry."""
+    from Model_registry.Registry import get_model
+    from Frame_Description.BLIP import get_descriptions_batch
+    model, processor, device = get_model("blip")
+    return get_descriptions_batch(paths, model, processor, device)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Frame storage benchmark: PNG against compact JPEG/WebP frames.")
+    parser.add_argument("video", nargs="?", help="Video to extract (default: a synthetic test video).")
+    parser.add_argument("--settings", default=DEFAULT_SETTINGS, help="Comma-separated 'format[:size[:quality]]' settings; the first is the reference.")
+    parser.add_argument("--duration", type=float, default=120, help="Length of the synthetic video in seconds.")
+    parser.add_argument("--size", default="1920x1080", help="Resolution of the synthetic video.")
+    parser.add_argument("--set-duration", type=float, default=15.0, help="Length of each set in seconds.")
+    parser.add_argument("--frame-interval", type=float, default=2.0, help="Seconds between extracted frames.")
+    parser.add_argument("--single-pass", action="store_true", help="Use the single-pass extractor instead of one FFmpeg run per set.")
+    parser.add_argument("--sample", type=int, default=16, help="Number of frames compared with the reference.")
+    parser.add_argument("--blip", action="store_true", help="Also compare real BLIP captions on the sample.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    settings = args.settings.split(",")
+    temp_dir = tempfile.mkdtemp(prefix="clipquery_bench_frames_")
+    try:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(temp_dir, "bench_frames.mp4")
+            print(f"Writing a {args.duration:g}s {args.size} test video...")
+            write_test_video(video_path, args.duration, args.size)
+
+        results = []
+        for setting in settings:
+            output_folder = os.path.join(temp_dir, setting.replace(":", "_"))
+            seconds = extract_frames(video_path, output_folder, parse_setting(setting), args.set_duration, args.frame_interval, args.single_pass)
+            paths = list_all_frames(output_folder)
+            results.append({"setting": setting, "paths": paths, "seconds": seconds, "frames": len(paths), "bytes": sum(os.path.getsize(path) for path in paths)})
+
+        reference = results[0]
+        reference_sample = sample_frames(reference["paths"], args.sample)
+        reference_captions = None
+        if args.blip and reference_sample:
+            try:
+                from Result_cache.Cache import set_result_cache
+                set_result_cache(None) # Caption every frame for real
+                reference_captions = caption_frames(reference_sample)
+            except Exception as e:
+                print(f"  [Warning] Could not caption with BLIP, only the model inputs are compared: {e}")
+
+        print("\n--- Frame Storage Benchmark ---")
+        print(f"Video: {args.video or f'synthetic {args.duration:g}s {args.size}'}   reference: {reference['setting']}")
+        for result in results:
+            line = (f"  {result['setting']:14s} {result['seconds']:7.2f}s  {result['frames']:4d} frames  "
+                    f"{result['bytes'] / 1e6:8.2f} MB  ({result['bytes'] / max(reference['bytes'], 1):6.1%} of reference, "
+                    f"{result['seconds'] / max(reference['seconds'], 1e-9):.2f}x time)")
+            if result is not reference:
+                if result["frames"] != reference["frames"]:
+                    line += "  [Warning] frame count differs from the reference"
+                else:
+                    sample = sample_frames(result["paths"], args.sample)
+                    lowest_psnr, difference = compare_model_inputs(reference_sample, sample)
+                    line += f"\n      model input vs reference: lowest PSNR {lowest_psnr:.1f} dB, mean abs difference {difference:.2f}/255"
+                    if reference_captions is not None:
+                        captions = caption_frames(sample)
+                        same = sum(1 for a, b in zip(reference_captions, captions) if a == b)
+                        line += f"\n      BLIP captions identical to reference: {same}/{len(sample)}"
+            print(line)
+        if reference_captions is None:
+            print("  (Pixel comparison only; run with --blip to compare real captions.)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
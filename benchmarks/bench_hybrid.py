@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from benchmarks.stubs import StubEmbedder
+from benchmarks.bench_search import percentile
+from Scene_store.Store import get_scene_store
+
+# Compares dense-only, BM25-only and hybrid (RRF) scene search on a synthetic corpus with
+# known answers. Two query sets are used:
+#   quote    - 6 consecutive words from one scene's transcript (an exact line of dialogue)
+#   summary  - 4 words from one scene's summary (a loose description)
+# Reports recall@1, recall@5, MRR and p50/p99 latency per mode. Run from the repo root:
+#   python -m benchmarks.bench_hybrid [--stub] [--scenes N] [--queries N]
+# --stub uses a bag-of-words embedder truncated to 64 words, which (like MiniLM's input
+# limit) cannot see late parts of long transcripts.
+
+
+def pseudo_words(count, rng):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "da", "fu", "gi", "he", "jo"]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def write_corpus(base_folder, video_filename, scene_count, seed=0):
+    """Writes scenes with Zipf-distributed vocabulary into the video's scene store. Returns {set_name: scene_data}."""
+    rng = random.Random(seed)
+    store = get_scene_store(os.path.join(base_folder, video_filename))
+    vocabulary = pseudo_words(3000, rng)
+    weights = [1 / (rank + 1) ** 0.7 for rank in range(len(vocabulary))]
+    scenes = {}
+    for i in range(scene_count):
+        set_name = f"set_{i + 1:03d}"
+        scene = {
+            "start_time": i * 15.0,
+            "end_time": (i + 1) * 15.0,
+            "previous_description": None,
+            "scene_summary": " ".join(rng.choices(vocabulary, weights, k=25)),
+            "transcript": " ".join(rng.choices(vocabulary, weights, k=150)),
+            "visuals": [{"timestamp": i * 15.0 + t, "description": " ".join(rng.choices(vocabulary, weights, k=8))} for t in (0, 2, 4)]
+        }
+        os.makedirs(os.path.join(base_folder, video_filename, set_name), exist_ok=True)
+        store.put_set(set_name, i + 1, scene["start_time"], scene["end_time"])
+        store.put_description(set_name, scene["transcript"], scene["visuals"])
+        store.put_summary(set_name, scene["previous_description"], scene["scene_summary"])
+        scenes[set_name] = scene
+    return scenes
+
+
+def make_queries(scenes, count, seed=1):
+    """Returns {"quote": [(query, set_name)], "summary": [...]}."""
+    rng = random.Random(seed)
+    names = sorted(scenes)
+    queries = {"quote": [], "summary": []}
+    for _ in range(count):
+        set_name = rng.choice(names)
+        words = scenes[set_name]["transcript"].split()
+        start = rng.randrange(len(words) - 6)
+        queries["quote"].append((" ".join(words[start:start + 6]), set_name))
+        queries["summary"].append((" ".join(rng.sample(scenes[set_name]["scene_summary"].split(), 4)), set_name))
+    return queries
+
+
+def evaluate(searcher, queries, mode):
+    """Runs every query uncached. Returns (recall@1, recall@5, mrr, latencies_ms)."""
+    hits_at_1 = hits_at_5 = reciprocal_ranks = 0.0
+    latencies = []
+    for query, set_name in queries:
+        searcher.results.clear()
+        start = time.perf_counter()
+        scenes, _ = searcher.search(query, 5, mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked = [scene["set_name"] for scene in scenes]
+        if set_name in ranked:
+            rank = ranked.index(set_name) + 1
+            hits_at_1 += rank == 1
+            hits_at_5 += 1
+            reciprocal_ranks += 1 / rank
+    n = len(queries)
+    return hits_at_1 / n, hits_at_5 / n, reciprocal_ranks / n, latencies
+
+
+if __name__ == "__main__":
+    import chromadb
+    from contextlib import redirect_stdout
+    from ChromaDB import populate_chroma_db
+    from Search.Lexical_index import BM25Index, scene_documents
+    from Search.Scene_search import SceneSearcher, SEARCH_MODES
+
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    scene_count = option("--scenes", 1000)
+    temp_dir = tempfile.TemporaryDirectory()
+    chroma_path = os.path.join(temp_dir.name, "chroma_db")
+    if "--stub" in args:
+        embedder = StubEmbedder(bag_of_words=True, max_tokens=64)
+    else:
+        from Model_registry.Registry import get_model
+        embedder = get_model("embedder")
+
+    scenes = write_corpus(temp_dir.name, "synthetic.mp4", scene_count)
+    collection = chromadb.PersistentClient(path=chroma_path).get_or_create_collection("bench_hybrid")
+    lexical_index = BM25Index(os.path.join(temp_dir.name, "lexical"))
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        indexed = populate_chroma_db(embedder, collection, temp_dir.name, "synthetic.mp4", "bench_hybrid")
+        start = time.perf_counter()
+        lexical_index.upsert(scene_documents(temp_dir.name, "synthetic.mp4", indexed))
+        lexical_seconds = time.perf_counter() - start
+
+    index_bytes = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(lexical_index.path) for f in files)
+    print("\n--- Hybrid Search Benchmark ---")
+    print(f"Scenes: {scene_count} ({'stub bag-of-words' if '--stub' in args else 'all-MiniLM-L6-v2'})")
+    print(f"BM25 index: built in {lexical_seconds:.2f}s, {index_bytes / 1e6:.2f} MB on disk")
+
+    searcher = SceneSearcher(lambda: embedder, lambda: collection, chroma_path, get_lexical_index=lambda: lexical_index)
+    searcher.warm_up()
+    for query_kind, queries in make_queries(scenes, option("--queries", 300)).items():
+        print(f"\n  {query_kind} queries ({len(queries)})")
+        for mode in SEARCH_MODES:
+            recall_1, recall_5, mrr, latencies = evaluate(searcher, queries, mode)
+            print(f"    {mode:8s} R@1 {recall_1:5.2f}  R@5 {recall_5:5.2f}  MRR {mrr:5.2f}  "
+                  f"p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms")
+
+    temp_dir.cleanup()
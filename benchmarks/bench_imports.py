@@ -0,0 +1,80 @@
+import os
+import sys
+import subprocess
+
+# Measures import time with `python -X importtime` and guards against the web tier
+# importing the ML stack. Exits with status 1 if a heavy module is imported where it
+# should not be, so it can run in CI. Run from the repo root:
+#   python -m benchmarks.bench_imports
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DJANGO_ROOT = os.path.join(REPO_ROOT, "Udhbhav-backend-main")
+
+# Modules that only the video worker may load
+HEAVY_MODULES = ("torch", "whisper", "transformers", "sentence_transformers", "chromadb")
+
+DJANGO_STARTUP = (
+    "import django; django.setup(); "
+    "import a_core.urls, videos.views, videos.jobs, a_home.views"
+)
+
+# (label, code, working directory, extra environment)
+TARGETS = [
+    ("django startup", DJANGO_STARTUP, DJANGO_ROOT, {"DJANGO_SETTINGS_MODULE": "a_core.settings"}),
+    ("Django_integrate", "import Django_integrate", REPO_ROOT, {}),
+    ("DB_integrate", "import DB_integrate", REPO_ROOT, {}),
+    ("Model_registry", "import Model_registry.Registry", REPO_ROOT, {}),
+]
+
+
+def import_times(code, cwd, env=None):
+    """
+    Runs 'code' in a fresh interpreter with -X importtime.
+
+    :return: {module: (self_us, cumulative_us)}, or None if the code failed.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env={**os.environ, "PYTHONPATH": REPO_ROOT, **(env or {})},
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+        return None
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # Lines look like: "import time:       215 |        215 |   _io"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def heavy_imports(times):
+    """Returns the heavy top-level packages found among the imported modules."""
+    return sorted({name.split(".")[0] for name in times if name.split(".")[0] in HEAVY_MODULES})
+
+
+if __name__ == "__main__":
+    failed = False
+    print("--- Import Time Benchmark ---")
+    for label, code, cwd, env in TARGETS:
+        times = import_times(code, cwd, env)
+        if times is None:
+            print(f"  {label:18s} could not be imported")
+            failed = True
+            continue
+        total = sum(self_us for self_us, _ in times.values())
+        heavy = heavy_imports(times)
+        print(f"  {label:18s} {total / 1e6:6.2f}s  {len(times)} modules")
+
+        slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:5]
+        for module, (self_us, _) in slowest:
+            print(f"      {self_us / 1e3:8.1f} ms  {module}")
+        if heavy:
+            print(f"  [Regression] {label} imports {', '.join(heavy)}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from benchmarks.bench_segmentation import write_synthetic_video
+
+# End-to-end benchmark of the whole pipeline (segmentation, extraction, transcription,
+# captioning, summarization, embedding) on synthetic videos, with stub models, so it runs
+# without a GPU, model downloads or network access.
+#
+# Videos are made with FFmpeg: shots of testsrc, SMPTE bars, flat color and a fractal, cut
+# every '--shot-seconds', over a soundtrack that either passes the speech gate (a tone with a
+# syllable-rate tremolo) or does not (a steady tone, '--tone'). Each case (duration x
+# resolution x mode) runs in its own process, so peak memory is per case.
+#
+# Model stubs cost nothing by default, so the numbers measure the pipeline itself (FFmpeg,
+# I/O, vector index); '--caption-ms', '--llm-ms', '--window-ms' and '--embed-ms' add model time.
+# Results (throughput = seconds of video per wall second, memory, per-stage times from
+# pipeline_metrics.json) are saved as JSON. With '--baseline', they are compared with an
+# earlier results file and the exit status is 1 if any case regressed by more than '--tolerance'.
+# Run from the repo root:
+#   python -m benchmarks.bench_pipeline [--durations 60,300] [--sizes 320x180,1280x720]
+#       [--modes streaming,barrier] [--output results.json] [--baseline old.json]
+
+SHOT_SOURCES = ("testsrc2", "smptebars", "color=c=0x336699", "mandelbrot", "testsrc")
+SPEECH_AUDIO = "sine=frequency=180,tremolo=f=4:d=0.95"
+TONE_AUDIO = "sine=frequency=440"
+
+
+def test_video_shots(duration, shot_seconds):
+    """Returns (lavfi source, seconds) shots cycling through SHOT_SOURCES for 'duration' seconds."""
+    shots, elapsed = [], 0
+    while elapsed < duration:
+        seconds = min(shot_seconds, duration - elapsed)
+        shots.append((SHOT_SOURCES[len(shots) % len(SHOT_SOURCES)], seconds))
+        elapsed += seconds
+    return shots
+
+
+def write_test_video(path, duration, size="640x360", rate=25, shot_seconds=12, speech=True):
+    """Writes a synthetic test video (see the notes at the top). Returns the cut times."""
+    return write_synthetic_video(path, test_video_shots(duration, shot_seconds), size, rate, SPEECH_AUDIO if speech else TONE_AUDIO)
+
+
+def register_stubs(caption_ms=0.0, llm_ms=0.0, window_ms=0.0, embed_ms=0.0):
+    """Replaces every model in the registry with a stub of the given latency."""
+    from Model_registry.Registry import registry
+    from benchmarks.stubs import StubLLM, StubEmbedder, StubWhisper, stub_blip
+    registry.register("blip", lambda: stub_blip(item_latency=caption_ms / 1000))
+    registry.register("whisper", lambda: StubWhisper(window_ms / 1000))
+    registry.register("llm", lambda: StubLLM(latency=llm_ms / 1000))
+    registry.register("embedder", lambda: StubEmbedder(item_latency=embed_ms / 1000))
+
+
+def run_case(case):
+    """Runs one case in this process. Returns its result dictionary."""
+    from Result_cache.Cache import set_result_cache
+    from Pipeline_metrics.Metrics import load_metrics
+    from benchmarks.bench_streaming import run_mode
+
+    set_result_cache(None) # Every run must really do the work
+    register_stubs(case["caption_ms"], case["llm_ms"], case["window_ms"], case["embed_ms"])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, f"bench_{case['name']}.mp4")
+        start = time.perf_counter()
+        write_test_video(video_path, case["duration"], case["size"], shot_seconds=case["shot_seconds"], speech=case["speech"])
+        generate_seconds = time.perf_counter() - start
+
+        work_dir = os.path.join(temp_dir, "work")
+        first_scene_seconds, wall_seconds = run_mode(case["mode"], video_path, work_dir)
+        metrics = load_metrics(os.path.join(work_dir, "video_processing", "Sets", os.path.basename(video_path))) or {}
+
+    return {
+        **case,
+        "generate_seconds": round(generate_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput": round(case["duration"] / wall_seconds, 3),
+        "first_scene_seconds": round(first_scene_seconds, 3) if first_scene_seconds is not None else None,
+        "cpu_seconds": metrics.get("cpu_seconds"),
+        "child_cpu_seconds": metrics.get("child_cpu_seconds"),
+        "peak_rss_bytes": metrics.get("peak_rss_bytes"),
+        "sets": len(metrics.get("sets", {})),
+        "stages": {
+            name: {key: record[key] for key in ("wall_seconds", "cpu_seconds", "peak_rss_bytes", "counts")}
+            for name, record in metrics.get("stages", {}).items()
+        }
+    }
+
+
+def run_case_subprocess(case):
+    """Runs one case in a fresh interpreter (clean memory and model registry). Returns its result, or None."""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pipeline", "--case", json.dumps(case)],
+        capture_output=True, text=True
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    print(f"  [Error] Case {case['name']} failed:\n{result.stderr.strip()[-2000:]}")
+    return None
+
+
+def environment():
+    """Describes the machine, so results from different machines are not compared by mistake."""
+    ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with a baseline results file, case by case.
+
+    :return: List of regression messages (throughput down or peak memory up by more than 'tolerance').
+    """
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    print(f"\n--- Compared with baseline ({baseline.get('created_at', 'unknown date')}) ---")
+    if baseline.get("environment", {}).get("platform") != environment()["platform"]:
+        print("  [Warning] The baseline was recorded on a different platform.")
+    for case in results:
+        old = baseline_cases.get(case["name"])
+        if old is None:
+            print(f"  {case['name']:28s} (not in baseline)")
+            continue
+        speed = case["throughput"] / old["throughput"] if old["throughput"] else float("inf")
+        memory = case["peak_rss_bytes"] / old["peak_rss_bytes"] if old.get("peak_rss_bytes") and case.get("peak_rss_bytes") else 1.0
+        flags = []
+        if speed < 1 - tolerance:
+            flags.append("SLOWER")
+            regressions.append(f"{case['name']}: throughput {speed:.2f}x of baseline")
+        if memory > 1 + tolerance:
+            flags.append("MORE MEMORY")
+            regressions.append(f"{case['name']}: peak memory {memory:.2f}x of baseline")
+        print(f"  {case['name']:28s} throughput {speed:5.2f}x  peak memory {memory:5.2f}x  {' '.join(flags)}")
+    return regressions
+
+
+def print_results(results):
+    print("\n--- Pipeline Benchmark ---")
+    for case in results:
+        peak = f"{case['peak_rss_bytes'] / 2**20:6.0f} MB" if case.get("peak_rss_bytes") else "     n/a"
+        first = f"{case['first_scene_seconds']:7.2f}s" if case.get("first_scene_seconds") is not None else "     n/a"
+        print(f"  {case['name']:28s} {case['sets']:3d} sets  wall {case['wall_seconds']:7.2f}s  "
+              f"{case['throughput']:6.1f}x real time  first scene {first}  peak {peak}")
+        stages = "  ".join(f"{name} {record['wall_seconds']:.2f}s" for name, record in case["stages"].items())
+        print(f"      {stages}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic videos with stub models.")
+    parser.add_argument("--durations", default="60,180", help="Comma-separated video durations in seconds.")
+    parser.add_argument("--sizes", default="320x180,1280x720", help="Comma-separated video resolutions.")
+    parser.add_argument("--modes", default="streaming,barrier", help="Comma-separated pipeline modes.")
+    parser.add_argument("--shot-seconds", type=float, default=12, help="Length of each synthetic shot.")
+    parser.add_argument("--tone", action="store_true", help="Use a steady tone (no speech) as the soundtrack.")
+    parser.add_argument("--caption-ms", type=float, default=0.0, help="Stub caption time per frame.")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="Stub LLM time per call.")
+    parser.add_argument("--window-ms", type=float, default=0.0, help="Stub Whisper time per 30 s window.")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="Stub embedder time per text.")
+    parser.add_argument("--output", default="bench_pipeline_results.json", help="Where to save the results.")
+    parser.add_argument("--baseline", help="Earlier results file to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression against the baseline.")
+    parser.add_argument("--case", help=argparse.SUPPRESS) # Internal: run one case and print its result
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.case:
+        print("RESULT " + json.dumps(run_case(json.loads(args.case))))
+        sys.exit(0)
+
+    cases = []
+    for duration in [float(value) for value in args.durations.split(",")]:
+        for size in args.sizes.split(","):
+            for mode in args.modes.split(","):
+                cases.append({
+                    "name": f"{duration:g}s-{size}-{mode}",
+                    "duration": duration,
+                    "size": size,
+                    "mode": mode,
+                    "shot_seconds": args.shot_seconds,
+                    "speech": not args.tone,
+                    "caption_ms": args.caption_ms,
+                    "llm_ms": args.llm_ms,
+                    "window_ms": args.window_ms,
+                    "embed_ms": args.embed_ms
+                })
+
+    results = []
+    for case in cases:
+        print(f"Running {case['name']}...")
+        result = run_case_subprocess(case)
+        if result is not None:
+            results.append(result)
+    print_results(results)
+
+    report = {"created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": environment(), "cases": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    failed = len(results) < len(cases)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"  [Regression] {message}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import random
+import tempfile
+from benchmarks.stubs import StubEmbedder
+from benchmarks.bench_search import percentile
+from benchmarks.bench_hybrid import write_corpus
+from Scene_store.Store import get_scene_store
+
+# Measures how close the returned seek time lands to the moment a query describes, with
+# and without the second-stage moment index. Each synthetic scene gets 10 timed phrases
+# (stored as speech phrases in the scene store); a query is 5 words of one phrase, and its target is that
+# phrase's start. Reports set recall@1, seek error and the share of hits within 2s of the
+# target, plus p50/p99 latency. Run from the repo root:
+#   python -m benchmarks.bench_refine [--stub] [--scenes N] [--queries N]
+
+
+def write_segments(base_folder, video_filename, scenes, phrases_per_scene=10):
+    """Splits each scene's transcript into timed phrases. Returns [(set_name, segment)]."""
+    all_segments = []
+    store = get_scene_store(os.path.join(base_folder, video_filename))
+    for set_name, scene in scenes.items():
+        words = scene["transcript"].split()
+        per_phrase = len(words) // phrases_per_scene
+        step = (scene["end_time"] - scene["start_time"]) / phrases_per_scene
+        segments = [{
+            "start": scene["start_time"] + i * step,
+            "end": scene["start_time"] + (i + 1) * step,
+            "text": " ".join(words[i * per_phrase:(i + 1) * per_phrase])
+        } for i in range(phrases_per_scene)]
+        store.put_segments(set_name, segments)
+        all_segments.extend((set_name, segment) for segment in segments)
+    return all_segments
+
+
+def evaluate(searcher, queries, refine, tolerance=2.0):
+    """Returns (recall@1, mean seek error of top-1 hits, share of hits within 'tolerance', latencies_ms)."""
+    hits = close = 0
+    errors, latencies = [], []
+    for query, set_name, target in queries:
+        searcher.results.clear()
+        start = time.perf_counter()
+        scenes, _ = searcher.search(query, 5, mode="hybrid", refine=refine)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if scenes and scenes[0]["set_name"] == set_name:
+            hits += 1
+            error = abs(scenes[0].get("seek_time", scenes[0]["start_time"]) - target)
+            errors.append(error)
+            close += error <= tolerance
+    return hits / len(queries), sum(errors) / max(len(errors), 1), close / len(queries), latencies
+
+
+if __name__ == "__main__":
+    import chromadb
+    from contextlib import redirect_stdout
+    from ChromaDB import populate_chroma_db, populate_moments
+    from Search.Lexical_index import BM25Index, scene_documents
+    from Search.Scene_search import SceneSearcher
+
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    scene_count = option("--scenes", 500)
+    temp_dir = tempfile.TemporaryDirectory()
+    chroma_path = os.path.join(temp_dir.name, "chroma_db")
+    if "--stub" in args:
+        embedder = StubEmbedder(bag_of_words=True, max_tokens=64)
+    else:
+        from Model_registry.Registry import get_model
+        embedder = get_model("embedder")
+
+    scenes = write_corpus(temp_dir.name, "synthetic.mp4", scene_count)
+    segments = write_segments(temp_dir.name, "synthetic.mp4", scenes)
+    client = chromadb.PersistentClient(path=chroma_path)
+    collection = client.get_or_create_collection("bench_refine")
+    moments_collection = client.get_or_create_collection("bench_refine_moments")
+    lexical_index = BM25Index(os.path.join(temp_dir.name, "lexical"))
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        indexed = populate_chroma_db(embedder, collection, temp_dir.name, "synthetic.mp4", "bench_refine")
+        lexical_index.upsert(scene_documents(temp_dir.name, "synthetic.mp4", indexed))
+        start = time.perf_counter()
+        moment_count = populate_moments(embedder, moments_collection, temp_dir.name, "synthetic.mp4", indexed)
+        moment_seconds = time.perf_counter() - start
+
+    rng = random.Random(1)
+    queries = []
+    for set_name, segment in rng.sample(segments, option("--queries", 300)):
+        words = segment["text"].split()
+        start_word = rng.randrange(max(len(words) - 5, 1))
+        queries.append((" ".join(words[start_word:start_word + 5]), set_name, segment["start"]))
+
+    print("\n--- Timestamp Refinement Benchmark ---")
+    print(f"Scenes: {scene_count}, moments: {moment_count} (indexed in {moment_seconds:.2f}s, "
+          f"{'stub bag-of-words' if '--stub' in args else 'all-MiniLM-L6-v2'})")
+    searcher = SceneSearcher(lambda: embedder, lambda: collection, chroma_path,
+                             get_lexical_index=lambda: lexical_index, get_moments_collection=lambda: moments_collection)
+    searcher.warm_up()
+    for label, refine in (("scene start", False), ("refined", True)):
+        recall_1, mean_error, within, latencies = evaluate(searcher, queries, refine)
+        print(f"  {label:12s} R@1 {recall_1:5.2f}  seek error {mean_error:5.2f}s  within 2s {within:5.2f}  "
+              f"p50 {percentile(latencies, 0.5):7.2f} ms  p99 {percentile(latencies, 0.99):7.2f} ms")
+
+    temp_dir.cleanup()
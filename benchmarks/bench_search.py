@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import statistics
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.stubs import StubEmbedder
+
+# Load test for scene search. Reports p50/p99 query latency.
+#   In process (synthetic index, cache on vs off):
+#     python -m benchmarks.bench_search [--stub] [--scenes N] [--queries N] [--threads N]
+#   Against a running server:
+#     python -m benchmarks.bench_search --url http://127.0.0.1:8000/videos/search/ [--queries N] [--threads N]
+
+QUERY_WORDS = ["person", "walks", "room", "car", "explosion", "talks", "phone", "night", "gun", "desert",
+               "kitchen", "laughs", "money", "door", "window", "rain", "street", "police", "meeting", "runs"]
+
+
+def make_queries(count, distinct=200, seed=0):
+    """Builds 'count' queries drawn from 'distinct' phrases, with popular phrases repeated (Zipf-like)."""
+    rng = random.Random(seed)
+    phrases = [" ".join(rng.sample(QUERY_WORDS, 3)) for _ in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(phrases, weights=weights, k=count)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_load(search, queries, threads):
+    """Runs search(query) for every query on 'threads' threads. Returns (latencies_ms, wall_seconds)."""
+    def timed(query):
+        start = time.perf_counter()
+        search(query)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(timed, queries))
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, wall_seconds):
+    print(f"  {label:12s} p50 {percentile(latencies, 0.5):8.2f} ms  p99 {percentile(latencies, 0.99):8.2f} ms  "
+          f"mean {statistics.mean(latencies):8.2f} ms  {len(latencies) / wall_seconds:8.1f} q/s")
+
+
+def http_search(url):
+    def search(query):
+        with urllib.request.urlopen(f"{url}?{urllib.parse.urlencode({'q': query})}") as response:
+            return json.load(response)
+    return search
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def option(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    query_count = option("--queries", 2000)
+    threads = option("--threads", 8)
+    queries = make_queries(query_count)
+
+    print("\n--- Search Load Test ---")
+    print(f"Queries: {query_count} ({len(set(queries))} distinct), threads: {threads}")
+
+    if "--url" in args:
+        latencies, wall = run_load(http_search(option("--url", "")), queries, threads)
+        report("http", latencies, wall)
+        sys.exit(0)
+
+    import chromadb
+    from contextlib import redirect_stdout
+    from ChromaDB import populate_chroma_db
+    from Search.Scene_search import SceneSearcher, bump_index_version
+    from benchmarks.bench_embedding import write_synthetic_scenes
+
+    temp_dir = tempfile.TemporaryDirectory()
+    chroma_path = os.path.join(temp_dir.name, "chroma_db")
+    if "--stub" in args:
+        # Roughly the cost of encoding one short query with MiniLM on a CPU
+        embedder = StubEmbedder(call_latency=0.005)
+    else:
+        from Model_registry.Registry import get_model
+        embedder = get_model("embedder")
+
+    collection = chromadb.PersistentClient(path=chroma_path).get_or_create_collection("bench_search")
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        write_synthetic_scenes(temp_dir.name, "synthetic.mp4", option("--scenes", 2000))
+        populate_chroma_db(embedder, collection, temp_dir.name, "synthetic.mp4", "bench_search")
+    bump_index_version(chroma_path)
+
+    for label, cache_size in (("no cache", 0), ("lru cache", 1024)):
+        searcher = SceneSearcher(lambda: embedder, lambda: collection, chroma_path, cache_size, cache_size)
+        searcher.warm_up()
+        latencies, wall = run_load(lambda query: searcher.search(query, 5), queries, threads)
+        report(label, latencies, wall)
+        if cache_size:
+            stats = searcher.stats()["results"]
+            print(f"  result cache: {stats['hits']} hits, {stats['misses']} misses")
+
+    temp_dir.cleanup()
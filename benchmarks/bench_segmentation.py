@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from video_processing.Full_extraction import get_video_duration
+from video_processing.Scene_detection import segment_video, print_segmentation_report
+
+# Reports how many caption (BLIP) and summary (LLM) calls adaptive segmentation saves over
+# fixed 15 s sets with a frame every 2 s. Without a video argument, a synthetic one is made
+# with FFmpeg: a long static shot (talking head), a moving test pattern, quick cuts and a
+# zooming fractal, with known cut times so detection accuracy can be checked too.
+# Run from the repo root:
+#   python -m benchmarks.bench_segmentation [video_path]
+
+# (lavfi source, seconds) for each shot of the synthetic video
+SYNTHETIC_SHOTS = [
+    ("color=c=0x336699", 60),
+    ("testsrc2", 20),
+    ("color=c=red", 3),
+    ("smptebars", 2),
+    ("color=c=green", 4),
+    ("mandelbrot", 15),
+    ("color=c=0x996633", 45),
+    ("testsrc", 10)
+]
+
+
+def write_synthetic_video(path, shots=SYNTHETIC_SHOTS, size="320x180", rate=25, audio="sine=frequency=440"):
+    """
+    Concatenates the given lavfi shots into one video. Returns the cut times.
+
+    :param audio: lavfi audio source (or filter chain) for the soundtrack, cut to the video's length.
+    """
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    for source, seconds in shots:
+        separator = ":" if "=" in source else "="
+        command += ["-f", "lavfi", "-i", f"{source}{separator}s={size}:r={rate}"]
+    total = sum(seconds for _, seconds in shots)
+    command += ["-f", "lavfi", "-i", audio]
+    trims = "".join(f"[{i}]trim=duration={seconds},setpts=PTS-STARTPTS[v{i}];" for i, (_, seconds) in enumerate(shots))
+    concat = "".join(f"[v{i}]" for i in range(len(shots))) + f"concat=n={len(shots)}:v=1:a=0[v]"
+    command += ["-filter_complex", trims + concat, "-map", "[v]", "-map", f"{len(shots)}:a", "-t", str(total), "-pix_fmt", "yuv420p", path]
+    subprocess.run(command, check=True)
+
+    cuts, elapsed = [], 0.0
+    for _, seconds in shots[:-1]:
+        elapsed += seconds
+        cuts.append(elapsed)
+    return cuts
+
+
+def cut_accuracy(detected, expected, tolerance=0.5):
+    """Returns (precision, recall) of detected cut times against the expected ones."""
+    matched = sum(any(abs(cut - truth) <= tolerance for cut in detected) for truth in expected)
+    correct = sum(any(abs(cut - truth) <= tolerance for truth in expected) for cut in detected)
+    return correct / max(len(detected), 1), matched / max(len(expected), 1)
+
+
+if __name__ == "__main__":
+    temp_dir = tempfile.TemporaryDirectory()
+    expected_cuts = None
+    if len(sys.argv) > 1:
+        video_path = sys.argv[1]
+    else:
+        video_path = os.path.join(temp_dir.name, "synthetic.mp4")
+        expected_cuts = write_synthetic_video(video_path)
+
+    total_duration = get_video_duration(video_path)
+    plan = segment_video(video_path, total_duration)
+    if plan is None:
+        sys.exit(1)
+
+    print("\n--- Segmentation Benchmark ---")
+    print(f"Video: {video_path if len(sys.argv) > 1 else 'synthetic'} ({total_duration:.1f}s)")
+    print_segmentation_report(plan["report"])
+    print(f"  Analysis speed: {total_duration / max(plan['report']['analysis_seconds'], 1e-9):.0f}x real time")
+    if expected_cuts is not None:
+        precision, recall = cut_accuracy(plan["cuts"], expected_cuts)
+        print(f"  Cut detection: precision {precision:.2f}, recall {recall:.2f} ({len(plan['cuts'])} found, {len(expected_cuts)} expected)")
+    for i, set_plan in enumerate(plan["sets"], start=1):
+        print(f"    set_{i:03d} {set_plan['start_time']:8.2f} - {set_plan['end_time']:8.2f}  {len(set_plan['frame_times']):3d} frames")
+    if "--json" in sys.argv:
+        print(json.dumps(plan["report"], indent=2))
+
+    temp_dir.cleanup()
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import tempfile
+from contextlib import redirect_stdout
+import Pipe1
+import DB_integrate
+from Result_cache.Cache import set_result_cache
+from Model_registry.Registry import registry
+from benchmarks.stubs import StubLLM, StubEmbedder, StubWhisper, stub_blip
+from benchmarks.bench_segmentation import write_synthetic_video, SYNTHETIC_SHOTS
+
+# Compares the barrier pipeline (every stage finishes for all sets before the next starts)
+# with the streaming one (Pipe_streaming.py) on the time until the first scene is searchable
+# and the total time. Models are stubs with fixed latencies, so the numbers show how the
+# stages overlap rather than how fast the real models are:
+#   captions '--caption-ms' per frame (default 100), LLM calls '--llm-ms' (default 1000),
+#   Whisper '--window-ms' per 30 s window (default 1500).
+# The synthetic video (see bench_segmentation.py) is repeated '--repeat' times (default 2).
+# Its audio is a steady tone, so the speech gate skips most of Whisper.
+# Run from the repo root:
+#   python -m benchmarks.bench_streaming [--repeat N] [--caption-ms N] [--llm-ms N] [--window-ms N] [--verbose]
+
+
+def option(args, name, default):
+    return float(args[args.index(name) + 1]) if name in args else default
+
+
+def run_mode(mode, video_path, work_dir, verbose=False):
+    """Runs the whole pipeline in 'work_dir'. Returns (seconds to the first indexed scene, total seconds)."""
+    video_folder = os.path.join(work_dir, "video_processing", "Video")
+    os.makedirs(video_folder, exist_ok=True)
+    os.symlink(video_path, os.path.join(video_folder, os.path.basename(video_path)))
+
+    first_indexed = []
+    get_db_integrated = DB_integrate.get_db_integrated
+    def timed_get_db_integrated(*args, **kwargs):
+        indexed = get_db_integrated(*args, **kwargs)
+        if indexed and not first_indexed:
+            first_indexed.append(time.perf_counter())
+        return indexed
+    # Pipe1 imported the function by name; the streaming pipeline looks it up on DB_integrate
+    Pipe1.get_db_integrated = DB_integrate.get_db_integrated = timed_get_db_integrated
+
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if verbose else devnull):
+            Pipe1.run_full_video_pipeline(os.path.basename(video_path), pipeline_mode=mode)
+    finally:
+        total = time.perf_counter() - start
+        os.chdir(cwd)
+        Pipe1.get_db_integrated = DB_integrate.get_db_integrated = get_db_integrated
+    return (first_indexed[0] - start if first_indexed else None), total
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = int(option(args, "--repeat", 2))
+    caption_seconds = option(args, "--caption-ms", 100) / 1000
+    llm_seconds = option(args, "--llm-ms", 1000) / 1000
+    window_seconds = option(args, "--window-ms", 1500) / 1000
+
+    set_result_cache(None) # Every run must really do the work
+    registry.register("blip", lambda: stub_blip(item_latency=caption_seconds))
+    registry.register("whisper", lambda: StubWhisper(window_seconds))
+    registry.register("llm", lambda: StubLLM(latency=llm_seconds))
+    registry.register("embedder", lambda: StubEmbedder())
+
+    temp_dir = tempfile.TemporaryDirectory()
+    video_path = os.path.join(temp_dir.name, "synthetic.mp4")
+    write_synthetic_video(video_path, SYNTHETIC_SHOTS * repeat)
+    duration = sum(seconds for _, seconds in SYNTHETIC_SHOTS) * repeat
+
+    print("\n--- Streaming Pipeline Benchmark ---")
+    print(f"Video: synthetic, {duration}s; captions {caption_seconds * 1000:.0f} ms/frame, LLM {llm_seconds * 1000:.0f} ms/call")
+    results = {}
+    for mode in ("barrier", "streaming"):
+        results[mode] = run_mode(mode, video_path, os.path.join(temp_dir.name, mode), "--verbose" in args)
+        first, total = results[mode]
+        first_text = f"{first:7.2f}s" if first is not None else "    n/a"
+        print(f"  {mode:9s}  first searchable scene {first_text}   total {total:7.2f}s")
+
+    (barrier_first, barrier_total), (streaming_first, streaming_total) = results["barrier"], results["streaming"]
+    if barrier_first and streaming_first:
+        print(f"  First scene {barrier_first / streaming_first:.1f}x sooner; total {barrier_total / streaming_total:.2f}x")
+
+    temp_dir.cleanup()
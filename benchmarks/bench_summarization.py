@@ -0,0 +1,32 @@
+import sys
+import time
+from Pipe_summarization import run_summarization_pipeline
+from benchmarks.stubs import StubLLM
+
+# Compares chained (sequential) summarization with concurrent raw-context summarization,
+# using a stub LLM with a fixed round-trip latency. Needs set descriptions from Pipe 2.
+# Run from the repo root:
+#   python -m benchmarks.bench_summarization "Vid1.mp4" [latency_seconds] [concurrency]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.bench_summarization <video_filename> [latency_seconds] [concurrency]")
+        sys.exit(1)
+    video_filename = sys.argv[1]
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    start = time.perf_counter()
+    run_summarization_pipeline(video_filename, model_object=StubLLM(latency))
+    chained_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_summarization_pipeline(video_filename, model_object=StubLLM(latency), context_mode="raw", concurrency=concurrency)
+    concurrent_seconds = time.perf_counter() - start
+
+    print("\n--- Summarization Benchmark ---")
+    print(f"Stub LLM latency: {latency}s per call")
+    print(f"  chained           {chained_seconds:8.2f}s")
+    print(f"  raw, {concurrency:>2} at a time {concurrent_seconds:8.2f}s")
+    if concurrent_seconds > 0:
+        print(f"  Speedup: {chained_seconds / concurrent_seconds:.2f}x")
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import wave
+import tempfile
+import numpy as np
+from contextlib import redirect_stdout
+from Result_cache.Cache import set_result_cache
+from Audio_transcription.Voice_activity import SpeechGate, frame_energies, speech_regions, FRAME_SECONDS
+from benchmarks.stubs import StubWhisper
+
+# Compares transcribing whole tracks with transcribing only their detected speech spans.
+# Pass real recordings (audio or video files) to measure on real content; by default Whisper
+# 'small' is loaded. --stub uses a model that takes '--window-ms' (default 1500 ms, about
+# Whisper small on a CPU) per 30 s window, so the saving can be estimated without weights.
+# Without files, a synthetic track is used: silence, speech-like syllables, a steady chord.
+# Run from the repo root:
+#   python -m benchmarks.bench_vad [files...] [--stub] [--window-ms N]
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds, rng):
+    """A voiced signal (120 Hz harmonics) chopped into syllables with pauses."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(120 + 20 * np.sin(np.pi * t)) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 15))
+    envelope = np.zeros_like(t)
+    position = 0.0
+    while position < seconds:
+        syllable = rng.uniform(0.12, 0.3)
+        first, last = int(position * SAMPLE_RATE), int(min(position + syllable, seconds) * SAMPLE_RATE)
+        envelope[first:last] = np.hanning(last - first)
+        position += syllable + (rng.uniform(0.03, 0.1) if rng.random() > 0.15 else rng.uniform(0.3, 0.7))
+    return 0.3 * voiced * envelope
+
+
+def write_synthetic_track(path, seed=0):
+    """Writes 2 minutes of silence, speech-like audio and a steady chord. Returns the speech seconds."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(30 * SAMPLE_RATE) / SAMPLE_RATE
+    silence = 0.0005 * rng.standard_normal(30 * SAMPLE_RATE)
+    chord = 0.1 * sum(np.sin(2 * np.pi * f * t) for f in (220, 277, 330, 440))
+    parts = [silence, speech_like(25, rng), chord, speech_like(20, rng), silence[:15 * SAMPLE_RATE]]
+    samples = np.concatenate(parts)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return 45.0
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    from Audio_transcription.Whisper import get_transcript_segments
+    args = sys.argv[1:]
+    window_seconds = float(args[args.index("--window-ms") + 1]) / 1000 if "--window-ms" in args else 1.5
+    paths = [arg for i, arg in enumerate(args) if not arg.startswith("--") and (i == 0 or args[i - 1] != "--window-ms")]
+    set_result_cache(None) # Every run must really transcribe
+
+    temp_dir = tempfile.TemporaryDirectory()
+    if not paths:
+        paths = [os.path.join(temp_dir.name, "synthetic.wav")]
+        print(f"Synthetic track: {write_synthetic_track(paths[0]):.0f}s of speech in 120s")
+    if "--stub" in args:
+        model = StubWhisper(window_seconds)
+    else:
+        from Audio_transcription.Whisper import load_model_whisper
+        model = load_model_whisper()
+
+    print("\n--- Speech Gate Benchmark ---")
+    total_plain = total_gated = 0.0
+    for path in paths:
+        energies = frame_energies(path)
+        regions = speech_regions(energies)
+        duration = len(energies) * FRAME_SECONDS
+        speech = sum(end - start for start, end in regions)
+
+        plain_seconds, plain_pieces = time_call(get_transcript_segments, path, model)
+        gate = SpeechGate()
+        with redirect_stdout(open(os.devnull, "w")):
+            gated_seconds, gated_pieces = time_call(gate.transcribe_track, path, get_transcript_segments, model, temp_dir.name)
+        total_plain += plain_seconds
+        total_gated += gated_seconds
+
+        print(f"  {os.path.basename(path)}: {duration:.1f}s, {speech:.1f}s speech in {len(regions)} regions "
+              f"(detection {gate.vad_seconds:.2f}s)")
+        print(f"    whole track  {plain_seconds:7.2f}s  {sum(len(p['text'].split()) for p in plain_pieces)} words")
+        print(f"    speech only  {gated_seconds:7.2f}s  {sum(len(p['text'].split()) for p in gated_pieces)} words")
+    if total_gated > 0:
+        print(f"  Total: {total_plain:.2f}s -> {total_gated:.2f}s ({total_plain / total_gated:.2f}x)")
+
+    temp_dir.cleanup()
@@ -0,0 +1,49 @@
+import os
+import sys
+import glob
+import time
+from Audio_transcription.Whisper import load_model_whisper, get_transcript, get_transcript_segments
+from video_processing.Description_JSON_Generator import read_set_times, split_transcript_by_sets
+
+# Compares per-set Whisper transcription with transcribing the full track once.
+# Needs sets extracted by process_video. Run from the repo root:
+#   python -m benchmarks.bench_whisper "video_processing/Video/Vid1.mp4" "video_processing/Sets/Vid1.mp4"
+
+def time_per_set(set_folders, model):
+    """Transcribes every set's audio.mp3 separately. Returns (seconds, transcripts)."""
+    start = time.perf_counter()
+    transcripts = [get_transcript(os.path.join(folder, "audio.mp3"), model) for folder in set_folders]
+    return time.perf_counter() - start, transcripts
+
+def time_full_track(video_path, set_folders, model):
+    """Transcribes the whole video once and slices it by set. Returns (seconds, transcripts)."""
+    set_times = [read_set_times(folder) for folder in set_folders]
+    start = time.perf_counter()
+    pieces = get_transcript_segments(video_path, model)
+    transcripts = split_transcript_by_sets(pieces, set_times)
+    return time.perf_counter() - start, transcripts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m benchmarks.bench_whisper <video_path> <sets_folder>")
+        sys.exit(1)
+    video_path, sets_folder = sys.argv[1], sys.argv[2]
+    set_folders = [
+        folder for folder in sorted(glob.glob(os.path.join(sets_folder, "set_*")))
+        if os.path.exists(os.path.join(folder, "audio.mp3"))
+    ]
+    if not set_folders:
+        print(f"[Error] No sets with audio.mp3 found in {sets_folder}")
+        sys.exit(1)
+
+    model = load_model_whisper()
+    per_set_seconds, per_set_texts = time_per_set(set_folders, model)
+    full_seconds, full_texts = time_full_track(video_path, set_folders, model)
+
+    print("\n--- Whisper Benchmark ---")
+    print(f"Sets: {len(set_folders)}")
+    print(f"  per-set     {per_set_seconds:8.2f}s  {sum(len(t.split()) for t in per_set_texts)} words")
+    print(f"  full track  {full_seconds:8.2f}s  {sum(len(t.split()) for t in full_texts)} words")
+    if full_seconds > 0:
+        print(f"  Speedup: {per_set_seconds / full_seconds:.2f}x")
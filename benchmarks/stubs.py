@@ -0,0 +1,163 @@
+import time
+import asyncio
+
+# Local stand-ins for the pipeline's models, so the pipes can run without
+# a GPU, model downloads or network access.
+
+class StubMessage:
+    """Mimics the message object returned by ChatGoogleGenerativeAI.invoke."""
+    def __init__(self, content):
+        self.content = content
+
+
+class StubLLM:
+    """
+    Stands in for ChatGoogleGenerativeAI (invoke and ainvoke).
+
+    :param latency: Seconds each call takes, to simulate API round trips.
+    :param fail_every: If > 0, every Nth call raises a 429-style error (to exercise retries).
+    """
+    def __init__(self, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+
+    def reply(self, prompt):
+        self.calls += 1
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("429 Resource has been exhausted (stub rate limit)")
+        # Answer with the current scene's transcript, so outputs are deterministic
+        transcript = prompt.split("## CURRENT SCENE DATA ##")[-1].split("Transcript:")[-1].split("\n")[0].strip()
+        return StubMessage(f"A scene where someone says: {transcript[:60]}")
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return self.reply(prompt)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return self.reply(prompt)
+
+
+class StubEmbedder:
+    """
+    Stands in for SentenceTransformer.encode.
+
+    Vectors are derived from a hash of each text, so they are deterministic.
+
+    :param dimensions: Size of each embedding (all-MiniLM-L6-v2 uses 384).
+    :param call_latency: Seconds of fixed overhead per forward pass (per batch).
+    :param item_latency: Seconds per text in a batch.
+    :param bag_of_words: If True, a text's vector is the sum of per-word vectors, so texts
+                         sharing words are similar (a crude stand-in for a real model).
+    :param max_tokens: With bag_of_words, only the first 'max_tokens' words count, like a
+                       transformer's truncated input (MiniLM reads 256 word pieces).
+    """
+    def __init__(self, dimensions=384, call_latency=0.0, item_latency=0.0, bag_of_words=False, max_tokens=None):
+        self.dimensions = dimensions
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.bag_of_words = bag_of_words
+        self.max_tokens = max_tokens
+        self.calls = 0
+
+    def hashed_vector(self, text):
+        import hashlib
+        import numpy as np
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+
+    def vector(self, text):
+        if not self.bag_of_words:
+            return self.hashed_vector(text)
+        import numpy as np
+        # Each distinct word counts once, so frequent filler words do not drown out the rest
+        words = set(text.lower().split()[:self.max_tokens])
+        return np.sum([self.hashed_vector(word) for word in words], axis=0) if words else np.zeros(self.dimensions, np.float32)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            self.calls += 1
+            time.sleep(self.call_latency + self.item_latency * len(batch))
+            vectors.extend(self.vector(text) for text in batch)
+        embeddings = np.stack(vectors) if vectors else np.zeros((0, self.dimensions), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[0] if single else embeddings
+
+
+class StubWhisper:
+    """
+    Stands in for a Whisper model's transcribe method.
+
+    Like Whisper, it pays for whole 30 s windows: a 3 s clip costs as much as 30 s of audio.
+
+    :param window_latency: Seconds each 30 s window takes to transcribe.
+    """
+    def __init__(self, window_latency=0.0):
+        self.window_latency = window_latency
+        self.calls = 0
+        self.audio_seconds = 0.0
+
+    def transcribe(self, audio, word_timestamps=False, **kwargs):
+        import math
+        import subprocess
+        self.calls += 1
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio],
+            capture_output=True, text=True
+        )
+        duration = float(result.stdout.strip() or 0.0)
+        self.audio_seconds += duration
+        time.sleep(self.window_latency * max(1, math.ceil(duration / 30)))
+        segments = [{"start": float(t), "end": float(min(t + 5, duration)), "text": f" words at {t}"} for t in range(0, int(duration), 5)]
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+class StubBlipInputs(dict):
+    def to(self, device):
+        return self
+
+
+class StubBlipProcessor:
+    """Stands in for BlipProcessor: 'encodes' images to their mean color and 'decodes' it as a caption."""
+    def __call__(self, images, return_tensors="pt"):
+        import numpy as np
+        images = images if isinstance(images, list) else [images]
+        return StubBlipInputs(colors=[tuple(int(c) for c in np.asarray(image).reshape(-1, 3).mean(axis=0)) for image in images])
+
+    def batch_decode(self, out, skip_special_tokens=True):
+        return [f"a frame with mean color {color}" for color in out]
+
+    def decode(self, out, skip_special_tokens=True):
+        return self.batch_decode([out])[0]
+
+
+class StubBlip:
+    """
+    Stands in for BlipForConditionalGeneration.generate.
+
+    :param call_latency: Seconds of fixed overhead per generate call (per batch).
+    :param item_latency: Seconds per image in a batch.
+    """
+    model_name = "stub-blip"
+
+    def __init__(self, call_latency=0.0, item_latency=0.0):
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+        self.calls = 0
+
+    def generate(self, colors=(), max_new_tokens=50, **kwargs):
+        self.calls += 1
+        time.sleep(self.call_latency + self.item_latency * len(colors))
+        return list(colors)
+
+
+def stub_blip(call_latency=0.0, item_latency=0.0):
+    """Returns a (model, processor, device) triple like BLIP.load_model_blip."""
+    return StubBlip(call_latency, item_latency), StubBlipProcessor(), "cpu"
@@ -0,0 +1,160 @@
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from benchmarks.stubs import StubLLM
+from Gemini_Description.Gemini import agenerate_scene_summary, RateLimiter
+from Pipe_summarization import run_summarization_pipeline, SummaryLoop
+from Result_cache.Cache import set_result_cache
+from Scene_store.Store import get_scene_store, close_scene_store
+
+# Tests of Pipe_summarization.py and the LLM retry logic in Gemini_Description/Gemini.py,
+# driven by the stub LLM from benchmarks/stubs.py (no API key or network needed).
+# Run from the repo root:
+#   python -m unittest discover tests
+
+
+class TimedStubLLM(StubLLM):
+    """A StubLLM that also records when each async call starts (time.monotonic())."""
+
+    def __init__(self, latency=0.0, fail_every=0):
+        super().__init__(latency, fail_every)
+        self.started = []
+        self.lock = threading.Lock()
+
+    async def ainvoke(self, prompt):
+        with self.lock:
+            self.started.append(time.monotonic())
+        return await super().ainvoke(prompt)
+
+
+class SummarizationPipelineTests(unittest.TestCase):
+    """Chained and raw-context summarization of a video's sets (run_summarization_pipeline)."""
+
+    VIDEO = "test_video.mp4"
+
+    def setUp(self):
+        set_result_cache(None) # Every summary comes from the stub, never from an earlier run
+        # The pipeline reads 'video_processing/Sets/<video>' relative to the working directory
+        self.old_cwd = os.getcwd()
+        self.temp_dir = tempfile.mkdtemp(prefix="clipquery_test_summaries_")
+        os.chdir(self.temp_dir)
+        self.sets_base_folder = os.path.join("video_processing/Sets/", self.VIDEO)
+        self.store = get_scene_store(self.sets_base_folder)
+        self.set_names = []
+        for number in range(1, 5):
+            self.add_set(number, f"line {number} of the dialogue")
+
+    def tearDown(self):
+        close_scene_store(self.sets_base_folder)
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def add_set(self, number, transcript):
+        set_name = f"set_{number:03d}"
+        self.store.put_set(set_name, number, (number - 1) * 15.0, number * 15.0)
+        self.store.put_description(set_name, transcript, [{"timestamp": 0.0, "description": f"frame of set {number}"}])
+        self.set_names.append(set_name)
+
+    def summaries(self):
+        return self.store.all_summary_data()
+
+    def assert_linked_in_order(self, summaries):
+        """Checks every summary's 'previous_description' is the previous set's summary."""
+        previous = None
+        for set_name in self.set_names:
+            self.assertEqual(summaries[set_name]["previous_description"], previous, set_name)
+            previous = summaries[set_name]["scene_summary"]
+
+    def test_raw_mode_links_previous_descriptions_in_order(self):
+        run_summarization_pipeline(self.VIDEO, model_object=StubLLM(latency=0.01), context_mode="raw", concurrency=4)
+
+        summaries = self.summaries()
+        self.assertEqual(list(summaries), self.set_names)
+        self.assert_linked_in_order(summaries)
+        self.assertIn("line 3 of the dialogue", summaries["set_003"]["scene_summary"])
+
+    def test_only_sets_rerun_relinks_next_set(self):
+        run_summarization_pipeline(self.VIDEO, model_object=StubLLM(), context_mode="raw")
+        old_summary = self.summaries()["set_002"]["scene_summary"]
+
+        self.store.put_description("set_002", "a rewritten line", [])
+        llm = StubLLM()
+        run_summarization_pipeline(self.VIDEO, model_object=llm, context_mode="raw", only_sets=["set_002"])
+
+        summaries = self.summaries()
+        self.assertEqual(llm.calls, 1)
+        self.assertNotEqual(summaries["set_002"]["scene_summary"], old_summary)
+        self.assertEqual(summaries["set_003"]["previous_description"], summaries["set_002"]["scene_summary"])
+        self.assert_linked_in_order(summaries)
+
+    def test_chained_mode_skips_failed_set(self):
+        # Every 2nd call fails, and chained calls are not retried: set_002 and set_004 fail
+        run_summarization_pipeline(self.VIDEO, model_object=StubLLM(fail_every=2))
+
+        summaries = self.summaries()
+        self.assertEqual(list(summaries), ["set_001", "set_003"])
+        # set_003 is chained to the last summary that exists
+        self.assertEqual(summaries["set_003"]["previous_description"], summaries["set_001"]["scene_summary"])
+
+
+class RetryTests(unittest.TestCase):
+    """Backoff and retries of agenerate_scene_summary, and rate limiting across threads."""
+
+    def setUp(self):
+        set_result_cache(None)
+
+    def summarize(self, llm, transcript, rate_limiter, max_retries=4):
+        return asyncio.run(agenerate_scene_summary(
+            transcript=transcript, visuals=[], model=llm,
+            previous_data={"transcript": "This is the first scene.", "visuals": []},
+            rate_limiter=rate_limiter, max_retries=max_retries, base_delay=0.01
+        ))
+
+    def test_rate_limit_error_backs_off_and_retries(self):
+        llm = StubLLM(fail_every=2)
+        rate_limiter = RateLimiter()
+        self.assertIsNotNone(self.summarize(llm, "first", rate_limiter))
+
+        with mock.patch.object(rate_limiter, "slow_down", wraps=rate_limiter.slow_down) as slow_down:
+            summary = self.summarize(llm, "second", rate_limiter)
+
+        self.assertIn("second", summary)
+        self.assertEqual(llm.calls, 3) # The 2nd call hit the 429, the 3rd succeeded
+        slow_down.assert_called_once()
+        # Rate-limit errors back off twice as long as other errors
+        self.assertGreaterEqual(slow_down.call_args.args[0], 2 * 0.01)
+
+    def test_gives_up_after_max_retries(self):
+        llm = StubLLM(fail_every=1)
+        self.assertIsNone(self.summarize(llm, "always limited", RateLimiter(), max_retries=3))
+        self.assertEqual(llm.calls, 4)
+
+    def test_rate_limit_holds_across_threads_sharing_a_summary_loop(self):
+        llm = TimedStubLLM()
+        summary_loop = SummaryLoop(concurrency=8, requests_per_minute=600) # One call every 0.1s
+        try:
+            threads = [
+                threading.Thread(target=summary_loop.summarize, args=(f"line {number}", [], llm))
+                for number in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            summary_loop.close()
+
+        self.assertEqual(llm.calls, 5)
+        started = sorted(llm.started)
+        gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+        self.assertGreaterEqual(min(gaps), 0.09)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,53 +1,199 @@
 import os
-import json
 import glob
-import re
+import bisect
+import queue
+import time
+import threading
+from PIL import Image
+from video_processing.Frame_extraction import iter_sampled_frames
+from video_processing.Full_extraction import list_frame_files, FRAME_FILE_REGEX
+from Model_registry.Registry import get_model
+from Frame_Description.Frame_dedup import FrameDeduplicator, DEFAULT_MAX_DIFFERENCE
+from Audio_transcription.Voice_activity import SpeechGate
+from Pipeline_metrics.Metrics import set_timer
+from Scene_store.Store import set_store
 
 #  HELPER FUNCTION
 
-def read_time_info(info_file_path):
-    """Reads the time_info.txt file and returns start/end times as floats."""
-    times = {}
+def read_set_times(set_folder_path):
+    """Reads a set's start/end times (in seconds) from the scene store. Returns (None, None) if unknown."""
+    store, set_name = set_store(set_folder_path)
+    set_info = store.get_set(set_name)
+    if set_info is None:
+        return None, None
+    return set_info["start_time"], set_info["end_time"]
+
+def read_frame_times(set_folder_path):
+    """
+    Reads a set's planned frame times from the scene store (recorded by adaptive segmentation).
+
+    :return: A list of absolute times in seconds, or None if the set uses a fixed frame interval.
+    """
+    store, set_name = set_store(set_folder_path)
+    set_info = store.get_set(set_name)
+    return set_info["frame_times"] if set_info is not None else None
+
+def list_set_frames(set_folder_path, set_start_time, set_end_time, frame_interval, frame_times=None):
+    """
+    Lists the frames of a set together with their absolute timestamps.
+
+    :param frame_times: Optional planned frame times (see read_frame_times); frame_NNNN is then
+                        at frame_times[NNNN - 1] instead of 'frame_interval' steps from the start.
+    :return: A list of (timestamp, frame_path) tuples, in frame order.
+    """
+    frames = []
+    for frame_path in list_frame_files(set_folder_path):
+        frame_num = int(FRAME_FILE_REGEX.search(frame_path).group(1)) # 1-based index
+        
+        if frame_times is not None:
+            if frame_num > len(frame_times):
+                continue
+            frame_timestamp = frame_times[frame_num - 1]
+        else:
+            # (frame_num - 1) because frame_0001 is at the 0-second offset
+            time_offset = (frame_num - 1) * frame_interval
+            frame_timestamp = set_start_time + time_offset
+        
+        if frame_timestamp > set_end_time + 0.1: # 0.1s buffer for float math
+            continue 
+
+        frames.append((frame_timestamp, frame_path))
+    return frames
+
+def save_set_data(set_folder_path, transcript_text, visuals_list):
+    """
+    Saves the set's transcript and frame captions in the scene store.
+
+    :return: The set's data dictionary (start_time, end_time, transcript, visuals), or None on failure.
+    """
+    store, set_name = set_store(set_folder_path)
     try:
-        with open(info_file_path, 'r') as f:
-            for line in f:
-                if line.startswith("start_time_seconds:"):
-                    times['start_time'] = float(line.split(":")[1].strip())
-                elif line.startswith("end_time_seconds:"):
-                    times['end_time'] = float(line.split(":")[1].strip())
-        if 'start_time' not in times or 'end_time' not in times:
-            return None, None
-        return times['start_time'], times['end_time']
+        final_data = store.put_description(set_name, transcript_text, visuals_list)
+        print(f"  Successfully saved the description of {set_name}")
     except Exception as e:
-        print(f"  [Error] Could not read {info_file_path}: {e}")
-        return None, None
+        print(f"  [Error] Could not save the description of {set_name}: {e}")
+        return None
+        
+    return final_data
+
+def group_pieces_by_sets(pieces, set_times):
+    """
+    Assigns timed transcript pieces to sets.
+
+    Each timed piece goes to the set that contains its midpoint. Pieces past the
+    last set's end (Whisper can overshoot slightly) go to the last set.
+
+    :param pieces: List of {"start", "end", "text"} dictionaries, in time order.
+    :param set_times: List of (start_time, end_time) tuples, in set order.
+    :return: List of piece lists, one per set.
+    """
+    end_times = [end_time for _, end_time in set_times]
+    grouped = [[] for _ in set_times]
+    for piece in pieces:
+        midpoint = (piece["start"] + piece["end"]) / 2
+        set_index = min(bisect.bisect_right(end_times, midpoint), len(set_times) - 1)
+        grouped[set_index].append(piece)
+    return grouped
+
+def split_transcript_by_sets(pieces, set_times):
+    """
+    Splits a whole-video transcript into one transcript per set (see group_pieces_by_sets).
+
+    :return: List of transcript strings, one per set.
+    """
+    return ["".join(piece["text"] for piece in set_pieces).strip() for set_pieces in group_pieces_by_sets(pieces, set_times)]
+
+def phrase_segments(pieces, max_seconds=5.0, max_gap=0.8):
+    """
+    Joins word-level pieces into short timed phrases, for indexing speech at sub-set precision.
+
+    A phrase ends at sentence punctuation, at a pause longer than 'max_gap' seconds,
+    or once it spans 'max_seconds'.
+
+    :return: List of {"start", "end", "text"} phrases.
+    """
+    phrases, current = [], []
+    for piece in pieces:
+        if current and (piece["start"] - current[-1]["end"] > max_gap or piece["end"] - current[0]["start"] > max_seconds):
+            phrases.append(current)
+            current = []
+        current.append(piece)
+        if piece["text"].rstrip().endswith((".", "?", "!")):
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return [
+        {"start": round(phrase[0]["start"], 3), "end": round(phrase[-1]["end"], 3), "text": "".join(p["text"] for p in phrase).strip()}
+        for phrase in phrases
+    ]
+
+def save_transcript_segments(set_folder_path, segments):
+    """Saves a set's timed speech phrases in the scene store (used by the moment index)."""
+    store, set_name = set_store(set_folder_path)
+    try:
+        store.put_segments(set_name, segments)
+    except Exception as e:
+        print(f"  [Error] Could not save the speech phrases of {set_name}: {e}")
+
+def transcribe_full_track(set_folders, audio_path, segments_func, model_t, speech_gate=None):
+    """
+    Transcribes the whole track once and slices it into the sets' time ranges.
+
+    :param set_folders: Paths of the set folders, in order.
+    :param audio_path: Path to the full audio track (or the video itself).
+    :param segments_func: Transcribes a whole file into timed pieces (takes path, model).
+    :param speech_gate: Optional SpeechGate; only the track's speech spans are transcribed.
+    :return: A dictionary mapping each set folder to its transcript. Each set's timed phrases
+             are also saved in the scene store.
+    """
+    timed_folders = []
+    for set_folder_path in set_folders:
+        start_time, end_time = read_set_times(set_folder_path)
+        if start_time is not None:
+            timed_folders.append((set_folder_path, start_time, end_time))
+    if not timed_folders:
+        return {}
+
+    print(f"\nTranscribing the full track once: {audio_path}")
+    if speech_gate is not None:
+        pieces = speech_gate.transcribe_track(audio_path, segments_func, model_t, os.path.dirname(timed_folders[0][0]))
+    else:
+        pieces = segments_func(audio_path, model_t)
+    grouped = group_pieces_by_sets(pieces, [(start, end) for _, start, end in timed_folders])
+    if speech_gate is not None:
+        speech_gate.mark_silent_sets([folder for folder, _, _ in timed_folders], grouped)
+    transcripts = {}
+    for (folder, _, _), set_pieces in zip(timed_folders, grouped):
+        transcripts[folder] = "".join(piece["text"] for piece in set_pieces).strip()
+        save_transcript_segments(folder, phrase_segments(set_pieces))
+    return transcripts
 
 # CORE PROCESSING FUNCTION
 
-def process_set_folder(set_folder_path, frame_interval, transcript_func, caption_func, model_c, processor, device, model_t):
+def process_set_folder(set_folder_path, frame_interval, transcript_func, caption_func, model_c, processor, device, model_t, dedup=None):
     """
-    Processes a single set folder (e.g., 'set_001') and creates 
-    a 'data.json' file inside it.
+    Processes a single set folder (e.g., 'set_001') and saves its
+    description in the scene store.
 
     :param set_folder_path: Path to the individual set folder.
     :param frame_interval: The rate (in sec) at which frames were captured (e.g., 2.0).
     :param transcript_func: The function to call for audio transcription (takes audio_path).
     :param caption_func: The function to call for image captioning (takes image_path).
+    :param dedup: Optional FrameDeduplicator; frames nearly identical to the last captioned
+                  one reuse its caption.
     :return: A dictionary with the set's data, or None on failure.
     """
     print(f"\nProcessing folder: {os.path.basename(set_folder_path)}")
     
     
     # 1. Define all file paths
-    time_info_file = os.path.join(set_folder_path, "time_info.txt")
     audio_file = os.path.join(set_folder_path, "audio.mp3")
-    output_json_file = os.path.join(set_folder_path, "data.json")
-    frame_files = sorted(glob.glob(os.path.join(set_folder_path, "frame_*.png")))
 
     # 2. Get Set Start/End Times
-    set_start_time, set_end_time = read_time_info(time_info_file)
+    set_start_time, set_end_time = read_set_times(set_folder_path)
     if set_start_time is None:
-        print(f"  [Skipping] Missing or corrupt time_info.txt in {set_folder_path}")
+        print(f"  [Skipping] No time info recorded for {set_folder_path}")
         return None
 
     # 3. Get Audio Transcript
@@ -58,24 +204,18 @@ def process_set_folder(set_folder_path, frame_interval, transcript_func, caption
     
     # 4. Process all visual frames
     visuals_list = []
-    frame_number_regex = re.compile(r"frame_(\d+)\.png$")
-
-    for frame_path in frame_files:
-        match = frame_number_regex.search(frame_path)
-        if not match:
-            continue
-            
-        frame_num = int(match.group(1)) # 1-based index
-        
-        # (frame_num - 1) because frame_0001 is at the 0-second offset
-        time_offset = (frame_num - 1) * frame_interval
-        frame_timestamp = set_start_time + time_offset
-        
-        if frame_timestamp > set_end_time + 0.1: # 0.1s buffer for float math
-            continue 
-
-        # Get image caption
-        caption_text = caption_func(frame_path,model_c, processor, device)
+    captions_by_frame = {}
+    for frame_timestamp, frame_path in list_set_frames(set_folder_path, set_start_time, set_end_time, frame_interval, read_frame_times(set_folder_path)):
+        # Get image caption (or reuse the last one if the frame barely changed)
+        source = dedup.find_duplicate(set_folder_path, frame_timestamp, frame_path) if dedup else None
+        if source is not None:
+            caption_text = captions_by_frame[source]
+        else:
+            start = time.perf_counter()
+            caption_text = caption_func(frame_path,model_c, processor, device)
+            if dedup:
+                dedup.add_caption_time(time.perf_counter() - start)
+            captions_by_frame[frame_timestamp] = caption_text
         
         visual_entry = {
             "timestamp": round(frame_timestamp, 3),
@@ -83,40 +223,257 @@ def process_set_folder(set_folder_path, frame_interval, transcript_func, caption
         }
         visuals_list.append(visual_entry)
         
-    # 5. Assemble the final structure
-    final_data = {
-        "start_time": round(set_start_time, 3),
-        "end_time": round(set_end_time, 3),
-        "transcript": transcript_text,
-        "visuals": visuals_list
-    }
-    
-    # 6. Save as JSON
-    try:
-        with open(output_json_file, 'w') as f:
-            json.dump(final_data, f, indent=2)
-        print(f"  Successfully created {os.path.basename(output_json_file)}")
-    except Exception as e:
-        print(f"  [Error] Could not write JSON file: {e}")
-        return None
-        
-    return final_data
+    # 5. Save the transcript and captions
+    return save_set_data(set_folder_path, transcript_text, visuals_list)
+
+def read_pending_sets(set_folders, transcript_func, model_t):
+    """
+    Reads the time info of every set and transcribes its audio.
+
+    :return: A list of pending set dictionaries ('folder', 'start_time', 'end_time', 'frame_times',
+             'transcript' and an empty 'visuals' list), skipping incomplete sets.
+    """
+    pending_sets = []
+    for set_folder_path in set_folders:
+        print(f"\nProcessing folder: {os.path.basename(set_folder_path)}")
+        audio_file = os.path.join(set_folder_path, "audio.mp3")
+
+        set_start_time, set_end_time = read_set_times(set_folder_path)
+        if set_start_time is None:
+            print(f"  [Skipping] No time info recorded for {set_folder_path}")
+            continue
+        if not os.path.exists(audio_file):
+            print(f"  [Skipping] Missing audio.mp3 in {set_folder_path}")
+            continue
+
+        with set_timer("transcription", os.path.basename(set_folder_path)):
+            transcript_text = transcript_func(audio_file, model_t)
+        pending_sets.append({
+            "folder": set_folder_path,
+            "start_time": set_start_time,
+            "end_time": set_end_time,
+            "frame_times": read_frame_times(set_folder_path),
+            "transcript": transcript_text,
+            "visuals": []
+        })
+    return pending_sets
+
+def add_captions(pending_sets, batch, captions):
+    """Maps a batch of captions back to their sets. Batch items are (set position, timestamp, frame)."""
+    for (set_pos, frame_timestamp, _), caption_text in zip(batch, captions):
+        pending_sets[set_pos]["visuals"].append({
+            "timestamp": round(frame_timestamp, 3),
+            "description": caption_text
+        })
+
+def caption_batch(pending_sets, batch, batch_caption_func, model_c, processor, device, batch_size, dedup=None, captions_by_frame=None):
+    """
+    Captions a batch of (set position, timestamp, frame) items and adds the captions to their sets.
+
+    :param dedup: Optional FrameDeduplicator that is told how long captioning took.
+    :param captions_by_frame: Optional dict filled with {(set position, timestamp): caption},
+                              so duplicates of these frames can reuse the captions later.
+    """
+    start = time.perf_counter()
+    captions = batch_caption_func([frame for _, _, frame in batch], model_c, processor, device, batch_size)
+    if dedup is not None:
+        dedup.add_caption_time(time.perf_counter() - start, len(batch))
+    if captions_by_frame is not None:
+        captions_by_frame.update(((set_pos, frame_timestamp), caption) for (set_pos, frame_timestamp, _), caption in zip(batch, captions))
+    add_captions(pending_sets, batch, captions)
+
+def add_reused_captions(pending_sets, reused, captions_by_frame):
+    """
+    Adds the captions of deduplicated frames. Items of 'reused' are (set position, timestamp,
+    source frame key), where the key points into 'captions_by_frame'. Visuals are re-sorted by time.
+    """
+    for set_pos, frame_timestamp, source in reused:
+        pending_sets[set_pos]["visuals"].append({
+            "timestamp": round(frame_timestamp, 3),
+            "description": captions_by_frame.get(source, "")
+        })
+    for pending in pending_sets:
+        pending["visuals"].sort(key=lambda visual: visual["timestamp"])
+
+def save_pending_sets(pending_sets):
+    """Saves the description of every pending set and returns the saved data dictionaries."""
+    all_data = []
+    for pending in pending_sets:
+        print(f"\nSaving folder: {os.path.basename(pending['folder'])}")
+        data = save_set_data(pending["folder"], pending["transcript"], pending["visuals"])
+        if data:
+            all_data.append(data)
+    return all_data
+
+def process_sets_batched(set_folders, frame_interval, transcript_func, batch_caption_func, model_c, processor, device, model_t, batch_size=8, dedup=None):
+    """
+    Processes many set folders, captioning their frames in batches that span set boundaries.
+
+    Each set is transcribed first and its frames are queued. The queued frames are then
+    captioned 'batch_size' at a time, and every caption is mapped back to its set and
+    timestamp before the descriptions are saved.
+
+    :param set_folders: Paths of the set folders, in order.
+    :param batch_caption_func: Captions a list of frames (takes paths, model, processor, device, batch_size).
+    :param batch_size: Number of frames captioned per model call.
+    :param dedup: Optional FrameDeduplicator; near-duplicate frames are not queued and reuse
+                  the caption of the frame they match.
+    :return: A list containing the data dictionaries of every processed set.
+    """
+    # 1. Read time info, transcribe and queue the frames of every set
+    pending_sets = read_pending_sets(set_folders, transcript_func, model_t)
+    frame_jobs = [] # (index into pending_sets, timestamp, frame_path)
+    reused = [] # (index into pending_sets, timestamp, key of the frame whose caption is reused)
+    for set_pos, pending in enumerate(pending_sets):
+        for frame_timestamp, frame_path in list_set_frames(pending["folder"], pending["start_time"], pending["end_time"], frame_interval, pending["frame_times"]):
+            # Grouped by folder, so a deduplicator shared across calls never mixes up sets
+            source = dedup.find_duplicate(pending["folder"], (set_pos, frame_timestamp), frame_path) if dedup else None
+            if source is not None:
+                reused.append((set_pos, frame_timestamp, source))
+            else:
+                frame_jobs.append((set_pos, frame_timestamp, frame_path))
+
+    # 2. Caption the queued frames in micro-batches
+    print(f"\nCaptioning {len(frame_jobs)} frames in batches of {batch_size}...")
+    captions_by_frame = {}
+    for start in range(0, len(frame_jobs), batch_size):
+        batch = frame_jobs[start:start + batch_size]
+        caption_batch(pending_sets, batch, batch_caption_func, model_c, processor, device, batch_size, dedup, captions_by_frame)
+    add_reused_captions(pending_sets, reused, captions_by_frame)
+
+    # 3. Save each set's description
+    return save_pending_sets(pending_sets)
+
+def process_sets_streaming(video_path, set_folders, frame_interval, transcript_func, batch_caption_func, model_c, processor, device, model_t, batch_size=8, queue_size=32, save_frames=False, dedup=None):
+    """
+    Processes many set folders, decoding frames straight from the video instead of reading PNGs.
+
+    A background thread decodes the video once and puts (set, timestamp, frame) items on a
+    bounded queue; frames are RGB NumPy arrays. The caller's thread takes them off the queue
+    and captions them in batches. The queue bound keeps memory flat when captioning is slower
+    than decoding.
+
+    :param video_path: Path to the source video the sets were cut from.
+    :param set_folders: Paths of the set folders, in order.
+    :param batch_caption_func: Captions a list of frames (takes arrays, model, processor, device, batch_size).
+    :param batch_size: Number of frames captioned per model call.
+    :param queue_size: Maximum number of decoded frames waiting to be captioned.
+    :param save_frames: If True, also save each frame as 'frame_NNNN.png' in its set folder.
+    :param dedup: Optional FrameDeduplicator; near-duplicate frames are not captioned and reuse
+                  the caption of the frame they match.
+    :return: A list containing the data dictionaries of every processed set.
+    """
+    # 1. Read time info and transcribe every set
+    pending_sets = read_pending_sets(set_folders, transcript_func, model_t)
+
+    # 2. Work out which frame belongs to which set (frame_0001 is at the set's start,
+    #    or at the first planned time for adaptively segmented sets)
+    sample_owner = {}
+    for set_pos, pending in enumerate(pending_sets):
+        if pending["frame_times"] is not None:
+            for frame_num, frame_timestamp in enumerate(pending["frame_times"], start=1):
+                sample_owner[frame_timestamp] = (set_pos, frame_num)
+            continue
+        frame_num = 1
+        frame_timestamp = pending["start_time"]
+        while frame_timestamp < pending["end_time"] - 1e-6:
+            sample_owner[frame_timestamp] = (set_pos, frame_num)
+            frame_num += 1
+            frame_timestamp = pending["start_time"] + (frame_num - 1) * frame_interval
+
+    # 3. Decode in a background thread, feeding a bounded queue
+    frame_queue = queue.Queue(maxsize=queue_size)
+
+    def decode_frames():
+        try:
+            for frame_timestamp, frame in iter_sampled_frames(video_path, sample_owner.keys()):
+                frame_queue.put((frame_timestamp, frame))
+        except Exception as e:
+            print(f"  [Error] Frame decoding failed: {e}")
+        finally:
+            frame_queue.put(None)
+
+    decoder = threading.Thread(target=decode_frames, daemon=True)
+    decoder.start()
+
+    # 4. Caption frames as they arrive
+    print(f"\nCaptioning {len(sample_owner)} streamed frames in batches of {batch_size}...")
+    batch = []
+    reused = []
+    captions_by_frame = {}
+    while True:
+        item = frame_queue.get()
+        if item is not None:
+            frame_timestamp, frame = item
+            set_pos, frame_num = sample_owner[frame_timestamp]
+            if save_frames:
+                frame_path = os.path.join(pending_sets[set_pos]["folder"], f"frame_{frame_num:04d}.png")
+                Image.fromarray(frame).save(frame_path)
+            source = dedup.find_duplicate(set_pos, (set_pos, frame_timestamp), frame) if dedup else None
+            if source is not None:
+                # The matched frame may still be waiting in 'batch'; its caption is looked up at the end
+                reused.append((set_pos, frame_timestamp, source))
+            else:
+                batch.append((set_pos, frame_timestamp, frame))
+        if batch and (item is None or len(batch) == batch_size):
+            caption_batch(pending_sets, batch, batch_caption_func, model_c, processor, device, batch_size, dedup, captions_by_frame)
+            batch = []
+        if item is None:
+            break
+    decoder.join()
+    add_reused_captions(pending_sets, reused, captions_by_frame)
+
+    # 5. Save each set's description
+    return save_pending_sets(pending_sets)
+
+def load_all_set_data(set_folders):
+    """Reads the description of every set folder that has one, in order."""
+    if not set_folders:
+        return []
+    store, _ = set_store(set_folders[0])
+    all_data = store.all_set_data([os.path.basename(os.path.normpath(folder)) for folder in set_folders])
+    return list(all_data.values())
 
 # MAIN CALLABLE FUNCTION
 
-def process_all_sets(sets_base_folder, frame_interval, transcript_func, caption_func, load_model_capt, load_model_transc):
+def process_all_sets(sets_base_folder, frame_interval, transcript_func, caption_func, load_model_capt=None, load_model_transc=None, batch_caption_func=None, caption_batch_size=8, video_path=None, frame_queue_size=32, save_frames=False, segments_func=None, full_audio_path=None, only_sets=None, dedup_max_difference=DEFAULT_MAX_DIFFERENCE, speech_gate=True):
     """
     Finds all 'set_*' folders within a base directory and processes them.
 
     :param sets_base_folder: The path to the folder containing all sets (e.g., ".../Sets/Vid1.mp4").
-    :param frame_interval: The rate (in sec) at which frames were captured (e.g., 2.0).
+    :param frame_interval: The rate (in sec) at which frames were captured (e.g., 2.0). Sets with
+                           planned frame times (adaptive segmentation) use those instead.
     :param transcript_func: The function to call for audio transcription.
     :param caption_func: The function to call for image captioning.
+    :param load_model_capt: Function returning (model, processor, device) for captioning.
+                            Defaults to the shared BLIP model from the model registry.
+    :param load_model_transc: Function returning the transcription model.
+                              Defaults to the shared Whisper model from the model registry.
+    :param batch_caption_func: Optional batched captioning function. If given, frames from
+                               all sets are captioned together in batches of 'caption_batch_size'.
+    :param caption_batch_size: Number of frames per captioning batch.
+    :param video_path: Optional path to the source video. If given, frames are decoded from
+                       the video in memory instead of being read from the frame image files.
+    :param frame_queue_size: Maximum number of decoded frames waiting to be captioned (streaming only).
+    :param save_frames: If True, streamed frames are also saved as PNGs in their set folders.
+    :param segments_func: Optional whole-file transcription function returning timed pieces.
+    :param full_audio_path: The audio track (or video) given to 'segments_func'. If both are set,
+                            the track is transcribed once and sliced by each set's time bounds
+                            instead of transcribing every 'audio.mp3'.
+    :param only_sets: Optional list of set names (e.g. ["set_004"]) to process. The other sets keep
+                      their existing description, which is still part of the returned list.
+    :param dedup_max_difference: Frames of a set that differ from its last captioned frame by less
+                                 than this (mean absolute difference of 32x32 gray thumbnails, 0-1)
+                                 reuse that caption. None captions every frame. The skipped share
+                                 and the time saved are saved to 'caption_dedup.json'.
+    :param speech_gate: If True, audio is checked for speech first (see Audio_transcription/Voice_activity.py):
+                        sets without speech get an empty transcript without calling Whisper, and
+                        silence around the speech is trimmed. The report goes to 'speech_gate.json'.
     :return: A list containing all data dictionaries from all sets.
     """
     
-    model_c, processor, device = load_model_capt()
-    model_t = load_model_transc()
+    model_c, processor, device = load_model_capt() if load_model_capt else get_model("blip")
+    model_t = load_model_transc() if load_model_transc else get_model("whisper")
     
     print("--- 🚀 Starting JSON Generation Task ---")
     if not os.path.isdir(sets_base_folder):
@@ -133,30 +490,85 @@ def process_all_sets(sets_base_folder, frame_interval, transcript_func, caption_
         print(f"[Error] No 'set_...' folders found in {sets_base_folder}.")
         return []
 
-    all_data = []
-    for folder_path in set_folders:
-        if os.path.isdir(folder_path):
-            data = process_set_folder(
-                folder_path, 
-                frame_interval, 
-                transcript_func, 
-                caption_func,
-                model_c, 
-                processor, 
-                device,
-                model_t
-            )
-            if data:
-                all_data.append(data)
-                
-    # Save a single file with all data combined
-    all_data_file = os.path.join(sets_base_folder, "all_sets_data.json")
-    try:
-        with open(all_data_file, 'w') as f:
-            json.dump(all_data, f, indent=2)
-        print(f"\n--- ✨ Task Complete ---")
-        print(f"All data combined and saved to: {all_data_file}")
-    except Exception as e:
-        print(f"\n[Error] Could not write combined JSON file: {e}")
-        
+    all_set_folders = set_folders
+    if only_sets is not None:
+        set_folders = [folder_path for folder_path in set_folders if os.path.basename(folder_path) in only_sets]
+        print(f"Processing {len(set_folders)} of {len(all_set_folders)} sets.")
+
+    gate = SpeechGate() if speech_gate else None
+    if segments_func is not None and full_audio_path is not None:
+        set_transcripts = transcribe_full_track(set_folders, full_audio_path, segments_func, model_t, gate)
+        # Every set's audio.mp3 lives in its set folder, so the folder picks the precomputed text
+        transcript_func = lambda audio_file, model_t: set_transcripts.get(os.path.dirname(audio_file), "")
+    elif gate is not None:
+        set_transcript_func = transcript_func
+        transcript_func = lambda audio_file, model_t: gate.transcribe_set(audio_file, set_transcript_func, model_t)
+
+    dedup = FrameDeduplicator(dedup_max_difference) if dedup_max_difference is not None else None
+
+    if video_path is not None:
+        if batch_caption_func is None:
+            batch_caption_func = lambda frames, model_c, processor, device, batch_size: [
+                caption_func(frame, model_c, processor, device) for frame in frames
+            ]
+        all_data = process_sets_streaming(
+            video_path,
+            [folder_path for folder_path in set_folders if os.path.isdir(folder_path)],
+            frame_interval,
+            transcript_func,
+            batch_caption_func,
+            model_c,
+            processor,
+            device,
+            model_t,
+            caption_batch_size,
+            frame_queue_size,
+            save_frames,
+            dedup
+        )
+    elif batch_caption_func is not None:
+        all_data = process_sets_batched(
+            [folder_path for folder_path in set_folders if os.path.isdir(folder_path)],
+            frame_interval,
+            transcript_func,
+            batch_caption_func,
+            model_c,
+            processor,
+            device,
+            model_t,
+            caption_batch_size,
+            dedup
+        )
+    else:
+        all_data = []
+        for folder_path in set_folders:
+            if os.path.isdir(folder_path):
+                with set_timer("description", os.path.basename(folder_path)):
+                    data = process_set_folder(
+                        folder_path, 
+                        frame_interval, 
+                        transcript_func, 
+                        caption_func,
+                        model_c, 
+                        processor, 
+                        device,
+                        model_t,
+                        dedup
+                    )
+                if data:
+                    all_data.append(data)
+
+    if dedup is not None:
+        dedup.print_stats()
+        dedup.save_stats(sets_base_folder)
+    if gate is not None:
+        gate.print_stats()
+        gate.save_stats(sets_base_folder)
+
+    # Sets skipped by 'only_sets' keep their description; reload everything so the list is complete
+    if only_sets is not None:
+        all_data = load_all_set_data(all_set_folders)
+
+    print(f"\n--- ✨ Task Complete ---")
+    print(f"Descriptions of {len(all_data)} sets saved to the scene store.")
     return all_data
\ No newline at end of file
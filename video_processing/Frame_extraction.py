@@ -62,6 +62,48 @@ def extract_frames(video_path, output_folder, interval=1):
     print(f"\nExtraction complete. Total frames saved: {saved_frame_count}")
 
 
+def iter_sampled_frames(video_path, sample_times):
+    """
+    Decodes a video once, front to back, and yields the frame for each requested time.
+
+    Every frame is grabbed, but only the first frame at or after each sample time is
+    retrieved and converted, so skipped frames never pay for colour conversion.
+
+    :param video_path: Path to the input video file.
+    :param sample_times: Times (in seconds) at which a frame is wanted.
+    :return: A generator of (sample_time, frame) tuples, where frame is an RGB NumPy array.
+    """
+    sample_times = sorted(sample_times)
+    if not sample_times:
+        return
+
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        print(f"Error: Could not open video file at {video_path}")
+        return
+
+    next_sample = 0
+    try:
+        while next_sample < len(sample_times):
+            if not video_capture.grab():
+                break
+            frame_time = video_capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if frame_time + 1e-6 < sample_times[next_sample]:
+                continue
+
+            success, frame = video_capture.retrieve()
+            if not success:
+                continue
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            # A single frame can cover several samples if the video has a low frame rate
+            while next_sample < len(sample_times) and frame_time + 1e-6 >= sample_times[next_sample]:
+                yield sample_times[next_sample], frame
+                next_sample += 1
+    finally:
+        video_capture.release()
+
+
 if __name__ == "__main__":
     filename='Vid1.mp4'
     # Specify the path to your video file
@@ -1,7 +1,25 @@
 import os
+import re
 import subprocess
 import math
 import shlex
+import shutil
+import json
+import glob
+import bisect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Pipeline_metrics.Metrics import set_timer
+from Scene_store.Store import get_scene_store, set_store
+
+# Frame images are full-resolution PNGs by default. A 'frame_encoding' such as
+# {"format": "jpg", "size": 384, "quality": 90} writes them in a lossy format instead,
+# scaled so their shorter side is at most 'size' pixels (never upscaled). BLIP resizes
+# every frame to 384x384 anyway, so frames at that size caption the same while taking a
+# small fraction of the disk (see benchmarks/bench_frames.py).
+
+FRAME_EXTENSIONS = {"png": "png", "jpg": "jpg", "jpeg": "jpg", "webp": "webp"}
+FRAME_FILE_REGEX = re.compile(r"frame_(\d+)\.(png|jpg|webp)$")
 
 def get_video_duration(video_path):
     """Gets the total duration of the video in seconds."""
@@ -22,6 +40,48 @@ def get_video_duration(video_path):
         print(f"Error getting video duration: {e}")
         return None
 
+def frame_output_options(frame_encoding=None):
+    """
+    Returns how FFmpeg should write frames for a frame encoding (see the notes at the top).
+
+    :param frame_encoding: Optional {"format": "png"|"jpg"|"webp", "size": max shorter side in px,
+                           "quality": 1-100}. None (or an empty dict) keeps full-resolution PNGs.
+    :return: (file extension, list of extra video filters, list of encoder arguments).
+    """
+    frame_encoding = frame_encoding or {}
+    frame_format = str(frame_encoding.get("format", "png")).lower()
+    if frame_format not in FRAME_EXTENSIONS:
+        print(f"  [Warning] Unknown frame format '{frame_format}'. Using PNG.")
+        frame_format = "png"
+    extension = FRAME_EXTENSIONS[frame_format]
+
+    filters = []
+    size = frame_encoding.get("size")
+    if size:
+        size = int(size)
+        # Shorter side down to 'size', aspect ratio kept; 'area' averages pixels instead of dropping them
+        filters.append(f"scale='if(gte(iw,ih),-1,min({size},iw))':'if(gte(iw,ih),min({size},ih),-1)':flags=area")
+
+    quality = min(max(int(frame_encoding.get("quality", 90)), 1), 100)
+    if extension == "jpg":
+        # The MJPEG encoder takes a quantizer from 2 (best) to 31 (worst)
+        encoder = ["-q:v", str(round(31 - (quality - 1) * 29 / 99))]
+    elif extension == "webp":
+        encoder = ["-c:v", "libwebp", "-quality", str(quality)]
+    else:
+        encoder = [] # PNG is lossless; -q:v has no effect on it
+    return extension, filters, encoder
+
+def list_frame_files(set_folder_path):
+    """Returns the paths of a set's 'frame_NNNN' images (any frame format), in frame order."""
+    frame_files = [path for path in glob.glob(os.path.join(set_folder_path, "frame_*")) if FRAME_FILE_REGEX.search(path)]
+    return sorted(frame_files, key=lambda path: int(FRAME_FILE_REGEX.search(path).group(1)))
+
+def remove_frame_files(set_folder_path):
+    """Deletes a set's frame images, so a re-extraction never mixes old and new frames."""
+    for frame_path in list_frame_files(set_folder_path):
+        os.remove(frame_path)
+
 def format_time(seconds):
     """Converts seconds to HH:MM:SS.sss format."""
     hours = int(seconds // 3600)
@@ -29,17 +89,374 @@ def format_time(seconds):
     sec = seconds % 60
     return f"{hours:02}:{minutes:02}:{sec:06.3f}"
 
+def has_audio_stream(video_path):
+    """Returns True if the video file contains at least one audio stream."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "csv=p=0",
+        video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return bool(result.stdout.strip())
+    except Exception as e:
+        print(f"Error probing audio streams: {e}")
+        return False
+
+def save_set_times(set_folder_path, set_number, start_time, end_time, frame_times=None):
+    """
+    Records a set's time bounds in the video's scene store (see Scene_store/Store.py).
+
+    :param frame_times: Optional absolute times of the set's frames (adaptive segmentation).
+                        Without it, frames are 'frame_interval' apart from the set's start.
+    """
+    store, set_name = set_store(set_folder_path)
+    print(f"  Recording time info of {set_name}")
+    store.put_set(set_name, set_number, start_time, end_time, frame_times)
+
+def write_time_info(set_folder_path, set_number, start_time, end_time, frame_times=None):
+    """Writes the legacy 'time_info.txt' file for a single set (used by SceneStore.export_legacy_json)."""
+    info_file_path = os.path.join(set_folder_path, "time_info.txt")
+    with open(info_file_path, "w") as f:
+        f.write(f"set_number: {set_number}\n")
+        f.write(f"start_time_seconds: {start_time:.3f}\n")
+        f.write(f"end_time_seconds: {end_time:.3f}\n")
+        f.write(f"start_time_formatted: {format_time(start_time)}\n")
+        f.write(f"end_time_formatted: {format_time(end_time)}\n")
+        if frame_times is not None:
+            f.write(f"frame_times_seconds: {', '.join(f'{t:.3f}' for t in frame_times)}\n")
+
+def frame_times_filter(frame_times):
+    """
+    Builds an FFmpeg select filter that keeps the first frame at or after each of the given
+    times (in the stream's own clock). 'prev_t' is NAN on the first frame, hence not(gte(...)).
+    """
+    terms = [f"gte(t,{t:.3f})*not(gte(prev_t,{t:.3f}))" for t in frame_times]
+    return f"select='{'+'.join(terms) or '0'}'"
+
 def run_ffmpeg_command(command):
-    """Runs a given FFmpeg command."""
+    """
+    Runs a given FFmpeg command.
+
+    :return: None on success, or the error message on failure.
+    """
     args = shlex.split(command)
     try:
         subprocess.run(args, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return None
     except subprocess.CalledProcessError as e:
-        print(f"Error running FFmpeg command: {e.stderr.decode()}")
+        error = e.stderr.decode(errors="replace").strip()
+        print(f"Error running FFmpeg command: {error}")
+        # The last line of FFmpeg's log holds the actual error
+        return error.splitlines()[-1] if error else f"ffmpeg exited with code {e.returncode}"
     except FileNotFoundError:
         print("Error: ffmpeg not found. Is FFmpeg installed and in your system's PATH?")
+        return "ffmpeg not found"
+
+def set_manifest_entry(set_folder_path, set_number, start_time, end_time, errors=None, expect_frames=True):
+    """
+    Builds the extraction manifest entry for one set by checking what is on disk.
+
+    A set is only marked 'ok' if FFmpeg reported no errors and the folder holds
+    an 'audio.mp3' and at least one frame (what process_set_folder needs).
+    Frames are not required when 'expect_frames' is False (streaming mode).
+    """
+    errors = list(errors or [])
+    has_audio = os.path.exists(os.path.join(set_folder_path, "audio.mp3"))
+    num_frames = len(list_frame_files(set_folder_path))
+    if not has_audio and not errors:
+        errors.append("audio.mp3 was not created")
+    if expect_frames and num_frames == 0 and not errors:
+        errors.append("no frames were extracted")
+    return {
+        "set_name": os.path.basename(set_folder_path),
+        "set_number": set_number,
+        "start_time": round(start_time, 3),
+        "end_time": round(end_time, 3),
+        "ok": not errors,
+        "audio": has_audio,
+        "frames": num_frames,
+        "errors": errors
+    }
+
+def extract_set(video_file_path, base_output_folder, set_index, total_duration, chunk_duration, frame_interval, ffmpeg_slots=None, write_frames=True, set_plan=None, frame_encoding=None):
+    """
+    Extracts the audio clip, frames and time info for a single set.
+
+    :param set_index: 0-based index of the set to extract.
+    :param set_plan: Optional {"start_time", "end_time", "frame_times"} from adaptive
+                     segmentation; replaces the fixed chunk bounds and frame interval.
+    :param ffmpeg_slots: Optional semaphore that caps how many FFmpeg processes run at once.
+    :param write_frames: If False, skip the frame images (frames are then streamed from the video later).
+    :param frame_encoding: Optional frame format, size and quality (see frame_output_options).
+    :return: The manifest entry for this set (see set_manifest_entry).
+    """
+    set_number = set_index + 1
+    set_name = f"set_{set_number:03d}"
+    set_folder_path = os.path.join(base_output_folder, set_name)
+
+    # Create the set folder
+    os.makedirs(set_folder_path, exist_ok=True)
+    print(f"\nProcessing {set_name}...")
+
+    # Calculate start and end times
+    if set_plan is not None:
+        start_time, end_time = set_plan["start_time"], set_plan["end_time"]
+        current_chunk_duration = end_time - start_time
+    else:
+        start_time = set_index * chunk_duration
+        current_chunk_duration = min(chunk_duration, total_duration - start_time)
+        end_time = start_time + current_chunk_duration
+
+    errors = []
+    slots = ffmpeg_slots or threading.Semaphore(1)
+
+    # --- Task 1: Extract Audio Clip ---
+    audio_output_path = os.path.join(set_folder_path, "audio.mp3")
+    audio_command = (
+        f'ffmpeg -y -ss {start_time} -i "{video_file_path}" -t {current_chunk_duration} '
+        f'-vn -q:a 2 "{audio_output_path}"'
+    )
+    print(f"  Extracting audio: {format_time(start_time)} to {format_time(end_time)}")
+    with slots:
+        error = run_ffmpeg_command(audio_command)
+    if error:
+        errors.append(f"audio: {error}")
+
+    # --- Task 2: Extract Frames ---
+    if write_frames:
+        remove_frame_files(set_folder_path)
+        extension, scale_filters, encoder = frame_output_options(frame_encoding)
+        frames_output_pattern = os.path.join(set_folder_path, f"frame_%04d.{extension}")
+        if set_plan is not None:
+            # Sample times are relative to the set, since -ss restarts the clock at 0
+            frame_filters = [frame_times_filter([t - start_time for t in set_plan["frame_times"]])] + scale_filters
+            frame_options = f'-vf "{",".join(frame_filters)}" -vsync vfr'
+            print(f"  Extracting {len(set_plan['frame_times'])} planned frames...")
+        else:
+            frame_options = f'-vf "{",".join([f"fps=1/{frame_interval}"] + scale_filters)}"'
+            print(f"  Extracting frames every {frame_interval}s...")
+        frames_command = (
+            f'ffmpeg -y -ss {start_time} -i "{video_file_path}" -t {current_chunk_duration} '
+            f'{frame_options} {" ".join(encoder) or "-q:v 2"} "{frames_output_pattern}"'
+        )
+        with slots:
+            error = run_ffmpeg_command(frames_command)
+        if error:
+            errors.append(f"frames: {error}")
+
+    # --- Task 3: Record the set's times ---
+    save_set_times(set_folder_path, set_number, start_time, end_time, set_plan["frame_times"] if set_plan else None)
+
+    return set_manifest_entry(set_folder_path, set_number, start_time, end_time, errors, expect_frames=write_frames)
 
-def process_video(video_file_path, base_output_folder, chunk_duration=15.0, frame_interval=2.0):
+def write_extraction_manifest(base_output_folder, video_file_path, set_entries):
+    """
+    Writes 'extraction_manifest.json' into the base folder and returns the manifest.
+
+    Entries are always sorted by set number, so the file is the same no matter
+    in which order the sets finished.
+    """
+    set_entries = sorted(set_entries, key=lambda entry: entry["set_number"])
+    failed = [entry["set_name"] for entry in set_entries if not entry["ok"]]
+    manifest = {
+        "video": video_file_path,
+        "num_sets": len(set_entries),
+        "succeeded": len(set_entries) - len(failed),
+        "failed": failed,
+        "sets": set_entries
+    }
+    manifest_path = os.path.join(base_output_folder, "extraction_manifest.json")
+    try:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    except Exception as e:
+        print(f"  [Error] Could not write extraction manifest: {e}")
+    return manifest
+
+def plan_set_bounds(total_duration, chunk_duration, set_plans=None):
+    """Returns the (start_time, end_time) of every set: from the set plans, or fixed 'chunk_duration' chunks."""
+    if set_plans is not None:
+        return [(plan["start_time"], plan["end_time"]) for plan in set_plans]
+    return [(i * chunk_duration, i * chunk_duration + min(chunk_duration, total_duration - i * chunk_duration))
+            for i in range(math.ceil(total_duration / chunk_duration))]
+
+def extract_sets_single_pass(video_file_path, base_output_folder, total_duration, chunk_duration, frame_interval, write_frames=True, set_plans=None, frame_encoding=None):
+    """
+    Extracts every set with a single FFmpeg run, so the video is demuxed and decoded once.
+
+    Same arguments as iter_sets_single_pass.
+
+    :return: A list of manifest entries, one per set.
+    """
+    return list(iter_sets_single_pass(video_file_path, base_output_folder, total_duration, chunk_duration, frame_interval, write_frames, set_plans, frame_encoding))
+
+def iter_sets_single_pass(video_file_path, base_output_folder, total_duration, chunk_duration, frame_interval, write_frames=True, set_plans=None, frame_encoding=None):
+    """
+    Runs the single-pass extraction and yields each set as soon as FFmpeg is done with it.
+
+    Audio is cut into sets by the segment muxer. Frames are picked by a select
+    filter that runs on each set's own clock, so 'frame_0001' is always at the
+    set's start time (the same layout the per-set loop produces). Both are written to
+    a staging folder while FFmpeg runs. FFmpeg's log is read as it comes: a set is done
+    once the segment muxer has opened the next audio segment, a later set's frame has
+    gone through the select filter, and the set's frame files are written (they are
+    written atomically). Its files are then moved into its 'set_NNN' folder. If FFmpeg
+    fails, the sets not yielded yet carry its error.
+
+    :param video_file_path: Absolute path to the source video file.
+    :param base_output_folder: Absolute path to the main folder where sets will be created.
+    :param total_duration: Duration of the video in seconds.
+    :param chunk_duration: Duration of each audio/frame set in seconds.
+    :param frame_interval: How often to grab a frame, in seconds.
+    :param write_frames: If False, only audio and time info are written.
+    :param set_plans: Optional list of {"start_time", "end_time", "frame_times"} from adaptive
+                      segmentation; replaces the fixed chunks and frame interval.
+    :param frame_encoding: Optional frame format, size and quality (see frame_output_options).
+    :return: A generator of manifest entries, one per set, in set order.
+    """
+    set_bounds = plan_set_bounds(total_duration, chunk_duration, set_plans)
+    num_sets = len(set_bounds)
+    set_starts = [start_time for start_time, _ in set_bounds]
+    staging_folder = os.path.join(base_output_folder, "_single_pass")
+    shutil.rmtree(staging_folder, ignore_errors=True)
+    os.makedirs(staging_folder)
+
+    # Frame key = set index * 100000 + sample index inside the set.
+    # A frame is kept when its key differs from the previous frame's key.
+    def frame_key(t):
+        return f"floor({t}/{chunk_duration})*100000+floor(mod({t},{chunk_duration})/{frame_interval})"
+    select_filter = f"select='not(eq({frame_key('t')},{frame_key('prev_t')}))',showinfo"
+    segment_options = ["-segment_time", str(chunk_duration)]
+    if set_plans is not None:
+        select_filter = frame_times_filter([t for plan in set_plans for t in plan["frame_times"]]) + ",showinfo"
+        segment_options = ["-segment_times", ",".join(f"{start_time:.3f}" for start_time in set_starts[1:]) or str(total_duration)]
+
+    command = ["ffmpeg", "-hide_banner", "-nostats", "-y", "-i", video_file_path]
+    has_audio = has_audio_stream(video_file_path)
+    if has_audio:
+        command += [
+            "-map", "0:a:0", "-vn", "-q:a", "2",
+            "-f", "segment", *segment_options, "-reset_timestamps", "1",
+            os.path.join(staging_folder, "audio_%03d.mp3")
+        ]
+    else:
+        print("  [Warning] Video has no audio stream. Sets will have no audio.mp3.")
+    extension, scale_filters, encoder = frame_output_options(frame_encoding)
+    if write_frames:
+        # showinfo stays right after the select, so it logs the kept frames' source timestamps.
+        # Atomic writing means a frame file only appears once it is complete.
+        command += [
+            "-map", "0:v:0", "-vf", ",".join([select_filter] + scale_filters), "-vsync", "vfr", *encoder,
+            "-atomic_writing", "1", os.path.join(staging_folder, f"frame_%06d.{extension}")
+        ]
+
+    set_frames = [[] for _ in range(num_sets)] # (staged frame path, frame number) per set
+    audio_closed = 0 # Audio segments the segment muxer has finished
+    video_set = 0 # Set of the latest frame through the select filter
+    tb = None
+    frames_logged = 0
+    next_set = 0
+    log_tail = []
+
+    def frame_place(t):
+        """Returns (set index, frame number) of a kept frame, numbered by its offset inside the set
+        (or, for planned frames, by its position in the set's frame_times)."""
+        if set_plans is not None:
+            set_index = min(max(bisect.bisect_right(set_starts, t + 1e-6) - 1, 0), num_sets - 1)
+            return set_index, len(set_frames[set_index]) + 1
+        set_index = min(int(math.floor(t / chunk_duration)), num_sets - 1)
+        return set_index, int(math.floor((t - set_index * chunk_duration) / frame_interval)) + 1
+
+    def finish_set(i, errors):
+        """Moves a finished set's audio clip and frames into its folder. Returns its manifest entry."""
+        start_time, end_time = set_bounds[i]
+        set_number = i + 1
+        set_folder_path = os.path.join(base_output_folder, f"set_{set_number:03d}")
+        os.makedirs(set_folder_path, exist_ok=True)
+        if write_frames:
+            remove_frame_files(set_folder_path)
+        audio_segment = os.path.join(staging_folder, f"audio_{i:03d}.mp3")
+        if os.path.exists(audio_segment):
+            os.replace(audio_segment, os.path.join(set_folder_path, "audio.mp3"))
+        save_set_times(set_folder_path, set_number, start_time, end_time, set_plans[i]["frame_times"] if set_plans else None)
+        for frame_src, frame_num in set_frames[i]:
+            if os.path.exists(frame_src):
+                os.replace(frame_src, os.path.join(set_folder_path, f"frame_{frame_num:04d}.{extension}"))
+        return set_manifest_entry(set_folder_path, set_number, start_time, end_time, errors=errors, expect_frames=write_frames)
+
+    def set_ready(i):
+        if has_audio and audio_closed <= i:
+            return False
+        if write_frames and (video_set <= i or not all(os.path.exists(path) for path, _ in set_frames[i])):
+            return False
+        return True
+
+    print("  Extracting sets in a single pass...")
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    except FileNotFoundError:
+        print("Error: ffmpeg not found. Is FFmpeg installed and in your system's PATH?")
+        process = None
+    try:
+        if process is not None:
+            for line in process.stderr:
+                log_tail = (log_tail + [line.rstrip()])[-50:]
+                if "Parsed_showinfo" in line:
+                    if tb is None:
+                        time_base = re.search(r"time_base: (\d+)/(\d+)", line)
+                        if time_base:
+                            tb = int(time_base.group(1)) / int(time_base.group(2))
+                    pts = re.search(r" n:\s*\d+ pts:\s*(-?\d+)", line)
+                    if pts and tb is not None:
+                        frames_logged += 1
+                        set_index, frame_num = frame_place(int(pts.group(1)) * tb)
+                        set_frames[set_index].append((os.path.join(staging_folder, f"frame_{frames_logged:06d}.{extension}"), frame_num))
+                        video_set = max(video_set, set_index)
+                elif "[segment @" in line and "Opening" in line:
+                    # Opening audio_NNN means every earlier segment is closed
+                    audio_closed = max(audio_closed, int(re.search(r"audio_(\d+)\.mp3", line).group(1)))
+                while next_set < num_sets and set_ready(next_set):
+                    yield finish_set(next_set, [])
+                    next_set += 1
+            process.wait()
+
+        # FFmpeg is done: every remaining set is complete (or failed with the run)
+        if process is None:
+            run_error = "ffmpeg not found"
+        elif process.returncode != 0:
+            print(f"Error running FFmpeg command: {chr(10).join(log_tail)}")
+            run_error = log_tail[-1] if log_tail else f"ffmpeg exited with code {process.returncode}"
+        elif write_frames and tb is None:
+            print("Error: could not read frame timestamps from FFmpeg output.")
+            run_error = "could not read frame timestamps"
+        else:
+            run_error = None
+        errors = [run_error] if run_error else []
+        while next_set < num_sets:
+            yield finish_set(next_set, errors)
+            next_set += 1
+        print(f"  Moved {frames_logged} frames into {num_sets} sets.")
+    finally:
+        if process is not None and process.poll() is None:
+            # The caller stopped early
+            process.kill()
+            process.wait()
+        shutil.rmtree(staging_folder, ignore_errors=True)
+
+def remove_extra_sets(base_output_folder, num_sets):
+    """Deletes 'set_NNN' folders numbered above 'num_sets' (left over from a different segmentation)."""
+    for set_folder_path in glob.glob(os.path.join(base_output_folder, "set_*")):
+        match = re.search(r"set_(\d+)$", set_folder_path)
+        if match and int(match.group(1)) > num_sets:
+            print(f"  Removing leftover {os.path.basename(set_folder_path)}")
+            shutil.rmtree(set_folder_path, ignore_errors=True)
+    get_scene_store(base_output_folder).remove_sets_after(num_sets)
+
+def process_video(video_file_path, base_output_folder, chunk_duration=15.0, frame_interval=2.0, single_pass=False, workers=1, max_ffmpeg_processes=None, write_frames=True, only_sets=None, set_plans=None, frame_encoding=None):
     """
     Extracts audio clips, frames, and time info from a video file into structured folders.
 
@@ -47,6 +464,18 @@ def process_video(video_file_path, base_output_folder, chunk_duration=15.0, fram
     :param base_output_folder: Absolute path to the main folder where sets will be created.
     :param chunk_duration: Duration of each audio/frame set in seconds.
     :param frame_interval: How often to grab a frame, in seconds.
+    :param single_pass: If True, extract every set with one FFmpeg run instead of two runs per set.
+    :param workers: Number of sets extracted in parallel (ignored in single-pass mode).
+    :param max_ffmpeg_processes: Cap on concurrent FFmpeg processes (defaults to 'workers').
+    :param write_frames: If False, no frame images are written (use with the streaming mode of process_all_sets).
+    :param only_sets: Optional list of set names (e.g. ["set_004"]) to extract. Other sets are left
+                      untouched and reported from what is already on disk.
+    :param set_plans: Optional list of {"start_time", "end_time", "frame_times"} set plans (see
+                      Scene_detection.segment_video). Sets then follow the plan instead of
+                      'chunk_duration' and frames are taken at the planned times.
+    :param frame_encoding: Optional frame format, size and quality, e.g. {"format": "jpg", "size": 384,
+                           "quality": 90} (see frame_output_options). None writes full-resolution PNGs.
+    :return: The extraction manifest (also saved as 'extraction_manifest.json'), or None on failure.
     """
     
     print(f"Starting processing for: {video_file_path}")
@@ -54,12 +483,12 @@ def process_video(video_file_path, base_output_folder, chunk_duration=15.0, fram
     # 1. Check if video file exists
     if not os.path.exists(video_file_path):
         print(f"Error: Video file not found: {video_file_path}")
-        return
+        return None
 
     # 2. Get video duration
     total_duration = get_video_duration(video_file_path)
     if total_duration is None:
-        return
+        return None
     print(f"Total video duration: {format_time(total_duration)} ({total_duration:.2f}s)")
 
     # 3. Create the main output folder
@@ -67,51 +496,47 @@ def process_video(video_file_path, base_output_folder, chunk_duration=15.0, fram
     print(f"Created/found base folder: {base_output_folder}")
 
     # 4. Calculate number of sets
-    num_sets = math.ceil(total_duration / chunk_duration)
+    num_sets = len(set_plans) if set_plans is not None else math.ceil(total_duration / chunk_duration)
     print(f"Video will be split into {num_sets} sets.")
+    remove_extra_sets(base_output_folder, num_sets)
 
-    # 5. Loop and process each set
-    for i in range(num_sets):
-        set_number = i + 1
-        set_name = f"set_{set_number:03d}"
-        set_folder_path = os.path.join(base_output_folder, set_name)
-        
-        # Create the set folder
-        os.makedirs(set_folder_path, exist_ok=True)
-        print(f"\nProcessing {set_name}...")
-
-        # Calculate start and end times
+    def set_bounds(i):
+        if set_plans is not None:
+            return set_plans[i]["start_time"], set_plans[i]["end_time"]
         start_time = i * chunk_duration
-        current_chunk_duration = min(chunk_duration, total_duration - start_time)
-        end_time = start_time + current_chunk_duration
-        
-        # --- Task 1: Extract Audio Clip ---
-        audio_output_path = os.path.join(set_folder_path, "audio.mp3")
-        audio_command = (
-            f'ffmpeg -ss {start_time} -i "{video_file_path}" -t {current_chunk_duration} '
-            f'-vn -q:a 2 "{audio_output_path}"'
-        )
-        print(f"  Extracting audio: {format_time(start_time)} to {format_time(end_time)}")
-        run_ffmpeg_command(audio_command)
+        return start_time, start_time + min(chunk_duration, total_duration - start_time)
 
-        # --- Task 2: Extract Frames ---
-        frames_output_pattern = os.path.join(set_folder_path, "frame_%04d.png")
-        frames_command = (
-            f'ffmpeg -ss {start_time} -i "{video_file_path}" -t {current_chunk_duration} '
-            f'-vf "fps=1/{frame_interval}" -q:v 2 "{frames_output_pattern}"'
-        )
-        print(f"  Extracting frames every {frame_interval}s...")
-        run_ffmpeg_command(frames_command)
-
-        # --- Task 3: Create TXT file ---
-        info_file_path = os.path.join(set_folder_path, "time_info.txt")
-        print(f"  Writing time info to {info_file_path}")
-        with open(info_file_path, "w") as f:
-            f.write(f"set_number: {set_number}\n")
-            f.write(f"start_time_seconds: {start_time:.3f}\n")
-            f.write(f"end_time_seconds: {end_time:.3f}\n")
-            f.write(f"start_time_formatted: {format_time(start_time)}\n")
-            f.write(f"end_time_formatted: {format_time(end_time)}\n")
+    # 5. Extract the sets
+    set_indices = list(range(num_sets))
+    if only_sets is not None:
+        set_indices = [i for i in set_indices if f"set_{i + 1:03d}" in only_sets]
+        print(f"Extracting {len(set_indices)} of {num_sets} sets.")
+
+    if single_pass and len(set_indices) == num_sets:
+        set_entries = extract_sets_single_pass(video_file_path, base_output_folder, total_duration, chunk_duration, frame_interval, write_frames, set_plans, frame_encoding)
+    else:
+        # A partial re-run only touches the missing sets, so it uses the per-set extractor
+        workers = max(1, workers)
+        ffmpeg_slots = threading.Semaphore(max(1, max_ffmpeg_processes or workers))
+        if workers > 1:
+            print(f"Extracting with {workers} workers...")
+        def extract_timed_set(i):
+            with set_timer("extraction", f"set_{i + 1:03d}"):
+                return extract_set(video_file_path, base_output_folder, i, total_duration, chunk_duration, frame_interval, ffmpeg_slots, write_frames, set_plans[i] if set_plans else None, frame_encoding)
+
+        # Threads are enough here: each worker just waits on its FFmpeg process
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            set_entries = list(pool.map(extract_timed_set, set_indices))
+
+        # Report the sets that were skipped from what is already on disk
+        for i in sorted(set(range(num_sets)) - set(set_indices)):
+            start_time, end_time = set_bounds(i)
+            set_folder_path = os.path.join(base_output_folder, f"set_{i + 1:03d}")
+            set_entries.append(set_manifest_entry(set_folder_path, i + 1, start_time, end_time, expect_frames=write_frames))
 
+    manifest = write_extraction_manifest(base_output_folder, video_file_path, set_entries)
+    if manifest["failed"]:
+        print(f"\n[Warning] {len(manifest['failed'])} set(s) failed: {', '.join(manifest['failed'])}")
     print("\nProcessing complete!")
+    return manifest
 
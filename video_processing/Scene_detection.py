@@ -0,0 +1,265 @@
+import os
+import math
+import json
+import time
+import bisect
+import subprocess
+import numpy as np
+
+# Adaptive segmentation: instead of cutting a set every 15 s and grabbing a frame every 2 s,
+# set boundaries are placed at shot cuts and frames are sampled per shot.
+#   1. FFmpeg decodes the video once into tiny RGB thumbnails (64x36 at 4 fps by default).
+#   2. Each thumbnail gets a colour histogram; a cut is where consecutive histograms and
+#      pixels both change a lot.
+#   3. Sets are made from whole shots, within min/max duration bounds.
+#   4. Each shot gets a frame shortly after it starts, plus more frames when its pixels keep
+#      changing (action, pans) or when it runs long (a static talking head).
+# The output is a list of {"start_time", "end_time", "frame_times"} set plans that
+# Full_extraction.process_video turns into the usual 'set_NNN' folders.
+
+SEGMENTATION_FILENAME = "segmentation.json"
+
+DEFAULT_SEGMENTATION = {
+    "min_duration": 5.0,       # Shortest set, in seconds (cuts closer than this are not set boundaries)
+    "max_duration": 30.0,      # Longest set; a longer shot is split
+    "target_duration": 15.0,   # Preferred set length when several cuts qualify
+    "analysis_fps": 4.0,       # Thumbnails per second used for cut detection
+    "cut_threshold": 0.3,      # Score (0-1) at which a change counts as a cut
+    "min_frame_gap": 1.0,      # Closest two sampled frames may be, in seconds
+    "max_frame_gap": 6.0,      # A frame is sampled at least this often, even in a static shot
+    "motion_threshold": 0.15   # Accumulated pixel change that triggers another frame within a shot
+}
+
+HISTOGRAM_BINS = 16
+THUMBNAIL_SIZE = (64, 36)
+
+
+def frame_features(thumbnail):
+    """
+    Returns (histogram, gray) for one RGB thumbnail: a normalized per-channel colour
+    histogram and a float gray image in [0, 1].
+    """
+    pixels = thumbnail.reshape(-1, 3)
+    bins = (pixels >> (8 - int(math.log2(HISTOGRAM_BINS)))).astype(np.intp)
+    bins += np.arange(3) * HISTOGRAM_BINS
+    histogram = np.bincount(bins.ravel(), minlength=3 * HISTOGRAM_BINS).astype(np.float32)
+    histogram /= pixels.shape[0] * 3
+    gray = thumbnail.astype(np.float32).mean(axis=2) / 255.0
+    return histogram, gray
+
+
+def analyze_video(video_path, analysis_fps=4.0, size=THUMBNAIL_SIZE):
+    """
+    Decodes a video into small thumbnails with FFmpeg and scores the change between
+    consecutive thumbnails. Only the scores are kept, so memory does not grow with the
+    video's resolution.
+
+    :return: (times, cut_scores, motion) NumPy arrays, one entry per thumbnail. cut_scores[i]
+             and motion[i] compare thumbnail i with thumbnail i - 1 (both are 0 for the first),
+             or None if FFmpeg failed.
+    """
+    width, height = size
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", video_path,
+        "-map", "0:v:0", "-vf", f"fps={analysis_fps},scale={width}:{height}",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+    ]
+    frame_bytes = width * height * 3
+    cut_scores, motion = [], []
+    previous = None
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        print("Error: ffmpeg not found. Is FFmpeg installed and in your system's PATH?")
+        return None
+
+    while True:
+        data = process.stdout.read(frame_bytes)
+        if len(data) < frame_bytes:
+            break
+        histogram, gray = frame_features(np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+        if previous is None:
+            cut_scores.append(0.0)
+            motion.append(0.0)
+        else:
+            # Half the L1 distance puts the histogram change in [0, 1]
+            histogram_change = 0.5 * float(np.abs(histogram - previous[0]).sum())
+            pixel_change = float(np.abs(gray - previous[1]).mean())
+            # Both must move: a pan changes pixels but not colours, a fade the reverse
+            cut_scores.append(min(1.0, math.sqrt(histogram_change * min(1.0, pixel_change * 4))))
+            motion.append(pixel_change)
+        previous = (histogram, gray)
+
+    stderr = process.stderr.read().decode(errors="replace").strip()
+    if process.wait() != 0:
+        print(f"Error analyzing video: {stderr}")
+        return None
+    times = np.arange(len(cut_scores), dtype=np.float64) / analysis_fps
+    return times, np.array(cut_scores, dtype=np.float32), np.array(motion, dtype=np.float32)
+
+
+def detect_cuts(times, cut_scores, cut_threshold=0.3, min_shot_duration=0.5):
+    """
+    Returns the times of the shot cuts, placed halfway between the two thumbnails they split.
+    Cuts closer than 'min_shot_duration' to the previous one are dropped (flashes, strobes).
+    """
+    cuts = []
+    for i in np.flatnonzero(cut_scores >= cut_threshold):
+        cut_time = float(times[i] + times[i - 1]) / 2 if i > 0 else float(times[i])
+        if not cuts or cut_time - cuts[-1] >= min_shot_duration:
+            cuts.append(cut_time)
+    return cuts
+
+
+def plan_set_bounds(cuts, total_duration, min_duration=5.0, max_duration=30.0, target_duration=15.0):
+    """
+    Groups shots into sets. Each boundary is the cut closest to 'target_duration' after the set's
+    start among the cuts between 'min_duration' and 'max_duration'; with no such cut the set is
+    split at 'max_duration'. A tail shorter than 'min_duration' joins the last set.
+
+    :return: A list of (start_time, end_time) tuples covering the whole video.
+    """
+    bounds = []
+    start = 0.0
+    while start < total_duration - 1e-6:
+        remaining = total_duration - start
+        window = [cut for cut in cuts if start + min_duration <= cut <= start + max_duration and cut < total_duration]
+        if remaining <= max_duration and (remaining <= target_duration or not window):
+            end = total_duration
+        elif window:
+            end = min(window, key=lambda cut: abs(cut - start - target_duration))
+        else:
+            end = start + max_duration
+        if total_duration - end < min_duration:
+            end = total_duration
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def plan_frame_times(start_time, end_time, cuts, times, motion, min_frame_gap=1.0, max_frame_gap=6.0, motion_threshold=0.15, settle=0.25):
+    """
+    Picks the frame sample times of one set: one frame just after each shot starts (past any
+    cut blur), then another whenever the accumulated pixel change since the last sample passes
+    'motion_threshold' or 'max_frame_gap' seconds go by.
+
+    :return: A sorted list of absolute sample times inside [start_time, end_time).
+    """
+    shot_starts = [start_time] + [cut for cut in cuts if start_time < cut < end_time]
+    shot_ends = shot_starts[1:] + [end_time]
+    frame_times = []
+    for shot_start, shot_end in zip(shot_starts, shot_ends):
+        sample = shot_start + min(settle, (shot_end - shot_start) / 2)
+        if frame_times and sample - frame_times[-1] < min_frame_gap / 2:
+            continue
+        frame_times.append(sample)
+        accumulated = 0.0
+        first = bisect.bisect_right(times, sample)
+        last = bisect.bisect_left(times, shot_end)
+        for i in range(first, last):
+            accumulated += float(motion[i])
+            t = float(times[i])
+            if t - frame_times[-1] < min_frame_gap or shot_end - t < min_frame_gap / 2:
+                continue
+            if accumulated >= motion_threshold or t - frame_times[-1] >= max_frame_gap:
+                frame_times.append(t)
+                accumulated = 0.0
+        # A long static tail (past the last analysed thumbnail) still gets its regular frames
+        while shot_end - frame_times[-1] > max_frame_gap + min_frame_gap / 2:
+            frame_times.append(frame_times[-1] + max_frame_gap)
+    return [round(t, 3) for t in frame_times]
+
+
+def fixed_plan_counts(total_duration, chunk_duration=15.0, frame_interval=2.0):
+    """Returns (sets, frames) the fixed-interval extractor produces for a video."""
+    num_sets = math.ceil(total_duration / chunk_duration)
+    frames = 0
+    for i in range(num_sets):
+        length = min(chunk_duration, total_duration - i * chunk_duration)
+        frames += math.ceil(length / frame_interval - 1e-9)
+    return num_sets, frames
+
+
+def segmentation_report(set_plans, total_duration, shot_count, analysis_seconds, chunk_duration=15.0, frame_interval=2.0):
+    """
+    Compares an adaptive plan with the fixed-interval one. Each set costs one LLM summary
+    call and each frame one caption, so the differences are the calls saved.
+    """
+    fixed_sets, fixed_frames = fixed_plan_counts(total_duration, chunk_duration, frame_interval)
+    adaptive_frames = sum(len(plan["frame_times"]) for plan in set_plans)
+    return {
+        "duration": round(total_duration, 3),
+        "shots": shot_count,
+        "analysis_seconds": round(analysis_seconds, 3),
+        "fixed": {"sets": fixed_sets, "frames": fixed_frames},
+        "adaptive": {"sets": len(set_plans), "frames": adaptive_frames},
+        "llm_calls_saved": fixed_sets - len(set_plans),
+        "caption_calls_saved": fixed_frames - adaptive_frames
+    }
+
+
+def print_segmentation_report(report):
+    """Prints the summary of a segmentation report."""
+    print("\n--- Adaptive Segmentation ---")
+    print(f"  {report['shots']} shots found in {report['analysis_seconds']:.2f}s of analysis")
+    print(f"  Sets (LLM calls):       {report['fixed']['sets']:5d} fixed -> {report['adaptive']['sets']:5d} adaptive ({report['llm_calls_saved']:+d} saved)")
+    print(f"  Frames (caption calls): {report['fixed']['frames']:5d} fixed -> {report['adaptive']['frames']:5d} adaptive ({report['caption_calls_saved']:+d} saved)")
+
+
+def segment_video(video_path, total_duration, chunk_duration=15.0, frame_interval=2.0, **params):
+    """
+    Plans adaptive sets for a video.
+
+    :param total_duration: Duration of the video in seconds (see Full_extraction.get_video_duration).
+    :param chunk_duration: The fixed set length the plan is compared against in the report.
+    :param frame_interval: The fixed frame interval the plan is compared against in the report.
+    :param params: Overrides for DEFAULT_SEGMENTATION.
+    :return: {"params", "sets": [{"start_time", "end_time", "frame_times"}], "cuts", "report"},
+             or None if the video could not be analysed.
+    """
+    params = {**DEFAULT_SEGMENTATION, **params}
+    start = time.perf_counter()
+    analysis = analyze_video(video_path, params["analysis_fps"])
+    if analysis is None:
+        return None
+    times, cut_scores, motion = analysis
+
+    cuts = detect_cuts(times, cut_scores, params["cut_threshold"])
+    set_plans = []
+    for set_start, set_end in plan_set_bounds(cuts, total_duration, params["min_duration"], params["max_duration"], params["target_duration"]):
+        set_plans.append({
+            "start_time": round(set_start, 3),
+            "end_time": round(set_end, 3),
+            "frame_times": plan_frame_times(set_start, set_end, cuts, times, motion, params["min_frame_gap"], params["max_frame_gap"], params["motion_threshold"])
+        })
+    report = segmentation_report(set_plans, total_duration, len(cuts) + 1, time.perf_counter() - start, chunk_duration, frame_interval)
+    return {"params": params, "sets": set_plans, "cuts": [round(cut, 3) for cut in cuts], "report": report}
+
+
+def load_or_segment_video(video_path, sets_base_folder, fingerprint, total_duration, chunk_duration=15.0, frame_interval=2.0, **params):
+    """
+    Returns the video's segmentation plan, reusing 'segmentation.json' in the sets folder when it
+    was made for the same fingerprint (see Stage_manifest.source_fingerprint), so the sets of a
+    re-run line up with the ones already on disk.
+    """
+    plan_path = os.path.join(sets_base_folder, SEGMENTATION_FILENAME)
+    if os.path.exists(plan_path):
+        try:
+            with open(plan_path, 'r') as f:
+                plan = json.load(f)
+            if plan.get("fingerprint") == fingerprint:
+                return plan
+        except Exception as e:
+            print(f"  [Warning] Could not read {plan_path}: {e}")
+
+    plan = segment_video(video_path, total_duration, chunk_duration, frame_interval, **params)
+    if plan is None:
+        return None
+    plan["fingerprint"] = fingerprint
+    os.makedirs(sets_base_folder, exist_ok=True)
+    try:
+        with open(plan_path, 'w') as f:
+            json.dump(plan, f, indent=2)
+    except Exception as e:
+        print(f"  [Error] Could not write {plan_path}: {e}")
+    return plan
@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+from Result_cache.Cache import hash_file
+from Scene_store.Store import set_store
+from video_processing.Full_extraction import list_frame_files
+
+# Tracks which sets of a video have finished each pipeline stage, so a re-run
+# only redoes missing or stale work. Every record stores two fingerprints:
+#   input  - what the stage consumed (the upstream stage's output)
+#   output - what the stage produced (hash of its scene store rows and files)
+# A record is stale as soon as either fingerprint no longer matches.
+
+STAGES = ("extraction", "description", "summarization", "embedding")
+MANIFEST_FILENAME = "stage_manifest.json"
+
+
+def fingerprint_parts(parts):
+    """Hashes a list of strings into a single fingerprint."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def read_manifest_file(path):
+    """Returns a manifest file's contents, or an empty dict if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"  [Warning] Could not read {path}: {e}")
+        return {}
+
+
+def write_manifest_file(path, data):
+    """Writes a manifest file atomically, so a crash never leaves a half-written file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def video_digest(video_path, sets_base_folder=None):
+    """
+    Returns the SHA-256 of a video, reusing the digest recorded in the video's manifest
+    while its path, size and modification time are unchanged (hashing a multi-GB
+    upload on every run would make every resume slow).
+
+    :param sets_base_folder: Folder of the video's manifest. Without it the file is always hashed.
+    """
+    if sets_base_folder is None:
+        return hash_file(video_path)
+    stat = os.stat(video_path)
+    key = {"path": os.path.abspath(video_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    path = os.path.join(sets_base_folder, MANIFEST_FILENAME)
+    data = read_manifest_file(path)
+    cached = data.get("source_file") or {}
+    if all(cached.get(field) == value for field, value in key.items()) and cached.get("sha256"):
+        return cached["sha256"]
+
+    digest = hash_file(video_path)
+    data["source_file"] = {**key, "sha256": digest}
+    try:
+        write_manifest_file(path, data)
+    except Exception as e:
+        print(f"  [Warning] Could not record the video's digest: {e}")
+    return digest
+
+
+def source_fingerprint(video_path, params, sets_base_folder=None):
+    """
+    Fingerprints the source video and the pipeline parameters.
+
+    If either changes, every stage of every set is stale.
+
+    :param sets_base_folder: Optional folder of the video's manifest, where the video's
+                             digest is cached (see video_digest).
+    """
+    return fingerprint_parts([video_digest(video_path, sets_base_folder), json.dumps(params, sort_keys=True)])
+
+
+def stage_output_fingerprint(set_folder_path, stage):
+    """
+    Fingerprints what a stage produced for one set: its rows in the scene store,
+    plus the audio clip and frames for extraction.
+
+    :return: The fingerprint, or None if the stage's output is missing.
+    """
+    store, set_name = set_store(set_folder_path)
+    # Embedding has no local output; it is tied to the summary it embedded
+    rows_fp = store.fingerprint(set_name, stage)
+    if stage != "extraction" or rows_fp is None:
+        return rows_fp
+
+    audio = os.path.join(set_folder_path, "audio.mp3")
+    if not os.path.exists(audio):
+        return None
+    # Frames are fingerprinted by name and size; hashing every image would cost more than it saves
+    frames = [f"{os.path.basename(path)}:{os.path.getsize(path)}" for path in list_frame_files(set_folder_path)]
+    return fingerprint_parts([rows_fp, hash_file(audio)] + frames)
+
+
+class StageManifest:
+    """
+    Per-video record of finished stages, saved as 'stage_manifest.json' in the sets folder.
+
+    Stages are expected to run in order (extraction, description, summarization,
+    embedding): a stage's input fingerprint is the output its upstream stage recorded.
+
+    :param sets_base_folder: The folder holding the video's 'set_*' folders.
+    :param source_fp: Fingerprint of the video and parameters (see source_fingerprint).
+    """
+
+    def __init__(self, sets_base_folder, source_fp):
+        self.sets_base_folder = sets_base_folder
+        self.path = os.path.join(sets_base_folder, MANIFEST_FILENAME)
+        self.source_fp = source_fp
+        self.sets = {}
+
+        data = read_manifest_file(self.path)
+        self.source_file = data.get("source_file") # Cached video digest (see video_digest)
+        if data.get("source_fingerprint") == source_fp:
+            self.sets = data.get("sets", {})
+        elif data.get("source_fingerprint"):
+            print("  Video or parameters changed since the last run. Starting from scratch.")
+
+    def input_fingerprint(self, set_name, stage, previous_set_name=None):
+        """
+        Returns the fingerprint of what 'stage' consumes for a set.
+
+        Summaries also depend on the previous set (its summary or its description),
+        so the previous set's description is part of the summarization input.
+        """
+        if stage == "extraction":
+            return fingerprint_parts([self.source_fp, set_name])
+
+        upstream = STAGES[STAGES.index(stage) - 1]
+        records = self.sets.get(set_name, {})
+        parts = [records.get(upstream, {}).get("output", "")]
+        if stage == "summarization" and previous_set_name:
+            parts.append(self.sets.get(previous_set_name, {}).get("description", {}).get("output", ""))
+        return fingerprint_parts(parts)
+
+    def is_done(self, set_name, stage, previous_set_name=None):
+        """Returns True if a set's stage was recorded and neither its input nor output changed since."""
+        record = self.sets.get(set_name, {}).get(stage)
+        if not record:
+            return False
+        if record["input"] != self.input_fingerprint(set_name, stage, previous_set_name):
+            return False
+        output_stage = "summarization" if stage == "embedding" else stage
+        return record["output"] == stage_output_fingerprint(os.path.join(self.sets_base_folder, set_name), output_stage)
+
+    def pending_sets(self, stage, set_names, cascade=False):
+        """
+        Returns the sets whose 'stage' still has to run.
+
+        :param set_names: All set names of the video, in order.
+        :param cascade: If True, every set after the first pending one is pending too
+                        (used when each summary is the context of the next one).
+        """
+        pending = []
+        previous_set_name = None
+        for set_name in set_names:
+            if (cascade and pending) or not self.is_done(set_name, stage, previous_set_name):
+                pending.append(set_name)
+            previous_set_name = set_name
+        return pending
+
+    def mark_done(self, set_names, stage, all_set_names):
+        """
+        Records 'stage' as finished for every given set whose output exists.
+
+        :param set_names: The sets the stage just ran for.
+        :param all_set_names: All set names of the video, in order (to find each set's previous set).
+        :return: The number of sets recorded.
+        """
+        marked = 0
+        previous = {name: (all_set_names[i - 1] if i > 0 else None) for i, name in enumerate(all_set_names)}
+        for set_name in set_names:
+            output_stage = "summarization" if stage == "embedding" else stage
+            output_fp = stage_output_fingerprint(os.path.join(self.sets_base_folder, set_name), output_stage)
+            if output_fp is None:
+                continue
+            self.sets.setdefault(set_name, {})[stage] = {
+                "input": self.input_fingerprint(set_name, stage, previous[set_name]),
+                "output": output_fp
+            }
+            marked += 1
+        self.save()
+        return marked
+
+    def save(self):
+        """Writes the manifest atomically, so a crash never leaves a half-written file."""
+        data = {"source_fingerprint": self.source_fp, "sets": self.sets}
+        if self.source_file:
+            data["source_file"] = self.source_file
+        try:
+            write_manifest_file(self.path, data)
+        except Exception as e:
+            print(f"  [Error] Could not write stage manifest: {e}")
+
+
+def forget_stage(sets_base_folder, stage):
+    """
+    Removes every record of 'stage' from a video's manifest, so the next run redoes it.
+
+    Used when a stage's output is deleted outside the pipeline (e.g. a video's
+    vectors are removed from ChromaDB). Other stages are kept.
+
+    :return: The number of sets whose record was removed.
+    """
+    path = os.path.join(sets_base_folder, MANIFEST_FILENAME)
+    data = read_manifest_file(path)
+    if not data:
+        return 0
+
+    removed = sum(1 for records in data.get("sets", {}).values() if records.pop(stage, None) is not None)
+    write_manifest_file(path, data)
+    return removed